@@ -0,0 +1,79 @@
+'''
+Benchmark of the local media server: full file throughput and seek latency via Range requests.
+
+Usage:
+    python -m benchmarks.media_server [file size in MB] [number of seeks]
+'''
+import http.client
+import os
+import random
+import sys
+import tempfile
+import time
+from urllib.parse import urlparse
+
+from caster import MediaServer
+
+
+def throughput(port: int, path: str, size: int) -> float:
+    '''
+    Downloads the whole file, returns MB/s
+    '''
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    started = time.perf_counter()
+    connection.request('GET', path)
+    response = connection.getresponse()
+    while response.read(1024 * 1024):
+        pass
+    seconds = time.perf_counter() - started
+    connection.close()
+
+    return size / seconds / 1024 / 1024
+
+
+def seek_latency(port: int, path: str, size: int, count: int) -> list[float]:
+    '''
+    Requests `count` random 64 KiB ranges on one connection the way a device seeks,
+    returns the time to the first byte of each in seconds
+    '''
+    connection = http.client.HTTPConnection('127.0.0.1', port)
+    latencies = []
+    for _ in range(count):
+        start = random.randrange(size - 65536)
+        started = time.perf_counter()
+        connection.request('GET', path, headers={'Range': f'bytes={start}-{start + 65535}'})
+        response = connection.getresponse()
+        response.read(1)
+        latencies.append(time.perf_counter() - started)
+        response.read()
+    connection.close()
+
+    return latencies
+
+
+def main(size_mb: int = 256, seeks: int = 200) -> None:
+    '''
+    Serves a `size_mb` file with and without sendfile, times downloading it and `seeks` random seeks
+    '''
+    random.seed(0)
+    size = size_mb * 1024 * 1024
+    with tempfile.TemporaryDirectory() as directory:
+        file_path = os.path.join(directory, 'benchmark.mp4')
+        with open(file_path, 'wb') as file:
+            for _ in range(size_mb):
+                file.write(os.urandom(1024 * 1024))
+
+        for use_sendfile in [True, False]:
+            with MediaServer(host='127.0.0.1', advertised_host='127.0.0.1', roots=[directory],
+                             use_sendfile=use_sendfile) as server:
+                path = urlparse(server.share(file_path).url).path
+                speed = max(throughput(server.port, path, size) for _ in range(3))
+                latencies = sorted(seek_latency(server.port, path, size, seeks))
+
+            name = 'sendfile' if use_sendfile else 'copy'
+            print(f'{name:>8}: {speed:8.1f} MB/s, seek p50 {latencies[len(latencies) // 2] * 1000:6.2f} ms, '
+                  f'p95 {latencies[int(len(latencies) * 0.95)] * 1000:6.2f} ms')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,64 @@
+'''
+Microbenchmark of parser routing.
+
+Usage:
+    python -m benchmarks.parser_routing [number of urls] [number of extra domains]
+'''
+import random
+import sys
+import timeit
+
+from parsers import fallback, get_parsers
+from parsers.registry import ParserRegistry
+
+URL_TEMPLATES = [
+    'https://www.youtube.com/watch?v={id}',
+    'https://youtu.be/{id}',
+    'https://m.youtube.com/shorts/{id}?feature=share',
+    'https://yewtu.be/watch?v={id}&t=42',
+    'https://rumble.com/v{id}-some-long-video-title.html',
+    'https://vkplay.live/{id}',
+    'https://example.com/videos/{id}.mp4?ref=youtube.com',
+    'https://cdn{id}.example.org/media/stream.m3u8',
+]
+
+
+def linear_scan(url: str, extra_domains: list[str]) -> list:
+    '''
+    The previous implementation, rebuilds the domain map and scans the url for every domain
+    '''
+    parser_map = {}
+    for parser in get_parsers():
+        for domain in parser.supported_domains():
+            parser_map.setdefault(domain, []).append(parser)
+    for domain in extra_domains:
+        parser_map.setdefault(domain, []).append(fallback.FallbackParser)
+
+    for domain, parsers in parser_map.items():
+        if domain in url:
+            return parsers
+
+    return [fallback.FallbackParser]
+
+
+def main(count: int = 10000, domain_count: int = 1000) -> None:
+    '''
+    Times routing of `count` random urls with both implementations,
+    with the built-in domains only and with `domain_count` extra ones
+    '''
+    random.seed(0)
+    urls = [random.choice(URL_TEMPLATES).format(id=random.randrange(10**9)) for _ in range(count)]
+
+    for extra_domains in [[], [f'site{index}.example.net' for index in range(domain_count)]]:
+        registry = ParserRegistry.from_parsers(get_parsers(), [fallback.FallbackParser])
+        registry.register(fallback.FallbackParser, extra_domains)
+
+        print(f'{len(extra_domains)} extra domains')
+        for name, route in [('linear scan', lambda url, domains=extra_domains: linear_scan(url, domains)),
+                            ('registry', registry.lookup)]:
+            seconds = min(timeit.repeat(lambda route=route: [route(url) for url in urls], number=1, repeat=5))
+            print(f'{name:>12}: {seconds * 1000:8.2f} ms for {count} urls, {seconds / count * 1e6:6.2f} µs/url')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:3]])
@@ -0,0 +1,56 @@
+'''
+Benchmark of the state store against the previous whole-file settings.json.
+
+Usage:
+    python -m benchmarks.state_store [number of history entries]
+'''
+import json
+import os
+import sys
+import tempfile
+import time
+
+from caster._state import State
+from caster._store import StateStore
+
+
+def main(count: int = 200000) -> None:
+    '''
+    Times startup, a position lookup and a save with `count` videos in the history
+    '''
+    history = {f'Video {index}': float(index) for index in range(count)}
+
+    with tempfile.TemporaryDirectory() as directory:
+        file_loc = os.path.join(directory, 'settings.json')
+        with open(file_loc, 'w', encoding='utf-8') as file:
+            file.write(json.dumps({'play_rate': 1, 'volume': 100, 'history': history}, sort_keys=True, indent=4))
+
+        started = time.perf_counter()
+        with open(file_loc, 'r', encoding='utf-8') as file:
+            settings = json.loads(file.read())
+        loaded = time.perf_counter()
+        position = settings['history'][f'Video {count // 2}']
+        settings['history']['Video 0'] = position
+        with open(file_loc, 'w', encoding='utf-8') as file:
+            file.write(json.dumps(settings, sort_keys=True, indent=4))
+        saved = time.perf_counter()
+        print(f'{"json":>6}: startup {(loaded - started) * 1000:8.2f} ms, save {(saved - loaded) * 1000:8.2f} ms')
+
+        state = State(StateStore(os.path.join(directory, 'settings.db'), max_entries=None))
+        for index in range(count):
+            state.history[f'https://example.com/{index}.mp4'] = float(index)
+        state.save_state()
+
+        started = time.perf_counter()
+        state = State(StateStore(os.path.join(directory, 'settings.db'), max_entries=None))
+        position = state.history[f'https://example.com/{count // 2}.mp4']
+        loaded = time.perf_counter()
+        state.history['https://example.com/0.mp4'] = position
+        state.store.flush()
+        saved = time.perf_counter()
+        state.save_state()
+        print(f'{"sqlite":>6}: startup {(loaded - started) * 1000:8.2f} ms, save {(saved - loaded) * 1000:8.2f} ms')
+
+
+if __name__ == '__main__':
+    main(*[int(arg) for arg in sys.argv[1:2]])
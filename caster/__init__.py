@@ -1,30 +1,6 @@
-
 from caster._caster import Caster
-from parsers import abstract_parser, fallback, tube, web
-
-
-def get_parser_for_url(url) -> list[abstract_parser.AbstractParser]:
-    '''
-    Gets a suitable parser for a url
-    '''
-    parsers = get_parsers()
-
-    parser_map = {}
-    for parser in parsers:
-        for domain in parser.supported_domains():
-            if domain not in parser_map:
-                parser_map[domain] = []
-            parser_map[domain].append(parser)
-
-    for domain, parsers in parser_map.items():
-        if domain in url:
-            return parsers
-
-    return [fallback.FallbackParser]
-
-
-def get_parsers() -> list[abstract_parser.AbstractParser]:
-    '''
-    Gets a list of available parsers
-    '''
-    return [tube.TubeParser,web.WebParser]
+from caster._disk_cache import DiskCache
+from caster._group import DeviceSkew, GroupPlayer
+from caster._media_server import MediaServer, get_media_server, shutdown_media_server
+from caster._pool import CasterPool
+from caster._relay import StreamRelay, get_stream_relay, shutdown_stream_relay
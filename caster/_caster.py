@@ -2,15 +2,34 @@
 import sys
 import threading
 import time
-from threading import Thread
-from typing import Optional
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
 
 import pychromecast
+from pychromecast.discovery import discover_listed_chromecasts
+from pychromecast.socket_client import CONNECTION_STATUS_CONNECTED, ConnectionStatus, ConnectionStatusListener
 
+from caster._coalescer import CommandCoalescer
+from caster._endpoint import DeviceEndpoint
+from caster._queue import PlaybackQueue, QueueItem
+from caster._relay import StreamRelay
 from caster._state import State
+from caster._status import INACTIVE_STATES, StatusSnapshot, StatusTracker
+from caster._supervisor import ConnectionSupervisor
 from parsers.abstract_parser import ParseResult
-from utils.spinner_util import SpinnerUtil
 from utils.string_utils import StringUtils
+from utils.timer_util import PhaseTimer
+
+# seconds to wait for a device at its last known endpoint before discovering it
+ENDPOINT_TIMEOUT = 5
+# seconds to wait for a discovered device, a reconnect attempt that takes longer fails and backs off
+CONNECT_TIMEOUT = 30
+
+PLAYER_STATE_ICONS = {
+    'PLAYING': '▶️',
+    'BUFFERING': '⏳',
+    'PAUSED': '⏸',
+}
 
 
 class Caster():
@@ -21,31 +40,50 @@ class Caster():
         cast_device: A Chromecast object representing the connected device.
         browser: A CastBrowser object used for discovering Chromecast devices.
         chromecast_name: The friendly name of the Chromecast device to connect to.
-        debug_thread: A Thread object for running the debug loop.
-        stop_debug: A threading.Event object used to stop the debug thread.
+        status: A StatusTracker keeping the last known status of the device.
+        supervisor: A ConnectionSupervisor reconnecting to the device when the connection is lost.
+        commands: A CommandCoalescer merging bursts of seek, volume and rate commands.
+        executor: Runs the commands submitted to the device one at a time, in order.
+        relay: A StreamRelay the device plays remote streams through, None to play them directly.
+        unsubscribe_display: Stops the status display, None when it's not shown.
     """
 
     cast_device: Optional[pychromecast.Chromecast] = None
     browser: Optional[pychromecast.CastBrowser] = None
-    debug_thread: Optional[Thread] = None
-    last_known_status = 'IDLE'
+    unsubscribe_display: Optional[Callable[[], None]] = None
     current_video: Optional[ParseResult] = None
     state: State
-
-    def __init__(self, chromecast_name: str):
+    queue: PlaybackQueue
+    status: StatusTracker
+    supervisor: ConnectionSupervisor
+    commands: CommandCoalescer
+    executor: ThreadPoolExecutor
+    relay: Optional[StreamRelay]
+
+    def __init__(self, chromecast_name: str, resolver: Callable[[str], Optional[ParseResult]] = None,
+                 relay: StreamRelay = None):
         """
         Initializes a new Caster object.
 
         Args:
             chromecast_name: The friendly name of the Chromecast device to connect to.
+            resolver: A function that parses a url into a video, used to resolve queued urls in advance.
+            relay: A caching proxy to play remote streams through.
         """
 
         if not chromecast_name:
             raise ValueError("`chromecast_name` cannot be empty")
         self.chromecast_name = chromecast_name
 
-        self.state = State.init_state()
-        self.stop_debug = threading.Event()
+        self.state = State.init_state(chromecast_name)
+        self.queue = PlaybackQueue(resolver)
+        self.status = StatusTracker()
+        self.status.subscribe(self._track_history)
+        self.status.subscribe(self._advance_queue)
+        self.supervisor = ConnectionSupervisor(self.reconnect)
+        self.commands = CommandCoalescer()
+        self.executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='commands')
+        self.relay = relay
 
     def __enter__(self):
         """
@@ -60,22 +98,57 @@ class Caster():
         if self.browser:
             self.browser.stop_discovery()
 
+        self._remember_position()
+        self.stop_status_display()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.commands.cancel()
+        self.supervisor.stop()
+        self.status.stop()
+        # after the status thread, so the last positions it tracked are saved too
         self.state.save_state()
-        self.stop_debug_thread()
 
     def connect(self):
         """
-        Discovers and connects to the Chromecast device.
+        Connects to the Chromecast device at its last known endpoint,
+        or discovers it if there's none or it can't be reached.
         """
-        SpinnerUtil.start()
-        self.cast_device = self._get_chromecast_device()
-        self.cast_device.wait()
+        timer = PhaseTimer()
+
+        self.cast_device = self._connect_to_endpoint(timer) or self._connect_discovered(timer)
+
         self.cast_device.media_controller.block_until_active(10)
-        self.set_volume(self.state.volume)
-        SpinnerUtil.stop()
+        timer.lap('block_until_active')
+        DeviceEndpoint.from_cast_info(self.cast_device.cast_info).save()
+
+        self.status.attach(self.cast_device)
+        self._send_volume(self.state.volume)
+        self.supervisor.watch(self.cast_device)
 
+        print(f'Connected to {self.chromecast_name}: {timer}')
         self.print_device_info()
 
+    def reconnect(self):
+        """
+        Drops the current connection and connects to the device from scratch.
+        """
+        self.status.stop()
+        if self.cast_device:
+            self.cast_device.disconnect(timeout=0)
+
+        self.connect()
+
+    def submit(self, command: Callable, *args, **kwargs) -> Future:
+        """
+        Runs a command on the device's command thread without waiting for it.
+
+        Commands run one at a time in the order they were submitted, so a slow one like
+        `play` only holds up the commands to the same device, not the caller.
+
+        Returns:
+            A Future with the result of the command.
+        """
+        return self.executor.submit(command, *args, **kwargs)
+
     def set_volume(self, volume: float):
         """
         Sets the volume level of the Chromecast device.
@@ -84,39 +157,57 @@ class Caster():
             volume: A float representing the volume level 0-100.
         """
         self.state.volume = volume
-        self.cast_device.socket_client.receiver_controller.send_message(
-            {'type': "SET_VOLUME", "volume": {"level": volume/100}})
+        self.commands.submit('volume', lambda _: volume, self._command_sender(self._send_volume))
 
     def skip(self, seconds: float):
         """
         Fast forward or rewind X amount of seconds
         """
-        self.seek(self.cast_device.media_controller.status.current_time+seconds)
+        def update(target: Optional[float]) -> float:
+            # skips within a burst add up on top of the pending target, not the stale device position
+            if target is None:
+                target = self.status.position()
+            return max(0, target + seconds)
+
+        self.commands.submit('seek', update, self._command_sender(self._send_seek))
 
     def seek(self, seconds: float):
         """
         Seek the current media to a specific location.
         """
 
-        self.cast_device.media_controller.seek(seconds)
+        self.commands.submit('seek', lambda _: seconds, self._command_sender(self._send_seek))
 
-    def set_playback_rate(self, playback_rate: float = None):
+    def set_playback_rate(self, playback_rate: float = None, remember: bool = True):
         """
         Sets the playback rate of the media on the Chromecast device.
 
         Args:
             playback_rate: A float representing the playback rate.
+            remember: Whether the rate is used for the next videos too, not for short corrections.
         """
 
-        if playback_rate:
+        if playback_rate and remember:
             self.state.play_rate = playback_rate
-        else:
+        elif not playback_rate:
             playback_rate = 1
 
-        self.cast_device.media_controller.send_message({
-            'type': "SET_PLAYBACK_RATE",
-            "playbackRate": playback_rate,
-            'mediaSessionId': self.cast_device.media_controller.status.media_session_id})
+        self.commands.submit('rate', lambda _: playback_rate, self._command_sender(self._send_playback_rate))
+
+    def round_trip(self, timeout: float = 5) -> Optional[float]:
+        """
+        Requests the media status and measures how long it takes the device to respond.
+
+        Returns:
+            The round-trip time in seconds, None if the device didn't respond in time.
+        """
+        responded = threading.Event()
+        started = time.monotonic()
+        self.cast_device.media_controller.update_status(callback_function=lambda *_: responded.set())
+        if not responded.wait(timeout):
+            return None
+
+        return time.monotonic() - started
 
     def play(self, video: ParseResult = None):
         """
@@ -131,13 +222,18 @@ class Caster():
             video = self.current_video
 
         m_c = self.cast_device.media_controller
+        # seeks and rates meant for the previous media
+        self.commands.cancel()
+        self._remember_position()
 
         # _TODO: play around with quick play in order to try different renderers
 # app_display_name:
 # 'Web Video Caster'
 # app_id:
 # 'AD229957'
-        m_c.play_media(video.url, video.mime_type, title=video.title,
+        # slow hosts and seeks back are served from the relay's cache
+        url = self.relay.relay(video) if self.relay else video.url
+        m_c.play_media(url, video.mime_type, title=video.title,
                        thumb=video.thumbnail_url,
                        current_time=0,
                        media_info={
@@ -146,10 +242,54 @@ class Caster():
 
         m_c.block_until_active(15)
 
-        if video.is_live:
-            self.set_playback_rate()  # always play live at x1
-        else:
-            self.set_playback_rate(self.state.play_rate)
+        # always play live at x1
+        self._send_playback_rate(1 if video.is_live else self.state.play_rate)
+
+    def enqueue(self, url: str) -> int:
+        """
+        Adds a url to the playback queue, returns its position.
+        """
+        return self.queue.enqueue(url)
+
+    def play_next(self) -> Optional[ParseResult]:
+        """
+        Plays the next queued video, skipping ones that failed to resolve.
+
+        Returns:
+            The video that started playing, None if the queue is empty.
+        """
+        error = None
+        while True:
+            item = self.queue.pop()
+            if not item:
+                break
+
+            try:
+                video = item.result()
+            except Exception as exception:
+                error = exception
+                continue
+
+            if video:
+                self.play(video)
+                return video
+
+        if error:
+            raise error
+
+        return None
+
+    def clear_queue(self) -> None:
+        """
+        Removes all videos from the playback queue.
+        """
+        self.queue.clear()
+
+    def list_queue(self) -> list[QueueItem]:
+        """
+        Gets videos in the playback queue.
+        """
+        return self.queue.items()
 
     def now_playing(self, video: ParseResult = None) -> str:
         '''
@@ -158,8 +298,9 @@ class Caster():
 
         if not video:
             video = ParseResult(
-                url=self.cast_device.media_controller.status.content_id,
-                title=self.cast_device.status.status_text,
+                url=self.status.snapshot.content_id,
+                original_url=self.status.snapshot.content_id,
+                title=self.status.snapshot.status_text,
                 mime_type='',
                 thumbnail_url='https://i.imgur.com/a0hazzA.png')
 
@@ -180,6 +321,45 @@ __*{title}*__
 {links}
 """
 
+    def status_line(self, snapshot: StatusSnapshot = None) -> str:
+        '''
+        Gets the player state and the progress for a chat message
+
+        Args:
+            snapshot: The device status, the last known one by default.
+        '''
+        snapshot = snapshot or self.status.snapshot
+
+        icon = PLAYER_STATE_ICONS.get(snapshot.player_state, '⏹')
+        progress_bar = StringUtils.progress_bar(snapshot.position(self.status.clock()), snapshot.duration, length=12)
+        line = f'{icon} `{StringUtils.escape_markdown(str.join(" ", progress_bar.split()))}`'
+
+        metrics = self.supervisor.metrics()
+        if not metrics['connected'] and self.cast_device:
+            line += f"\n🔌 _Reconnecting, {metrics['buffered']} commands waiting_"
+        elif metrics['reconnects']:
+            line += f"\n🔌 _Reconnected {metrics['reconnects']} times, down for {round(metrics['downtime'])}s_"
+        return line
+
+    def _send_volume(self, volume: float):
+        self.cast_device.socket_client.receiver_controller.send_message(
+            {'type': "SET_VOLUME", "volume": {"level": volume/100}})
+
+    def _send_seek(self, seconds: float):
+        self.cast_device.media_controller.seek(seconds)
+        self.status.expect(current_time=seconds)
+
+    def _send_playback_rate(self, playback_rate: float):
+        self.cast_device.media_controller.send_message({
+            'type': "SET_PLAYBACK_RATE",
+            "playbackRate": playback_rate,
+            'mediaSessionId': self.cast_device.media_controller.status.media_session_id})
+        self.status.expect(playback_rate=playback_rate)
+
+    def _command_sender(self, send: Callable[[float], None]) -> Callable[[float], bool]:
+        # coalesced commands are sent from a timer thread, a lost device buffers them for replay
+        return lambda value: self.supervisor.call(send, value)
+
     def discover_chromecast_devices(self) -> list[pychromecast.CastBrowser]:
         '''
         Discovers all Chromecast devices
@@ -205,72 +385,161 @@ __*{title}*__
 
         return chromecasts[0]
 
-    def print_device_info(self):
+    def _connect_to_endpoint(self, timer: PhaseTimer) -> Optional[pychromecast.Chromecast]:
+        """
+        Connects to the endpoint the device had the last time, skipping discovery.
+
+        Returns:
+            A connected Chromecast object, None if there's no known endpoint or it's unreachable.
+        """
+        endpoint = DeviceEndpoint.load(self.chromecast_name)
+        if not endpoint:
+            return None
+
+        timer.lap('discovery (skipped)')
+        cast_device = pychromecast.get_chromecast_from_cast_info(endpoint.to_cast_info(), None, timeout=ENDPOINT_TIMEOUT)
+        try:
+            self._wait(cast_device, timer, ENDPOINT_TIMEOUT)
+        except pychromecast.RequestTimeout:
+            cast_device.disconnect(timeout=0)
+            timer.lap('unreachable endpoint')
+            print(f'{self.chromecast_name} is not at {endpoint.host}:{endpoint.port} anymore, discovering it')
+            return None
+
+        # make sure the device hasn't moved in the background
+        threading.Thread(target=self._confirm_endpoint, args=[endpoint], daemon=True).start()
+
+        return cast_device
+
+    def _connect_discovered(self, timer: PhaseTimer) -> pychromecast.Chromecast:
+        cast_device = self._get_chromecast_device()
+        timer.lap('discovery')
+        try:
+            self._wait(cast_device, timer, CONNECT_TIMEOUT)
+        except pychromecast.RequestTimeout:
+            cast_device.disconnect(timeout=0)
+            raise
+        return cast_device
+
+    @staticmethod
+    def _wait(cast_device: pychromecast.Chromecast, timer: PhaseTimer, timeout: float = None):
+        cast_device.register_connection_listener(_ConnectionTimer(timer))
+        cast_device.wait(timeout)
+        timer.lap('wait')
+
+    def _confirm_endpoint(self, endpoint: DeviceEndpoint):
+        """
+        Discovers the device to check whether its endpoint has changed since it was remembered.
+        """
+        cast_infos, browser = discover_listed_chromecasts(friendly_names=[self.chromecast_name])
+        browser.stop_discovery()
+        if not cast_infos:
+            return
+
+        discovered = DeviceEndpoint.from_cast_info(cast_infos[0])
+        if (discovered.host, discovered.port) != (endpoint.host, endpoint.port):
+            discovered.save()
+            print(f'{self.chromecast_name} has moved to {discovered.host}:{discovered.port}, it will be used on the next start')
+
+    def print_device_info(self, snapshot: StatusSnapshot = None):
         """
         Prints debug info about the Chromecast device.
 
         Args:
-            device: A Chromecast object representing the connected device.
+            snapshot: The device status to print, the last known one by default.
         """
 
-        mc_status = self.cast_device.media_controller.status
+        snapshot = snapshot or self.status.snapshot
 
-        # update state with current video time
-        if mc_status.title and mc_status.current_time:
-            self.state.history[mc_status.title] = mc_status.current_time
-
-        content = mc_status.content_id
+        content = snapshot.content_id
         if content:
             content = StringUtils.make_link(content, StringUtils.shorten_long_string(content))
 
         progress_bar = StringUtils.progress_bar(
-            mc_status.current_time,
-            mc_status.duration)
+            snapshot.position(self.status.clock()),
+            snapshot.duration)
 
         print(
             f'''
-    Device: {self.cast_device.name}, {self.cast_device.model_name}
-    Status: {self.cast_device.status.display_name} ({self.cast_device.status.status_text}) @{self.cast_device.status.volume_level:.0%}
-    Player State: {mc_status.player_state}\tx{mc_status.playback_rate}
+    Device: {snapshot.device_name}, {snapshot.model_name}
+    Status: {snapshot.display_name} ({snapshot.status_text}) @{snapshot.volume_level:.0%}
+    Player State: {snapshot.player_state}\tx{snapshot.playback_rate}
     Content: {content}
     {progress_bar}''')
 
-    def start_debug_thread(self):
-        """
-        Starts the debug thread.
-        """
-        self.stop_debug.clear()
-        self.debug_thread = threading.Thread(target=self.debug_loop)
-        self.debug_thread.start()
-
-    def stop_debug_thread(self):
+    def start_status_display(self):
         """
-        Stops the debug thread.
+        Starts reprinting device info in place whenever the status changes.
         """
-        self.stop_debug.set()
-        if self.debug_thread is not None:
-            self.debug_thread.join()
-        self.debug_thread = None
+        if not self.unsubscribe_display:
+            self.unsubscribe_display = self.status.subscribe(self._display_status)
 
-    def debug_loop(self):
+    def stop_status_display(self):
         """
-        Main loop of the debug thread.
+        Stops the status display.
         """
-        while not self.stop_debug.is_set():
-            # only update status when not idling, otherwise it restarts the renderer app
-            # _TODO: switch to status update callbacks
-            if (self.cast_device.media_controller.status.player_state not in ['UNKNOWN', 'IDLE']):
-                self.cast_device.media_controller.update_status()
-                time.sleep(1)
+        if self.unsubscribe_display:
+            self.unsubscribe_display()
+        self.unsubscribe_display = None
+
+    def _display_status(self, snapshot: StatusSnapshot, _: StatusSnapshot):
+        lines_of_text = 6
+        # Move cursor up N lines
+        sys.stdout.write(f'\033[{lines_of_text}A')
+        # Clear the old text before overwriting
+        for _ in range(lines_of_text):
+            sys.stdout.write('\033[K')
+            sys.stdout.write('\n')
+        sys.stdout.write(f'\033[{lines_of_text}A')
+
+        self.print_device_info(snapshot)
+
+    def _track_history(self, snapshot: StatusSnapshot, _: StatusSnapshot):
+        # update state with current video time
+        url = self._history_url(snapshot)
+        if url and snapshot.current_time:
+            self.state.history[url] = snapshot.current_time
+
+    def _remember_position(self):
+        # the last status may be seconds old, store where the media is now
+        snapshot = self.status.snapshot
+        url = self._history_url(snapshot)
+        if url and snapshot.player_state not in INACTIVE_STATES:
+            self.state.history[url] = self.status.position()
+
+    def _history_url(self, snapshot: StatusSnapshot) -> Optional[str]:
+        # the device only knows the stream, which expires, the page it was parsed from identifies the video.
+        # media of other apps, of an earlier run or the one being replaced has no known page and isn't kept
+        if self.current_video and snapshot.title == self.current_video.title:
+            return self.current_video.original_url
+        return None
+
+    def _advance_queue(self, snapshot: StatusSnapshot, previous: StatusSnapshot):
+        finished = snapshot.player_state == 'IDLE' and snapshot.idle_reason == 'FINISHED'
+        # the same finished session may be reported several times
+        already_finished = previous.player_state == 'IDLE' and previous.media_session_id == snapshot.media_session_id
+        if not finished or already_finished or not self.list_queue():
+            return
+
+        # keep the status thread free while the next video loads
+        self.submit(self.supervisor.call, self.play_next).add_done_callback(self._on_queued_played)
+
+    @staticmethod
+    def _on_queued_played(future: Future):
+        if not future.cancelled() and future.exception():
+            print(f'Failed to play the next queued video: {future.exception()!r}')
+
+
+class _ConnectionTimer(ConnectionStatusListener):
+    """
+    Records how long it took to open the socket to a device.
+    """
 
-            lines_of_text = 6
-            # Move cursor up N lines
-            sys.stdout.write(f'\033[{lines_of_text}A')
-            # Clear the old text before overwriting
-            for _ in range(lines_of_text):
-                sys.stdout.write('\033[K')
-                sys.stdout.write('\n')
-            sys.stdout.write(f'\033[{lines_of_text}A')
+    def __init__(self, timer: PhaseTimer):
+        self.timer = timer
+        self.connected = False
 
-            self.print_device_info()
-            time.sleep(9)
+    def new_connection_status(self, status: ConnectionStatus) -> None:
+        if status.status == CONNECTION_STATUS_CONNECTED and not self.connected:
+            self.connected = True
+            self.timer.lap('socket connect')
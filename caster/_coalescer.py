@@ -0,0 +1,102 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Any, Callable, Optional
+
+
+@dataclass(eq=False)
+class PendingCommand:
+    """
+    Class to hold the merged value of a burst of commands waiting to be sent.
+    """
+    value: Any
+    send: Callable[[Any], object]
+    merged: int = 1
+    timer: Optional[threading.Timer] = field(default=None, repr=False)
+
+
+class CommandCoalescer:
+    '''
+    Merges bursts of commands of the same kind into one message to the device.
+
+    The first command of a kind opens a `window` seconds long burst, every command of that kind arriving
+    within it updates the pending value, and only the final value is sent when the window closes.
+    The last writer wins, so a burst of relative seeks becomes a single absolute seek.
+    '''
+
+    def __init__(self, window: float = 0.3, timer: Callable[..., threading.Timer] = threading.Timer) -> None:
+        self.window = window
+        self.timer = timer
+
+        self.submitted = 0
+        self.sent = 0
+        self.coalesced = 0
+
+        self._pending: dict[str, PendingCommand] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, kind: str, update: Callable[[Any], Any], send: Callable[[Any], object]) -> None:
+        '''
+        Queues a command, `update` gets the pending value of the kind (None if there's none) and returns the new one
+        '''
+        with self._lock:
+            self.submitted += 1
+            pending = self._pending.get(kind)
+            if pending:
+                pending.value = update(pending.value)
+                pending.send = send
+                pending.merged += 1
+                self.coalesced += 1
+                return
+
+            pending = PendingCommand(update(None), send)
+            pending.timer = self.timer(self.window, self.flush, args=(kind,))
+            pending.timer.daemon = True
+            self._pending[kind] = pending
+
+        pending.timer.start()
+
+    def pending(self, kind: str) -> Optional[Any]:
+        '''
+        Gets the value waiting to be sent for a kind of command, None if there's none
+        '''
+        with self._lock:
+            pending = self._pending.get(kind)
+            return pending.value if pending else None
+
+    def flush(self, kind: str) -> None:
+        '''
+        Sends the pending command of a kind right away
+        '''
+        with self._lock:
+            pending = self._pending.pop(kind, None)
+            if not pending:
+                return
+            pending.timer.cancel()
+            self.sent += 1
+
+        try:
+            pending.send(pending.value)
+        except Exception as error:
+            print(f'Failed to send {kind} ({pending.merged} coalesced): {error!r}')
+
+    def cancel(self, kind: Optional[str] = None) -> None:
+        '''
+        Drops the pending command of a kind, or of all kinds
+        '''
+        with self._lock:
+            kinds = [kind] if kind else list(self._pending)
+            for name in kinds:
+                pending = self._pending.pop(name, None)
+                if pending:
+                    pending.timer.cancel()
+
+    def stats(self) -> dict[str, int]:
+        '''
+        Gets counters of commands submitted, messages sent and commands merged away
+        '''
+        with self._lock:
+            return {
+                'submitted': self.submitted,
+                'sent': self.sent,
+                'coalesced': self.coalesced,
+            }
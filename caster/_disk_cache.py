@@ -0,0 +1,116 @@
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+class DiskCache:
+    '''
+    LRU cache of byte blobs stored as files in a directory, bounded by their total size.
+
+    Files left by a previous run are picked up again, the least recently modified ones are evicted first.
+    '''
+
+    def __init__(self, directory: str, max_bytes: int) -> None:
+        '''
+        Args:
+            directory: Where the blobs are stored, created if it doesn't exist.
+            max_bytes: Maximum total size of the blobs before the least recently used ones are evicted.
+        '''
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._sizes: OrderedDict[str, int] = OrderedDict()
+        self._total = 0
+        self._lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        entries = [entry for entry in os.scandir(directory) if entry.is_file() and not entry.name.endswith('.tmp')]
+        for entry in sorted(entries, key=lambda entry: entry.stat().st_mtime):
+            self._sizes[entry.name] = entry.stat().st_size
+            self._total += entry.stat().st_size
+        with self._lock:
+            self._evict()
+
+    def get(self, key: str) -> Optional[bytes]:
+        '''
+        Gets a cached blob
+        '''
+        with self._lock:
+            if key not in self._sizes:
+                self.misses += 1
+                return None
+            self._sizes.move_to_end(key)
+
+        try:
+            with open(self._path(key), 'rb') as file:
+                data = file.read()
+        except OSError:
+            # evicted while it was being read, or removed from under the cache
+            with self._lock:
+                if key in self._sizes:
+                    self._remove(key)
+                self.misses += 1
+            return None
+
+        with self._lock:
+            self.hits += 1
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        '''
+        Caches a blob, evicting the least recently used ones if the cache is full
+        '''
+        if len(data) > self.max_bytes:
+            return
+
+        # readers never see a partially written file
+        temp_path = f'{self._path(key)}.{threading.get_ident()}.tmp'
+        with open(temp_path, 'wb') as file:
+            file.write(data)
+        os.replace(temp_path, self._path(key))
+
+        with self._lock:
+            self._total += len(data) - self._sizes.pop(key, 0)
+            self._sizes[key] = len(data)
+            self._evict()
+
+    def discard(self, prefix: str) -> None:
+        '''
+        Removes the blobs whose keys start with a prefix
+        '''
+        with self._lock:
+            keys = [key for key in self._sizes if key.startswith(prefix)]
+            for key in keys:
+                self._remove(key)
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            return key in self._sizes
+
+    def stats(self) -> dict[str, int]:
+        '''
+        Gets cache counters and its size in bytes
+        '''
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                    'size': len(self._sizes), 'bytes': self._total}
+
+    def _evict(self) -> None:
+        while self._total > self.max_bytes:
+            self._remove(next(iter(self._sizes)))
+            self.evictions += 1
+
+    def _remove(self, key: str) -> None:
+        self._total -= self._sizes.pop(key)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass  # already gone
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
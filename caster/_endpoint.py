@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import dataclasses
+import json
+import os
+import threading
+from dataclasses import dataclass
+from typing import Final, Optional
+from uuid import UUID
+
+import dacite
+from pychromecast.models import CastInfo, HostServiceInfo
+
+FILE_LOC: Final[str] = 'devices.json'
+
+# devices connect and confirm their endpoints on threads of their own, all writing the same file
+_LOCK = threading.Lock()
+
+
+@dataclass
+class DeviceEndpoint:
+    '''
+    Where a device was found the last time, lets it be connected to without mDNS discovery
+    '''
+    friendly_name: str
+    host: str
+    port: int
+    uuid: str
+    model_name: Optional[str] = None
+    cast_type: Optional[str] = None
+    manufacturer: Optional[str] = None
+
+    @staticmethod
+    def from_cast_info(cast_info: CastInfo) -> DeviceEndpoint:
+        '''
+        Gets an endpoint of a discovered device
+        '''
+        return DeviceEndpoint(
+            cast_info.friendly_name, cast_info.host, cast_info.port, str(cast_info.uuid),
+            cast_info.model_name, cast_info.cast_type, cast_info.manufacturer)
+
+    def to_cast_info(self) -> CastInfo:
+        '''
+        Gets cast info to connect to the endpoint directly
+        '''
+        return CastInfo(
+            {HostServiceInfo(self.host, self.port)}, UUID(self.uuid), self.model_name, self.friendly_name,
+            self.host, self.port, self.cast_type, self.manufacturer)
+
+    @staticmethod
+    def load(friendly_name: str) -> Optional[DeviceEndpoint]:
+        '''
+        Gets the last known endpoint of a device
+        '''
+        endpoint = _read_all().get(friendly_name)
+        if not endpoint:
+            return None
+
+        return dacite.from_dict(data_class=DeviceEndpoint, data=endpoint)
+
+    def save(self) -> None:
+        '''
+        Remembers the endpoint for the next start
+        '''
+        with _LOCK:
+            endpoints = _read_all()
+            endpoints[self.friendly_name] = dataclasses.asdict(self)
+
+            # readers see either the old or the new file, never a half-written one
+            temp_loc = f'{FILE_LOC}.tmp'
+            with open(temp_loc, 'w', encoding='utf-8') as file:
+                file.write(json.dumps(endpoints, sort_keys=True, indent=4))
+            os.replace(temp_loc, FILE_LOC)
+
+
+def _read_all() -> dict[str, dict]:
+    if not os.path.exists(FILE_LOC):
+        return {}
+
+    with open(FILE_LOC, 'r', encoding='utf-8') as file:
+        try:
+            return json.loads(file.read())
+        except ValueError:
+            return {}
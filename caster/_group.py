@@ -0,0 +1,227 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from caster._caster import Caster
+from parsers.abstract_parser import ParseResult
+
+
+@dataclass
+class DeviceSkew:
+    """
+    Class to hold how far a device is from the leader of a group.
+
+    Attributes:
+        skew: Seconds the device is ahead of the leader, negative when it's behind.
+        latency: Smoothed command round-trip time to the device in seconds.
+        correction: `seek` or `nudge` if the skew was corrected, `None` if it was within tolerance.
+    """
+    name: str
+    skew: float = 0
+    latency: float = 0
+    correction: Optional[str] = None
+
+
+class GroupPlayer:
+    '''
+    Plays the same video on several devices in sync, the first one leads.
+
+    All devices are started at once and then seeked to the leader's position, each one ahead by the time
+    its seek takes to arrive. Every `interval` seconds the statuses are refreshed and positions compared:
+    a device more than `seek_threshold` seconds off is seeked, one more than `tolerance` seconds off plays
+    slightly faster or slower until the next check, up to `max_nudge` of the leader's rate.
+    '''
+
+    def __init__(self, casters: list[Caster], *, interval: float = 5, tolerance: float = 0.1,
+                 seek_threshold: float = 1, max_nudge: float = 0.1, smoothing: float = 0.5,
+                 clock: Callable[[], float] = time.time) -> None:
+        '''
+        Args:
+            casters: The devices to play on, the first one leads.
+            interval: Seconds between drift corrections.
+            tolerance: Skew in seconds that's left alone.
+            seek_threshold: Skew in seconds that's corrected with a seek rather than a rate nudge.
+            max_nudge: Maximum relative change of the playback rate used to catch up.
+            smoothing: Weight of the newest round-trip time in the smoothed latency.
+            clock: Source of the current unix time, the one status snapshots are stamped with.
+        '''
+        if not casters:
+            raise ValueError("`casters` cannot be empty")
+
+        self.casters = casters
+        self.interval = interval
+        self.tolerance = tolerance
+        self.seek_threshold = seek_threshold
+        self.max_nudge = max_nudge
+        self.smoothing = smoothing
+        self.clock = clock
+
+        self.skews: dict[str, DeviceSkew] = {caster.chromecast_name: DeviceSkew(caster.chromecast_name)
+                                             for caster in casters}
+        self._nudged: set[str] = set()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor = ThreadPoolExecutor(max_workers=len(casters), thread_name_prefix='group')
+
+    @property
+    def leader(self) -> Caster:
+        '''
+        The device the others follow
+        '''
+        return self.casters[0]
+
+    def play(self, video: ParseResult, timeout: float = 30) -> None:
+        '''
+        Starts a video on all devices, aligns them and keeps correcting their drift in the background.
+
+        Raises:
+            RuntimeError: If the leader failed to start the video.
+        '''
+        self._stop_correcting()
+        self._stopped.clear()
+
+        # each device loads the video on its own command thread, so a slow one doesn't delay the others
+        futures = {caster.submit(caster.supervisor.call, caster.play, video): caster for caster in self.casters}
+        wait(futures, timeout)
+        for future, caster in futures.items():
+            if not future.done() or future.exception():
+                if caster is self.leader:
+                    raise RuntimeError(f'{caster.chromecast_name} failed to play the video')
+                error = future.exception() if future.done() else 'timeout'
+                print(f'{caster.chromecast_name} failed to join the group: {error!r}')
+
+        self.measure()
+        self.align()
+
+        self._thread = threading.Thread(target=self._correct_loop, name='group-sync', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        '''
+        Stops correcting drift, puts nudged devices back to the leader's rate and releases the group's threads.
+        A stopped group can't play again.
+        '''
+        self._stop_correcting()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def measure(self) -> None:
+        '''
+        Refreshes the device statuses and their smoothed round-trip times
+        '''
+        round_trips = self._executor.map(lambda caster: caster.round_trip(), self.casters)
+        for caster, round_trip in zip(self.casters, round_trips):
+            if round_trip is None:
+                continue
+
+            skew = self.skews[caster.chromecast_name]
+            skew.latency = round_trip if not skew.latency else \
+                self.smoothing * round_trip + (1 - self.smoothing) * skew.latency
+
+    def align(self) -> None:
+        '''
+        Seeks all followers to the leader's position at once
+        '''
+        reference = self._reference()
+        list(self._executor.map(lambda caster: self._seek(caster, reference), self._followers()))
+
+    def correct(self) -> list[DeviceSkew]:
+        '''
+        Measures the skew of every follower and corrects it with a seek or a rate nudge.
+
+        Returns:
+            The skew of every device, the leader's is always 0.
+        '''
+        self.measure()
+        reference = self._reference()
+        now = self.clock()
+        leader = self.leader.status.snapshot
+
+        for caster in self._followers():
+            skew = self.skews[caster.chromecast_name]
+            snapshot = caster.status.snapshot
+            # devices that moved on to something else are left alone
+            if snapshot.player_state != 'PLAYING' or snapshot.content_id != leader.content_id:
+                skew.correction = None
+                continue
+
+            skew.skew = self._position(caster, now) - reference(now)
+            if abs(skew.skew) >= self.seek_threshold:
+                skew.correction = 'seek'
+                self._seek(caster, reference)
+            elif abs(skew.skew) > self.tolerance:
+                # close the gap by the next check
+                nudge = max(-self.max_nudge, min(self.max_nudge, -skew.skew / self.interval))
+                skew.correction = 'nudge'
+                self._set_rate(caster, self._rate(self.leader) * (1 + nudge))
+                self._nudged.add(caster.chromecast_name)
+            else:
+                skew.correction = None
+                if caster.chromecast_name in self._nudged:
+                    self._nudged.discard(caster.chromecast_name)
+                    self._set_rate(caster, self._rate(self.leader))
+
+        return list(self.skews.values())
+
+    def report(self) -> str:
+        '''
+        Describes the observed skew of every device
+        '''
+        lines = []
+        for skew in self.skews.values():
+            correction = f', {skew.correction}' if skew.correction else ''
+            lines.append(f'{skew.name}: {skew.skew * 1000:+.0f} ms, '
+                         f'round trip {skew.latency * 1000:.0f} ms{correction}')
+
+        return str.join('\n', lines)
+
+    def _stop_correcting(self) -> None:
+        self._stopped.set()
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join()
+        self._thread = None
+
+        for caster in self._followers():
+            if caster.chromecast_name in self._nudged:
+                self._set_rate(caster, self._rate(self.leader))
+        self._nudged.clear()
+
+    def _correct_loop(self) -> None:
+        while not self._stopped.wait(self.interval):
+            if self.leader.status.snapshot.player_state != 'PLAYING':
+                continue
+            try:
+                self.correct()
+            except Exception as error:
+                print(f'Failed to sync the group: {error!r}')
+
+    def _followers(self) -> list[Caster]:
+        return self.casters[1:]
+
+    def _position(self, caster: Caster, now: float) -> float:
+        # a status reflects the device half a round trip before it arrived
+        skew = self.skews[caster.chromecast_name]
+        return caster.status.snapshot.position(now) + self._rate(caster) * skew.latency / 2
+
+    def _reference(self) -> Callable[[float], float]:
+        # the leader's position as a function of time, so every seek is aimed when it's actually sent
+        now = self.clock()
+        position = self._position(self.leader, now)
+        rate = self._rate(self.leader)
+        return lambda at: position + (at - now) * rate
+
+    def _seek(self, caster: Caster, reference: Callable[[float], float]) -> None:
+        # the device starts from the target half a round trip after it's sent
+        skew = self.skews[caster.chromecast_name]
+        caster.seek(reference(self.clock()) + self._rate(self.leader) * skew.latency / 2)
+        caster.commands.flush('seek')
+
+    @staticmethod
+    def _set_rate(caster: Caster, rate: float) -> None:
+        caster.set_playback_rate(rate, remember=False)
+        caster.commands.flush('rate')
+
+    @staticmethod
+    def _rate(caster: Caster) -> float:
+        return caster.status.snapshot.playback_rate or 1
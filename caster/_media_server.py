@@ -0,0 +1,311 @@
+import hashlib
+import mimetypes
+import os
+import re
+import socket
+import threading
+from http import HTTPStatus
+from typing import Optional
+from urllib.parse import quote, unquote
+
+from parsers.abstract_parser import ParseResult
+from utils.http_server_util import DaemonHTTPServer, QuietHTTPHandler
+
+# types the default media receiver plays that mimetypes doesn't know on every platform
+MEDIA_TYPES = {
+    '.mkv': 'video/x-matroska',
+    '.webm': 'video/webm',
+    '.m4v': 'video/mp4',
+    '.mp4': 'video/mp4',
+    '.ts': 'video/mp2t',
+    '.m3u8': 'application/x-mpegURL',
+    '.mpd': 'application/dash+xml',
+    '.flac': 'audio/flac',
+    '.m4a': 'audio/mp4',
+    '.opus': 'audio/ogg',
+    '.vtt': 'text/vtt',
+}
+
+# bytes copied per write when sendfile isn't used
+CHUNK_SIZE = 64 * 1024
+
+_RANGE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def media_type(path: str) -> Optional[str]:
+    '''
+    Gets the MIME type of a media file, None if it isn't a media file
+    '''
+    extension = os.path.splitext(path)[1].lower()
+    mime_type = MEDIA_TYPES.get(extension) or mimetypes.guess_type(path)[0]
+    if not mime_type or mime_type.split('/')[0] not in ('video', 'audio', 'image') and extension not in MEDIA_TYPES:
+        return None
+
+    return mime_type
+
+
+def parse_range(header: Optional[str], size: int) -> Optional[tuple[int, int]]:
+    '''
+    Gets the first and the last byte of a `Range: bytes=` request.
+
+    Returns:
+        The inclusive byte range, None if the whole file is requested.
+
+    Raises:
+        ValueError: If the range can't be satisfied.
+    '''
+    if not header:
+        return None
+
+    # players ask for one range at a time, only the first one of a multi-range request is served
+    match = _RANGE.match(header.split(',')[0].strip())
+    if not match or not any(match.groups()):
+        return None
+
+    start, end = match.groups()
+    if not start:
+        # the last N bytes
+        start, end = max(0, size - int(end)), size - 1
+    else:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+
+    if start >= size or start > end:
+        raise ValueError(f'Range `{header}` is outside of {size} bytes')
+
+    return start, end
+
+
+class MediaServer:
+    '''
+    Serves shared local media files to devices over HTTP.
+
+    Only files that were shared are served, under an id derived from their path,
+    and only files inside of the shared directories can be shared.
+    Byte ranges are supported so devices can seek, file contents are sent with zero-copy `sendfile`,
+    and every connection is handled on its own thread, so several devices can stream at once.
+    The server starts on the first shared file.
+    '''
+
+    def __init__(self, host: str = '0.0.0.0', port: int = 0, advertised_host: Optional[str] = None,
+                 roots: Optional[list[str]] = None, use_sendfile: bool = True) -> None:
+        '''
+        Args:
+            host: The interface to listen on.
+            port: The port to listen on, a free one by default.
+            advertised_host: The address devices reach the server at, the one of the default route by default.
+            roots: Directories files can be shared from, nothing can be shared without them.
+            use_sendfile: Whether to send files with `sendfile` rather than copying them through userspace.
+        '''
+        self.host = host
+        self.port = port
+        self.advertised_host = advertised_host
+        self.roots = [os.path.realpath(root) for root in roots or []]
+        self.use_sendfile = use_sendfile
+
+        self._files: dict[str, str] = {}
+        self._server: Optional[DaemonHTTPServer] = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self) -> None:
+        '''
+        Starts serving on a background thread, if it isn't serving yet
+        '''
+        with self._lock:
+            if self._server:
+                return
+
+            self._server = DaemonHTTPServer((self.host, self.port), _MediaHandler, self)
+            self.port = self._server.server_address[1]
+            threading.Thread(target=self._server.serve_forever, name='media-server', daemon=True).start()
+
+    def stop(self) -> None:
+        '''
+        Stops serving
+        '''
+        with self._lock:
+            server, self._server = self._server, None
+
+        if server:
+            server.shutdown()
+            server.server_close()
+
+    @property
+    def base_url(self) -> str:
+        '''
+        The address devices reach the server at
+        '''
+        return f'http://{self.advertised_host or local_address()}:{self.port}'
+
+    def allowed(self, path: str) -> bool:
+        '''
+        Whether a path is inside of the shared directories, once its links are resolved
+        '''
+        real_path = os.path.realpath(os.path.expanduser(path))
+        return any(os.path.commonpath([root, real_path]) == root for root in self.roots)
+
+    def media_files(self, path: str) -> list[str]:
+        '''
+        Gets the media file at a path, or the media files in a directory and its subdirectories in order.
+        Paths outside of the shared directories have none, whether they exist or not.
+        '''
+        if not self.allowed(path):
+            return []
+        if not os.path.isdir(path):
+            return [path] if media_type(path) else []
+
+        files = []
+        for directory, subdirectories, names in os.walk(path):
+            subdirectories.sort()
+            files += [os.path.join(directory, name) for name in sorted(names)
+                      if media_type(name) and self.allowed(os.path.join(directory, name))]
+
+        return files
+
+    def share(self, path: str) -> ParseResult:
+        '''
+        Makes a local media file available to devices.
+
+        Returns:
+            A video playing the file from the server.
+
+        Raises:
+            ValueError: If the path isn't a media file inside of the shared directories.
+        '''
+        real_path = os.path.realpath(os.path.expanduser(path))
+        mime_type = media_type(real_path)
+        # the same error whether the path exists or not, so it can't be used to probe the disk
+        if not self.allowed(real_path) or not os.path.isfile(real_path) or not mime_type:
+            raise ValueError(f'`{path}` is not a shared media file')
+
+        file_id = hashlib.sha1(real_path.encode()).hexdigest()[:16]
+        with self._lock:
+            self._files[file_id] = real_path
+        self.start()
+
+        name = os.path.basename(real_path)
+        return ParseResult(
+            url=f'{self.base_url}/{file_id}/{quote(name)}',
+            original_url=path,
+            title=os.path.splitext(name)[0],
+            mime_type=mime_type,
+            support_resume=True,
+            links=[])
+
+    def file(self, file_id: str) -> Optional[str]:
+        '''
+        Gets the path of a shared file
+        '''
+        with self._lock:
+            return self._files.get(file_id)
+
+
+class _MediaHandler(QuietHTTPHandler):
+    '''
+    Serves shared files with byte range support over persistent connections,
+    devices seek with new range requests on the same connection
+    '''
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        """Send the headers of a shared file"""
+        self._serve(send_body=False)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Send a shared file or a range of it"""
+        self._serve(send_body=True)
+
+    def _serve(self, send_body: bool) -> None:
+        file_id = unquote(self.path).split('?')[0].strip('/').split('/')[0]
+        path = self.server.owner.file(file_id)
+        if not path or not os.path.isfile(path):
+            self._send_empty(HTTPStatus.NOT_FOUND)
+            return
+
+        with open(path, 'rb') as file:
+            size = os.fstat(file.fileno()).st_size
+            try:
+                byte_range = parse_range(self.headers['Range'], size)
+            except ValueError:
+                self._send_empty(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, {'Content-Range': f'bytes */{size}'})
+                return
+
+            start, end = byte_range or (0, size - 1)
+            self.send_response(HTTPStatus.PARTIAL_CONTENT if byte_range else HTTPStatus.OK)
+            self.send_header('Content-Type', media_type(path))
+            self.send_header('Content-Length', str(end - start + 1))
+            self.send_header('Accept-Ranges', 'bytes')
+            # the default media receiver fetches some media from script, which needs CORS
+            self.send_header('Access-Control-Allow-Origin', '*')
+            if byte_range:
+                self.send_header('Content-Range', f'bytes {start}-{end}/{size}')
+            self.end_headers()
+
+            if send_body:
+                try:
+                    self._send_file(file, start, end - start + 1)
+                # devices drop the connection mid-file whenever they seek
+                except (BrokenPipeError, ConnectionResetError):
+                    self.close_connection = True
+
+    def _send_file(self, file, offset: int, count: int) -> None:
+        if self.server.owner.use_sendfile:
+            self.connection.sendfile(file, offset, count)
+            return
+
+        file.seek(offset)
+        while count > 0:
+            chunk = file.read(min(CHUNK_SIZE, count))
+            if not chunk:
+                break
+            self.wfile.write(chunk)
+            count -= len(chunk)
+
+
+def local_address() -> str:
+    '''
+    Gets the address of the interface with the default route, no packets are sent
+    '''
+    with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as probe:
+        try:
+            probe.connect(('8.8.8.8', 80))
+            return probe.getsockname()[0]
+        except OSError:
+            return '127.0.0.1'
+
+
+_SERVER: Optional[MediaServer] = None
+_SERVER_LOCK = threading.Lock()
+
+
+def get_media_server() -> MediaServer:
+    '''
+    Gets the server shared by all devices.
+    It's configured with `MEDIA_SERVER_PORT`, `MEDIA_SERVER_HOST` and `MEDIA_DIRS`, a list of directories
+    files can be shared from separated by the path separator, no local files are played without it
+    '''
+    global _SERVER  # pylint: disable=global-statement
+    with _SERVER_LOCK:
+        if _SERVER is None:
+            _SERVER = MediaServer(
+                port=int(os.environ.get('MEDIA_SERVER_PORT', 0)),
+                advertised_host=os.environ.get('MEDIA_SERVER_HOST') or None,
+                roots=[root for root in os.environ.get('MEDIA_DIRS', '').split(os.pathsep) if root])
+
+        return _SERVER
+
+
+def shutdown_media_server() -> None:
+    '''
+    Stops the shared server if it was started
+    '''
+    global _SERVER  # pylint: disable=global-statement
+    with _SERVER_LOCK:
+        server, _SERVER = _SERVER, None
+
+    if server:
+        server.stop()
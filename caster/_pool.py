@@ -0,0 +1,140 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional
+
+from caster._caster import Caster
+from caster._group import GroupPlayer
+from caster._relay import StreamRelay
+from parsers.abstract_parser import ParseResult
+from utils.spinner_util import SpinnerUtil
+
+
+class CasterPool:
+    """
+    Connects to several Chromecast devices and routes commands to them.
+
+    A message starting with `@<device name>` goes to that device, `@<device name>` alone
+    makes it the default one for the chat. Other messages go to the chat's default device,
+    or the first configured one.
+    """
+
+    def __init__(self, chromecast_names: list[str], resolver: Callable[[str], Optional[ParseResult]] = None,
+                 relay: StreamRelay = None):
+        """
+        Initializes a Caster for every device.
+
+        Args:
+            chromecast_names: Friendly names of the Chromecast devices to connect to.
+            resolver: A function that parses a url into a video, used to resolve queued urls in advance.
+            relay: A caching proxy the devices play remote streams through.
+        """
+        if not chromecast_names:
+            raise ValueError("`chromecast_names` cannot be empty")
+
+        self.casters: dict[str, Caster] = {name: Caster(name, resolver, relay) for name in chromecast_names}
+        self.connected: list[str] = []
+        self.chat_defaults: dict[object, str] = {}
+        self.group: Optional[GroupPlayer] = None
+        self._lock = threading.Lock()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop_group()
+        for caster in self.casters.values():
+            caster.__exit__(exc_type, exc_value, traceback)
+
+    def connect(self):
+        """
+        Connects to all devices at once, so startup takes as long as the slowest device.
+
+        Raises:
+            RuntimeError: If none of the devices could be connected to.
+        """
+        # one spinner for all devices, it's a single line on the terminal
+        SpinnerUtil.start()
+        try:
+            with ThreadPoolExecutor(max_workers=len(self.casters), thread_name_prefix='connect') as executor:
+                futures = {name: executor.submit(caster.connect) for name, caster in self.casters.items()}
+        finally:
+            SpinnerUtil.stop()
+
+        errors = {}
+        for name, future in futures.items():
+            if future.exception():
+                errors[name] = future.exception()
+                print(f'Failed to connect to {name}: {future.exception()!r}')
+            else:
+                self.connected.append(name)
+
+        if not self.connected:
+            raise RuntimeError(f'Could not connect to any device: {errors}')
+
+    @property
+    def default(self) -> Caster:
+        """
+        The first connected device.
+        """
+        return self.casters[self.connected[0]]
+
+    def play_group(self, video: ParseResult) -> GroupPlayer:
+        """
+        Plays a video on all connected devices in sync, led by the default one.
+
+        Returns:
+            The group, it keeps the devices in sync until it's stopped or another group starts.
+        """
+        self.stop_group()
+        group = GroupPlayer([self.casters[name] for name in self.connected])
+        with self._lock:
+            self.group = group
+
+        group.play(video)
+        return group
+
+    def stop_group(self):
+        """
+        Stops keeping the devices of the current group in sync.
+        """
+        with self._lock:
+            group, self.group = self.group, None
+
+        if group:
+            group.stop()
+
+    def route(self, chat_id: object, text: str) -> tuple[Caster, str]:
+        """
+        Finds the device a message is meant for.
+
+        Args:
+            chat_id: The chat the message came from, chats have their own default devices.
+            text: The message, optionally starting with `@<device name>`.
+
+        Returns:
+            The device and the message without the device prefix,
+            an empty message when the device was just made the chat's default.
+        """
+        if text.startswith('@'):
+            name, command = self._match_device(text[1:])
+            if name:
+                if not command:
+                    with self._lock:
+                        self.chat_defaults[chat_id] = name
+                return self.casters[name], command
+
+        with self._lock:
+            name = self.chat_defaults.get(chat_id)
+
+        return self.casters[name] if name else self.default, text
+
+    def _match_device(self, text: str) -> tuple[Optional[str], str]:
+        lowered = text.lower()
+        # longest names first, so `Living Room TV` isn't taken for `Living Room`
+        for name in sorted(self.connected, key=len, reverse=True):
+            for alias in [name.lower(), name.lower().replace(' ', '_'), name.lower().replace(' ', '')]:
+                rest = lowered[len(alias):]
+                if lowered.startswith(alias) and (not rest or rest[0] == ' '):
+                    return name, text[len(alias):].strip()
+
+        return None, text
@@ -0,0 +1,149 @@
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from parsers.abstract_parser import ParseResult
+from parsers.utils import stream_expiry
+
+
+@dataclass(eq=False)
+class QueueItem:
+    """
+    Class to hold a queued url and its background resolution.
+    """
+    url: str
+    future: Optional[Future] = None
+    refresh_timer: Optional[threading.Timer] = field(default=None, repr=False)
+
+    @property
+    def video(self) -> Optional[ParseResult]:
+        '''
+        The resolved video, None while it's still being resolved or if it failed
+        '''
+        if self.future and self.future.done() and not self.future.exception():
+            return self.future.result()
+        return None
+
+    def result(self, timeout: Optional[float] = None) -> Optional[ParseResult]:
+        '''
+        Waits for the video to be resolved, raises the parser's error if it failed
+        '''
+        return self.future.result(timeout)
+
+
+class PlaybackQueue:
+    '''
+    Queue of urls to play next.
+
+    The next `prefetch` items are resolved in the background, so they start without parsing latency.
+    Resolved streams are re-resolved `refresh_margin` seconds before their urls expire,
+    but not more often than every `min_refresh_interval` seconds.
+    '''
+
+    def __init__(self, resolver: Callable[[str], Optional[ParseResult]], prefetch: int = 2,
+                 refresh_margin: float = 300, min_refresh_interval: float = 30,
+                 clock: Callable[[], float] = time.time) -> None:
+        self.resolver = resolver
+        self.prefetch = prefetch
+        self.refresh_margin = refresh_margin
+        self.min_refresh_interval = min_refresh_interval
+        self.clock = clock
+
+        self._items: list[QueueItem] = []
+        # re-entrant, done callbacks of already finished futures run while it's held
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='queue')
+
+    def enqueue(self, url: str) -> int:
+        '''
+        Adds a url to the end of the queue, returns its position
+        '''
+        with self._lock:
+            self._items.append(QueueItem(url))
+            position = len(self._items)
+            self._prefetch()
+
+        return position
+
+    def pop(self) -> Optional[QueueItem]:
+        '''
+        Takes the next item off the queue and starts resolving the ones behind it
+        '''
+        with self._lock:
+            if not self._items:
+                return None
+
+            item = self._items.pop(0)
+            self._cancel_refresh(item)
+
+            # resolve again if the stream is about to expire
+            if item.video and self._expires_soon(item.video):
+                item.future = None
+            if not item.future:
+                item.future = self._executor.submit(self.resolver, item.url)
+
+            self._prefetch()
+
+        return item
+
+    def clear(self) -> None:
+        '''
+        Removes all items
+        '''
+        with self._lock:
+            for item in self._items:
+                self._cancel_refresh(item)
+                if item.future:
+                    item.future.cancel()
+            self._items.clear()
+
+    def items(self) -> list[QueueItem]:
+        '''
+        Gets queued items
+        '''
+        with self._lock:
+            return list(self._items)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._items)
+
+    def _prefetch(self) -> None:
+        for item in self._items[:self.prefetch]:
+            if not item.future:
+                item.future = self._executor.submit(self.resolver, item.url)
+                item.future.add_done_callback(lambda _, item=item: self._schedule_refresh(item))
+
+    def _schedule_refresh(self, item: QueueItem) -> None:
+        video = item.video
+        expires_at = stream_expiry(video.url) if video else None
+        if not expires_at:
+            return
+
+        delay = max(expires_at - self.refresh_margin - self.clock(), self.min_refresh_interval)
+        timer = threading.Timer(delay, self._refresh, [item])
+        timer.daemon = True
+        with self._lock:
+            if item not in self._items:
+                return
+            item.refresh_timer = timer
+        timer.start()
+
+    def _refresh(self, item: QueueItem) -> None:
+        with self._lock:
+            if item not in self._items:
+                return
+            item.future = self._executor.submit(self.resolver, item.url)
+            item.future.add_done_callback(lambda _: self._schedule_refresh(item))
+
+    def _expires_soon(self, video: ParseResult) -> bool:
+        expires_at = stream_expiry(video.url)
+        return bool(expires_at) and expires_at - self.refresh_margin <= self.clock()
+
+    @staticmethod
+    def _cancel_refresh(item: QueueItem) -> None:
+        if item.refresh_timer:
+            item.refresh_timer.cancel()
+            item.refresh_timer = None
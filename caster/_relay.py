@@ -0,0 +1,470 @@
+import hashlib
+import os
+import re
+import tempfile
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from http import HTTPStatus
+from typing import Callable, Optional
+from urllib.parse import quote, unquote, urljoin, urlparse
+
+import requests
+
+from caster._disk_cache import DiskCache
+from caster._media_server import local_address, media_type, parse_range
+from parsers import utils
+from parsers.abstract_parser import ParseResult
+from parsers.session import get_session
+from utils.http_server_util import DaemonHTTPServer, QuietHTTPHandler
+
+# bytes fetched from upstream per request and cached per file
+BLOCK_SIZE = 1024 * 1024
+# seconds to connect to upstream and to wait for its data
+UPSTREAM_TIMEOUT = (5, 30)
+
+HLS_TYPES = ['application/x-mpegurl', 'application/vnd.apple.mpegurl']
+
+_URI_ATTRIBUTE = re.compile(r'URI="([^"]+)"')
+
+
+class NoRangeSupport(Exception):
+    '''
+    The upstream doesn't serve byte ranges, so the stream can only be passed through
+    '''
+
+
+@dataclass
+class RelayedResource:
+    """
+    Class to hold an upstream url served by the relay.
+
+    Attributes:
+        kind: `stream` for a file fetched in blocks, `playlist` for an HLS playlist, `segment` for an HLS segment.
+        size: The size of a stream, None until it's known.
+        following: Ids of the segments played after this one, prefetched when it's requested.
+    """
+    url: str
+    mime_type: str
+    kind: str
+    size: Optional[int] = None
+    ranges: bool = True
+    following: list[str] = field(default_factory=list)
+
+
+class StreamRelay:
+    '''
+    Local proxy for remote streams, devices play its urls instead of the upstream ones.
+
+    Streams are fetched in blocks of `block_size` bytes and HLS playlists are rewritten so their segments
+    go through the relay too. Blocks and segments are cached on disk, so replays and seeks back are served
+    locally, and the next `prefetch` ones are fetched in the background ahead of the playhead.
+    '''
+
+    def __init__(self, cache: DiskCache, *, host: str = '0.0.0.0', port: int = 0,
+                 advertised_host: Optional[str] = None, prefetch: int = 4, block_size: int = BLOCK_SIZE,
+                 session: Optional[requests.Session] = None) -> None:
+        '''
+        Args:
+            cache: Where fetched blocks and segments are kept.
+            host: The interface to listen on.
+            port: The port to listen on, a free one by default.
+            advertised_host: The address devices reach the relay at, the one of the default route by default.
+            prefetch: Number of blocks or segments fetched ahead of the requested one.
+            block_size: Bytes fetched from upstream at a time.
+            session: The session upstream requests are sent with, the shared one by default.
+        '''
+        self.cache = cache
+        self.host = host
+        self.port = port
+        self.advertised_host = advertised_host
+        self.prefetch = prefetch
+        self.block_size = block_size
+        self.session = session
+
+        self._resources: dict[str, RelayedResource] = {}
+        self._inflight: dict[str, Future] = {}
+        self._server: Optional[DaemonHTTPServer] = None
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max(1, prefetch), thread_name_prefix='relay-prefetch')
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.stop()
+
+    def start(self) -> None:
+        '''
+        Starts serving on a background thread, if it isn't serving yet
+        '''
+        with self._lock:
+            if self._server:
+                return
+
+            self._server = DaemonHTTPServer((self.host, self.port), _RelayHandler, self)
+            self.port = self._server.server_address[1]
+            threading.Thread(target=self._server.serve_forever, name='stream-relay', daemon=True).start()
+
+    def stop(self) -> None:
+        '''
+        Stops serving and prefetching
+        '''
+        with self._lock:
+            server, self._server = self._server, None
+
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        if server:
+            server.shutdown()
+            server.server_close()
+
+    @property
+    def base_url(self) -> str:
+        '''
+        The address devices reach the relay at
+        '''
+        return f'http://{self.advertised_host or local_address()}:{self.port}'
+
+    def relay(self, video: ParseResult) -> str:
+        '''
+        Gets the url a device should play a video from.
+
+        Returns:
+            A relay url, or the video's own url if it's live, local or in a format that can't be relayed.
+        '''
+        parsed_url = urlparse(video.url)
+        is_web = urlparse(video.original_url).scheme in ('http', 'https') and parsed_url.scheme in ('http', 'https')
+        # live playlists change all the time and DASH manifests point at segments relative to themselves
+        if video.is_live or not is_web or parsed_url.path.endswith('.mpd'):
+            return video.url
+
+        is_playlist = (video.mime_type or '').lower() in HLS_TYPES or parsed_url.path.endswith('.m3u8')
+        # the same video keeps its cached blocks when it's resolved to a fresh url
+        resource_id = _resource_id(f'{utils.canonical_id(video.original_url)}|{video.mime_type}')
+        self._register(resource_id, video.url, video.mime_type, 'playlist' if is_playlist else 'stream')
+        self.start()
+
+        return f'{self.base_url}/{resource_id}/{quote(os.path.basename(parsed_url.path) or "stream")}'
+
+    def resource(self, resource_id: str) -> Optional[RelayedResource]:
+        '''
+        Gets a relayed upstream url
+        '''
+        with self._lock:
+            return self._resources.get(resource_id)
+
+    def size(self, resource_id: str) -> int:
+        '''
+        Gets the size of a stream, fetches its first block if it isn't known yet
+
+        Raises:
+            NoRangeSupport: If the upstream doesn't serve byte ranges.
+        '''
+        resource = self.resource(resource_id)
+        if resource.size is None:
+            cached_size = self.cache.get(f'{resource_id}-size')
+            if cached_size:
+                resource.size = int(cached_size)
+            else:
+                # the first block may be cached without its size when that was evicted
+                self.cache.put(f'{resource_id}-0', self._fetch_block(resource_id, resource, 0))
+
+        return resource.size
+
+    def block(self, resource_id: str, index: int) -> bytes:
+        '''
+        Gets a block of a stream and starts prefetching the ones after it
+
+        Raises:
+            NoRangeSupport: If the upstream doesn't serve byte ranges.
+        '''
+        resource = self.resource(resource_id)
+        data = self._load(f'{resource_id}-{index}', lambda: self._fetch_block(resource_id, resource, index))
+
+        last_index = (resource.size - 1) // self.block_size if resource.size else index
+        for following in range(index + 1, min(index + self.prefetch, last_index) + 1):
+            self._prefetch(f'{resource_id}-{following}',
+                           lambda following=following: self._fetch_block(resource_id, resource, following))
+
+        return data
+
+    def segment(self, resource_id: str) -> bytes:
+        '''
+        Gets an HLS segment and starts prefetching the ones after it
+        '''
+        resource = self.resource(resource_id)
+        data = self._load(resource_id, lambda: self.fetch(resource.url).content)
+
+        for following in resource.following:
+            self._prefetch(following, lambda following=following: self.fetch(self.resource(following).url).content)
+
+        return data
+
+    def playlist(self, resource_id: str) -> bytes:
+        '''
+        Gets an HLS playlist with its segments and nested playlists pointing at the relay
+        '''
+        resource = self.resource(resource_id)
+        return self._rewrite(resource, self.fetch(resource.url).text).encode()
+
+    def _register(self, resource_id: str, url: str, mime_type: str, kind: str) -> None:
+        with self._lock:
+            resource = self._resources.get(resource_id)
+            if resource and resource.url == url:
+                return
+
+            self._resources[resource_id] = RelayedResource(url, mime_type, kind, resource.size if resource else None)
+
+    def _rewrite(self, playlist: RelayedResource, text: str) -> str:
+        segments = []
+
+        def relayed(uri: str) -> str:
+            url = urljoin(playlist.url, uri)
+            path = urlparse(url).path
+            kind = 'playlist' if path.endswith('.m3u8') else 'segment'
+            resource_id = _resource_id(url)
+            self._register(resource_id, url, HLS_TYPES[0] if kind == 'playlist' else media_type(path) or 'video/mp2t',
+                           kind)
+            if kind == 'segment':
+                segments.append(resource_id)
+
+            return f'{self.base_url}/{resource_id}/{quote(os.path.basename(path) or kind)}'
+
+        lines = []
+        for line in text.splitlines():
+            if line.strip() and not line.startswith('#'):
+                line = relayed(line.strip())
+            elif line.startswith('#EXT'):
+                # keys, init sections and alternative renditions
+                line = _URI_ATTRIBUTE.sub(lambda match: f'URI="{relayed(match.group(1))}"', line)
+            lines.append(line)
+
+        for index, resource_id in enumerate(segments):
+            self.resource(resource_id).following = segments[index + 1:index + 1 + self.prefetch]
+
+        return '\n'.join(lines) + '\n'
+
+    def fetch(self, url: str, headers: Optional[dict[str, str]] = None, stream: bool = False) -> requests.Response:
+        '''
+        Requests an upstream url
+
+        Raises:
+            requests.RequestException: If the request failed or the upstream responded with an error.
+        '''
+        response = (self.session or get_session()).get(url, headers=headers, timeout=UPSTREAM_TIMEOUT, stream=stream)
+        response.raise_for_status()
+        return response
+
+    def _fetch_block(self, resource_id: str, resource: RelayedResource, index: int) -> bytes:
+        start = index * self.block_size
+        response = self.fetch(resource.url, {'Range': f'bytes={start}-{start + self.block_size - 1}'}, stream=True)
+
+        total = response.headers.get('Content-Range', '').rpartition('/')[2]
+        if response.status_code != HTTPStatus.PARTIAL_CONTENT or not total.isdigit():
+            response.close()
+            resource.ranges = False
+            raise NoRangeSupport(resource.url)
+
+        if resource.size is not None and resource.size != int(total):
+            # resolved to another format, the cached blocks belong to the old one
+            self.cache.discard(f'{resource_id}-')
+        if resource.size != int(total):
+            resource.size = int(total)
+            self.cache.put(f'{resource_id}-size', total.encode())
+
+        return response.content
+
+    def _load(self, key: str, fetch: Callable[[], bytes]) -> bytes:
+        data = self.cache.get(key)
+        if data is not None:
+            return data
+
+        # a block that's being prefetched is waited for rather than fetched twice
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+        if not owner:
+            return future.result(timeout=sum(UPSTREAM_TIMEOUT))
+
+        try:
+            data = fetch()
+            self.cache.put(key, data)
+            future.set_result(data)
+            return data
+        except Exception as exception:
+            future.set_exception(exception)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _prefetch(self, key: str, fetch: Callable[[], bytes]) -> None:
+        with self._lock:
+            if key in self._inflight:
+                return
+        if key in self.cache:
+            return
+
+        try:
+            self._executor.submit(self._load_quietly, key, fetch)
+        except RuntimeError:
+            pass  # the relay is stopping
+
+    def _load_quietly(self, key: str, fetch: Callable[[], bytes]) -> None:
+        if key in self.cache:
+            return
+        try:
+            self._load(key, fetch)
+        except Exception:  # pylint: disable=broad-except
+            pass  # fetched again when the device asks for it
+
+
+class _RelayHandler(QuietHTTPHandler):
+    '''
+    Serves relayed streams from the cache or upstream
+    '''
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        """Send the headers of a relayed stream"""
+        self._serve(send_body=False)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Send a relayed stream or a range of it"""
+        self._serve(send_body=True)
+
+    def _serve(self, send_body: bool) -> None:
+        relay = self.server.owner
+        resource_id = unquote(self.path).split('?')[0].strip('/').split('/')[0]
+        resource = relay.resource(resource_id)
+        if not resource:
+            self._send_empty(HTTPStatus.NOT_FOUND)
+            return
+
+        try:
+            if resource.kind == 'stream' and resource.ranges:
+                self._serve_blocks(resource_id, resource, send_body)
+            elif resource.kind == 'stream':
+                self._serve_upstream(resource, send_body)
+            elif resource.kind == 'playlist':
+                self._serve_bytes(relay.playlist(resource_id), resource.mime_type, send_body)
+            else:
+                self._serve_bytes(relay.segment(resource_id), resource.mime_type, send_body)
+        # devices drop the connection mid-stream whenever they seek
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        except requests.RequestException:
+            self._send_empty(HTTPStatus.BAD_GATEWAY)
+
+    def _serve_blocks(self, resource_id: str, resource: RelayedResource, send_body: bool) -> None:
+        relay = self.server.owner
+        try:
+            size = relay.size(resource_id)
+        except NoRangeSupport:
+            self._serve_upstream(resource, send_body)
+            return
+
+        try:
+            byte_range = parse_range(self.headers['Range'], size)
+        except ValueError:
+            self._send_empty(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, {'Content-Range': f'bytes */{size}'})
+            return
+
+        start, end = byte_range or (0, size - 1)
+        # the first block is fetched before the headers, so a failing upstream is still reported as such
+        first_block = relay.block(resource_id, start // relay.block_size) if send_body else b''
+
+        self._send_headers(HTTPStatus.PARTIAL_CONTENT if byte_range else HTTPStatus.OK, resource.mime_type,
+                           end - start + 1, f'bytes {start}-{end}/{size}' if byte_range else None)
+        if not send_body:
+            return
+
+        try:
+            for index in range(start // relay.block_size, end // relay.block_size + 1):
+                block = first_block if index == start // relay.block_size else relay.block(resource_id, index)
+                block_start = index * relay.block_size
+                self.wfile.write(block[max(start, block_start) - block_start:end + 1 - block_start])
+        except requests.RequestException:
+            # the headers are out, all that's left is to drop the connection
+            self.close_connection = True
+
+    def _serve_bytes(self, data: bytes, mime_type: str, send_body: bool) -> None:
+        try:
+            byte_range = parse_range(self.headers['Range'], len(data))
+        except ValueError:
+            self._send_empty(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE, {'Content-Range': f'bytes */{len(data)}'})
+            return
+
+        start, end = byte_range or (0, len(data) - 1)
+        self._send_headers(HTTPStatus.PARTIAL_CONTENT if byte_range else HTTPStatus.OK, mime_type,
+                           end - start + 1, f'bytes {start}-{end}/{len(data)}' if byte_range else None)
+        if send_body:
+            self.wfile.write(data[start:end + 1])
+
+    def _serve_upstream(self, resource: RelayedResource, send_body: bool) -> None:
+        # nothing to cache without ranges, the device's request is passed through as it is
+        headers = {'Range': self.headers['Range']} if self.headers['Range'] else None
+        with self.server.owner.fetch(resource.url, headers, stream=True) as response:
+            self.send_response(response.status_code)
+            for header in ['Content-Type', 'Content-Length', 'Content-Range', 'Accept-Ranges']:
+                if header in response.headers:
+                    self.send_header(header, response.headers[header])
+            self.send_header('Access-Control-Allow-Origin', '*')
+            if 'Content-Length' not in response.headers:
+                self.close_connection = True
+            self.end_headers()
+
+            if send_body:
+                for chunk in response.iter_content(BLOCK_SIZE // 16):
+                    self.wfile.write(chunk)
+
+    def _send_headers(self, status: HTTPStatus, mime_type: str, length: int, content_range: Optional[str]) -> None:
+        self.send_response(status)
+        self.send_header('Content-Type', mime_type)
+        self.send_header('Content-Length', str(length))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Access-Control-Allow-Origin', '*')
+        if content_range:
+            self.send_header('Content-Range', content_range)
+        self.end_headers()
+
+
+def _resource_id(key: str) -> str:
+    return hashlib.sha1(key.encode()).hexdigest()[:16]
+
+
+_RELAY: Optional[StreamRelay] = None
+_RELAY_LOCK = threading.Lock()
+
+
+def get_stream_relay() -> StreamRelay:
+    '''
+    Gets the relay shared by all devices.
+    It's configured with `RELAY_CACHE_DIR`, `RELAY_CACHE_MB`, `RELAY_PREFETCH`, `RELAY_PORT` and `MEDIA_SERVER_HOST`
+    '''
+    global _RELAY  # pylint: disable=global-statement
+    with _RELAY_LOCK:
+        if _RELAY is None:
+            cache = DiskCache(
+                os.environ.get('RELAY_CACHE_DIR') or os.path.join(tempfile.gettempdir(), 'chromecaster-relay'),
+                int(float(os.environ.get('RELAY_CACHE_MB', 1024)) * 1024 * 1024))
+            _RELAY = StreamRelay(
+                cache,
+                port=int(os.environ.get('RELAY_PORT', 0)),
+                advertised_host=os.environ.get('MEDIA_SERVER_HOST') or None,
+                prefetch=int(os.environ.get('RELAY_PREFETCH', 4)))
+
+        return _RELAY
+
+
+def shutdown_stream_relay() -> None:
+    '''
+    Stops the shared relay if it was created
+    '''
+    global _RELAY  # pylint: disable=global-statement
+    with _RELAY_LOCK:
+        relay, _RELAY = _RELAY, None
+
+    if relay:
+        relay.stop()
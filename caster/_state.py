@@ -1,48 +1,102 @@
 from __future__ import annotations
 
 import json
-from dataclasses import dataclass
+import os
+import re
 from typing import Final
 
-import dacite
+from caster._store import History, StateStore
 
 FILE_LOC: Final[str] = 'settings.json'
 
-@dataclass
+
 class State:
     '''
-    Represents caster's state
+    Represents caster's state, kept in a StateStore
     '''
-    play_rate: float = 1
-    volume: float = 100
-    history: dict[str, float] = None
 
-    def to_json(self) -> str:
+    def __init__(self, store: StateStore) -> None:
+        self.store = store
+        self.history = History(store)
+
+    @property
+    def play_rate(self) -> float:
+        '''
+        The playback rate videos start at
+        '''
+        return self.store.get_setting('play_rate', 1)
+
+    @play_rate.setter
+    def play_rate(self, play_rate: float) -> None:
+        self.store.set_setting('play_rate', play_rate)
+
+    @property
+    def volume(self) -> float:
+        '''
+        The volume level 0-100
+        '''
+        return self.store.get_setting('volume', 100)
+
+    @volume.setter
+    def volume(self, volume: float) -> None:
+        self.store.set_setting('volume', volume)
+
+    @staticmethod
+    def file_loc(chromecast_name: str = None) -> str:
+        '''
+        Gets the state file of a device, `settings.json` when no device is given
+        '''
+        if not chromecast_name:
+            return FILE_LOC
+
+        slug = re.sub(r'[^a-z0-9]+', '_', chromecast_name.lower()).strip('_')
+        return f'settings.{slug}.json'
+
+    @staticmethod
+    def db_loc(chromecast_name: str = None) -> str:
         '''
-        Serializes class to JSON string
+        Gets the state database of a device, next to its state file
         '''
-        return json.dumps(self, default=lambda o: o.__dict__,
-                          sort_keys=True, indent=4)
+        return f'{os.path.splitext(State.file_loc(chromecast_name))[0]}.db'
 
     @staticmethod
-    def init_state() -> State:
+    def init_state(chromecast_name: str = None) -> State:
         '''
-        Populate state from file
+        Opens the state database of a device.
+        A new database is populated from the device's JSON state file, or from the shared `settings.json`.
+        The history is limited with `HISTORY_MAX_SIZE` videos and `HISTORY_MAX_AGE_DAYS`, 0 turns a limit off
         '''
-        with open(FILE_LOC, 'r', encoding='utf-8') as file:
-            settings = file.read()
-            json_object = json.loads(settings)
+        db_loc = State.db_loc(chromecast_name)
+        is_new = not os.path.exists(db_loc)
+        max_entries = int(os.environ.get('HISTORY_MAX_SIZE', 1000))
+        max_age_days = float(os.environ.get('HISTORY_MAX_AGE_DAYS', 0))
+        state = State(StateStore(db_loc, max_entries=max_entries or None,
+                                 max_age=max_age_days * 24 * 3600 or None))
+
+        if is_new:
+            for file_loc in [State.file_loc(chromecast_name), FILE_LOC]:
+                if os.path.exists(file_loc):
+                    state.import_json(file_loc)
+                    break
+
+        return state
 
-            state = dacite.from_dict(
-                data_class=State,
-                data=json_object
-            )
+    def import_json(self, file_loc: str) -> None:
+        '''
+        Copies settings and history from a JSON state file
+        '''
+        with open(file_loc, 'r', encoding='utf-8') as file:
+            json_object = json.loads(file.read())
 
-            return state
+        for key in ['play_rate', 'volume']:
+            if key in json_object:
+                self.store.set_setting(key, json_object[key])
+        # the file's history is keyed by titles, they're matched when the videos are played again
+        self.store.import_titles(json_object.get('history') or {})
+        self.store.flush()
 
     def save_state(self) -> None:
         '''
-        Save state in a file
+        Writes the pending changes and closes the state database
         '''
-        with open(FILE_LOC, 'w', encoding='utf-8') as file:
-            file.write(self.to_json())
+        self.store.close()
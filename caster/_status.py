@@ -0,0 +1,203 @@
+import dataclasses
+import queue
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import pychromecast
+from pychromecast.controllers.media import MediaStatus, MediaStatusListener
+from pychromecast.controllers.receiver import CastStatus, CastStatusListener
+
+# states where nothing plays, requesting status there restarts the renderer app
+INACTIVE_STATES = ['UNKNOWN', 'IDLE']
+
+
+@dataclass(frozen=True)
+class StatusSnapshot:
+    """
+    Class to hold the last known receiver and media status of a device.
+    """
+    device_name: str = ''
+    model_name: str = ''
+    display_name: Optional[str] = None
+    status_text: str = ''
+    volume_level: float = 0
+    player_state: str = 'UNKNOWN'
+    idle_reason: Optional[str] = None
+    title: Optional[str] = None
+    content_id: Optional[str] = None
+    current_time: float = 0
+    duration: Optional[float] = None
+    playback_rate: float = 1
+    media_session_id: Optional[int] = None
+    updated_at: float = 0
+
+    def position(self, now: float) -> float:
+        '''
+        Extrapolates the playback position at `now` from the last media status
+        '''
+        if self.player_state != 'PLAYING':
+            return self.current_time
+
+        position = self.current_time + max(0, now - self.updated_at) * self.playback_rate
+        return min(position, self.duration) if self.duration else position
+
+
+StatusSubscriber = Callable[[StatusSnapshot, StatusSnapshot], None]
+
+
+class StatusTracker(CastStatusListener, MediaStatusListener):
+    '''
+    Keeps an in-memory snapshot of a device's status, updated by pychromecast status events.
+
+    Subscribers are called with the new and the previous snapshot on a dedicated thread, in order.
+    The playback position is extrapolated locally from the last media status, so it doesn't need a round-trip.
+    The device is polled only as a fallback: every `stale_after` seconds of silence while playing,
+    and with an exponential backoff up to `max_poll_interval` while paused.
+    '''
+
+    def __init__(self, stale_after: float = 10, max_poll_interval: float = 60,
+                 clock: Callable[[], float] = time.time) -> None:
+        self.stale_after = stale_after
+        self.max_poll_interval = max_poll_interval
+        self.clock = clock
+
+        self.snapshot = StatusSnapshot()
+        self.cast_device: Optional[pychromecast.Chromecast] = None
+
+        self._subscribers: list[StatusSubscriber] = []
+        self._events: queue.Queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._threads: list[threading.Thread] = []
+
+    def attach(self, cast_device: pychromecast.Chromecast) -> None:
+        '''
+        Starts tracking a connected device
+        '''
+        self.cast_device = cast_device
+        cast_device.register_status_listener(self)
+        cast_device.media_controller.register_status_listener(self)
+
+        self._stopped.clear()
+        self._events = queue.Queue()
+        self._threads = [
+            threading.Thread(target=self._notify_loop, name='status-notify', daemon=True),
+            threading.Thread(target=self._poll_loop, name='status-poll', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+        self._update(device_name=cast_device.name, model_name=cast_device.model_name)
+        if cast_device.status:
+            self.new_cast_status(cast_device.status)
+        self.new_media_status(cast_device.media_controller.status)
+
+    def stop(self) -> None:
+        '''
+        Stops notifying subscribers and polling
+        '''
+        self._stopped.set()
+        self._events.put(None)
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
+        self._threads = []
+
+    def subscribe(self, subscriber: StatusSubscriber) -> Callable[[], None]:
+        '''
+        Calls `subscriber(snapshot, previous)` on every status change, returns a function that unsubscribes it
+        '''
+        with self._lock:
+            self._subscribers.append(subscriber)
+
+        def unsubscribe() -> None:
+            with self._lock:
+                if subscriber in self._subscribers:
+                    self._subscribers.remove(subscriber)
+
+        return unsubscribe
+
+    def position(self) -> float:
+        '''
+        Gets the estimated playback position in seconds
+        '''
+        return self.snapshot.position(self.clock())
+
+    def expect(self, **changes) -> None:
+        '''
+        Applies the effect of a command sent to the device before it reports the status, e.g. `current_time` of a seek
+        '''
+        now = self.clock()
+        # rebase the estimate, so a new rate only applies from now on
+        self._update(**{'current_time': self.snapshot.position(now), 'updated_at': now, **changes})
+
+    def new_cast_status(self, status: CastStatus) -> None:
+        self._update(
+            display_name=status.display_name,
+            status_text=status.status_text,
+            volume_level=status.volume_level)
+
+    def new_media_status(self, status: MediaStatus) -> None:
+        self._update(
+            player_state=status.player_state,
+            idle_reason=status.idle_reason,
+            title=status.title,
+            content_id=status.content_id,
+            current_time=status.current_time,
+            duration=status.duration,
+            playback_rate=status.playback_rate,
+            media_session_id=status.media_session_id,
+            updated_at=self.clock())
+
+    def load_media_failed(self, queue_item_id: int, error_code: int) -> None:
+        print(f'Failed to load media {queue_item_id}: error {error_code}')
+
+    def _update(self, **changes) -> None:
+        with self._lock:
+            previous = self.snapshot
+            self.snapshot = dataclasses.replace(previous, **changes)
+            snapshot = self.snapshot
+
+        self._events.put((snapshot, previous))
+
+    def _notify_loop(self) -> None:
+        while not self._stopped.is_set():
+            event = self._events.get()
+            if event is None:
+                break
+
+            with self._lock:
+                subscribers = list(self._subscribers)
+
+            for subscriber in subscribers:
+                try:
+                    subscriber(*event)
+                except Exception as error:
+                    print(f'Status subscriber failed: {error!r}')
+
+    def _poll_loop(self) -> None:
+        interval = self.stale_after
+        while not self._stopped.wait(interval):
+            snapshot = self.snapshot
+
+            if snapshot.player_state in INACTIVE_STATES:
+                interval = self.stale_after
+                continue
+
+            if snapshot.player_state == 'PLAYING':
+                silence = self.clock() - snapshot.updated_at
+                if silence < self.stale_after:
+                    # events are flowing, check back once they might go stale
+                    interval = self.stale_after - silence
+                    continue
+                interval = self.stale_after
+            else:
+                # while paused nothing changes, so back off
+                interval = min(interval * 2, self.max_poll_interval)
+
+            try:
+                self.cast_device.media_controller.update_status()
+            except Exception as error:
+                print(f'Failed to poll status: {error!r}')
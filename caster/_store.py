@@ -0,0 +1,263 @@
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Optional
+
+from parsers import utils
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS settings (key TEXT PRIMARY KEY, value REAL NOT NULL);
+CREATE TABLE IF NOT EXISTS positions (media_id TEXT PRIMARY KEY, position REAL NOT NULL, updated_at REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS positions_updated_at ON positions (updated_at);
+CREATE TABLE IF NOT EXISTS legacy_history (title TEXT PRIMARY KEY, position REAL NOT NULL);
+'''
+
+# parsers prefix titles with the quality or the source, e.g. `[720p] ` or `[Invidious] `
+_TITLE_PREFIX = re.compile(r'^(\[[^\]]*\]\s*)+')
+
+
+def normalize_title(title: str) -> str:
+    '''
+    Gets a title without parser prefixes, so the same video from different sources matches
+    '''
+    return _TITLE_PREFIX.sub('', title).strip().lower()
+
+
+class StateStore:
+    '''
+    SQLite store of a device's settings and watch history.
+
+    Writes are kept in memory and flushed by a background thread every `flush_interval` seconds
+    in a single transaction, so commands never wait for the disk and a crash loses at most the last interval.
+    Nothing is loaded upfront, entries are read by key when they're needed.
+
+    Positions are keyed by canonical media id. Once there are more than `max_entries` of them,
+    the least recently watched ones are evicted, and ones not watched for `max_age` seconds are too.
+    Positions of title keyed histories are kept apart until a video with a matching title is played.
+    '''
+
+    def __init__(self, path: str, flush_interval: float = 5, max_entries: Optional[int] = 1000,
+                 max_age: Optional[float] = None, clock: Callable[[], float] = time.time) -> None:
+        '''
+        Args:
+            path: The database file, created if it doesn't exist.
+            flush_interval: Seconds between writes of the pending changes.
+            max_entries: Maximum number of positions kept, unbounded when None.
+            max_age: Seconds a position is kept since it was last updated, forever when None.
+            clock: Source of the current unix time entries are stamped with.
+        '''
+        self.path = path
+        self.flush_interval = flush_interval
+        self.max_entries = max_entries
+        self.max_age = max_age
+        self.clock = clock
+
+        self.flushes = 0
+        self.evictions = 0
+
+        self._settings: dict[str, float] = {}
+        self._history: dict[str, tuple[Optional[float], float]] = {}
+        self._lock = threading.Lock()
+        self._closed = threading.Event()
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        # the journal survives a crash mid-write and readers don't block the writer
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript(SCHEMA)
+        self._migrate_title_history()
+
+        self._thread = threading.Thread(target=self._flush_loop, name='state-store', daemon=True)
+        self._thread.start()
+
+    def get_setting(self, key: str, default: float) -> float:
+        '''
+        Gets a setting, `default` if it was never set
+        '''
+        with self._lock:
+            if key in self._settings:
+                return self._settings[key]
+            if self._connection is None:
+                return default
+            row = self._connection.execute('SELECT value FROM settings WHERE key = ?', (key,)).fetchone()
+
+        return row[0] if row else default
+
+    def set_setting(self, key: str, value: float) -> None:
+        '''
+        Changes a setting, it's written with the next flush
+        '''
+        with self._lock:
+            self._settings[key] = value
+
+    def get_position(self, media_id: str) -> Optional[float]:
+        '''
+        Gets the position a video was left at, None if it's not in the history
+        '''
+        with self._lock:
+            if media_id in self._history:
+                return self._history[media_id][0]
+            if self._connection is None:
+                return None
+            row = self._connection.execute(
+                'SELECT position FROM positions WHERE media_id = ?', (media_id,)).fetchone()
+
+        return row[0] if row else None
+
+    def set_position(self, media_id: str, position: Optional[float]) -> None:
+        '''
+        Remembers the position a video was left at, None removes it from the history.
+        It's written with the next flush
+        '''
+        with self._lock:
+            self._history[media_id] = (position, self.clock())
+
+    def count(self) -> int:
+        '''
+        Gets the number of videos in the history
+        '''
+        self.flush()
+        with self._lock:
+            if self._connection is None:
+                return 0
+            return self._connection.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+
+    def import_titles(self, positions: dict[str, float]) -> None:
+        '''
+        Keeps positions of a title keyed history until videos with matching titles are played
+        '''
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO legacy_history VALUES (?, ?)',
+                [(normalize_title(title), position) for title, position in positions.items()])
+
+    def take_title(self, title: str) -> Optional[float]:
+        '''
+        Removes a position of a title keyed history, None if there's none for the title
+        '''
+        with self._lock:
+            if self._connection is None:
+                return None
+            with self._connection:
+                row = self._connection.execute(
+                    'SELECT position FROM legacy_history WHERE title = ?', (normalize_title(title),)).fetchone()
+                if row:
+                    self._connection.execute('DELETE FROM legacy_history WHERE title = ?', (normalize_title(title),))
+
+        return row[0] if row else None
+
+    def flush(self) -> None:
+        '''
+        Writes the pending changes in one transaction
+        '''
+        with self._lock:
+            if self._connection is None or not (self._settings or self._history):
+                return
+
+            settings, self._settings = self._settings, {}
+            history, self._history = self._history, {}
+            try:
+                with self._connection:
+                    self._connection.executemany('INSERT OR REPLACE INTO settings VALUES (?, ?)', settings.items())
+                    self._connection.executemany(
+                        'INSERT OR REPLACE INTO positions VALUES (?, ?, ?)',
+                        [(media_id, position, updated_at) for media_id, (position, updated_at) in history.items()
+                         if position is not None])
+                    self._connection.executemany(
+                        'DELETE FROM positions WHERE media_id = ?',
+                        [(media_id,) for media_id, (position, _) in history.items() if position is None])
+                    self._evict()
+            except sqlite3.Error:
+                # kept for the next flush
+                self._settings, self._history = settings, history
+                raise
+            self.flushes += 1
+
+    def close(self) -> None:
+        '''
+        Writes the pending changes and closes the database, later changes are dropped
+        '''
+        self._closed.set()
+        if self._thread is not threading.current_thread():
+            self._thread.join()
+
+        self.flush()
+        with self._lock:
+            if self._connection:
+                self._connection.close()
+            self._connection = None
+
+    def _evict(self) -> None:
+        if self.max_age is not None:
+            cursor = self._connection.execute(
+                'DELETE FROM positions WHERE updated_at < ?', (self.clock() - self.max_age,))
+            self.evictions += cursor.rowcount
+
+        if self.max_entries is not None:
+            count = self._connection.execute('SELECT COUNT(*) FROM positions').fetchone()[0]
+            if count > self.max_entries:
+                cursor = self._connection.execute(
+                    'DELETE FROM positions WHERE media_id IN '
+                    '(SELECT media_id FROM positions ORDER BY updated_at LIMIT ?)', (count - self.max_entries,))
+                self.evictions += cursor.rowcount
+
+    def _migrate_title_history(self) -> None:
+        # databases before positions were keyed by media id
+        tables = [row[0] for row in self._connection.execute("SELECT name FROM sqlite_master WHERE type = 'table'")]
+        if 'history' not in tables:
+            return
+
+        self.import_titles(dict(self._connection.execute('SELECT title, position FROM history')))
+        with self._connection:
+            self._connection.execute('DROP TABLE history')
+
+    def _flush_loop(self) -> None:
+        while not self._closed.wait(self.flush_interval):
+            try:
+                self.flush()
+            except sqlite3.Error as error:
+                print(f'Failed to save the state: {error!r}')
+
+
+class History:
+    '''
+    Positions videos were left at, keyed by the canonical id of their urls
+    so the same video matches regardless of the mirror or the stream it was played from
+    '''
+
+    def __init__(self, store: StateStore) -> None:
+        self.store = store
+
+    def lookup(self, url: str, title: Optional[str] = None) -> Optional[float]:
+        '''
+        Gets the position a video was left at, falls back to the title keyed history imported from older versions
+        '''
+        position = self.store.get_position(utils.canonical_id(url))
+        if position is None and title:
+            position = self.store.take_title(title)
+            # from now on it's found by the url
+            if position is not None:
+                self[url] = position
+
+        return position
+
+    def __getitem__(self, url: str) -> float:
+        position = self.store.get_position(utils.canonical_id(url))
+        if position is None:
+            raise KeyError(url)
+        return position
+
+    def __setitem__(self, url: str, position: float) -> None:
+        self.store.set_position(utils.canonical_id(url), position)
+
+    def __delitem__(self, url: str) -> None:
+        if url not in self:
+            raise KeyError(url)
+        self.store.set_position(utils.canonical_id(url), None)
+
+    def __contains__(self, url: object) -> bool:
+        return isinstance(url, str) and self.store.get_position(utils.canonical_id(url)) is not None
+
+    def __len__(self) -> int:
+        return self.store.count()
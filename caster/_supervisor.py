@@ -0,0 +1,229 @@
+import random
+import threading
+import time
+from collections import deque
+from functools import partial
+from typing import Callable
+
+import pychromecast
+from pychromecast.error import NotConnected, PyChromecastStopped
+from pychromecast.socket_client import (CONNECTION_STATUS_CONNECTED, CONNECTION_STATUS_DISCONNECTED,
+                                        CONNECTION_STATUS_FAILED, CONNECTION_STATUS_LOST, ConnectionStatus,
+                                        ConnectionStatusListener)
+
+# seconds `stop` waits for a reconnect attempt under way
+STOP_TIMEOUT = 5
+
+# errors meaning the device is gone, not that a command was wrong
+DISCONNECT_ERRORS = (NotConnected, PyChromecastStopped, ConnectionError)
+DISCONNECT_STATUSES = [CONNECTION_STATUS_LOST, CONNECTION_STATUS_DISCONNECTED, CONNECTION_STATUS_FAILED]
+
+
+class ConnectionSupervisor:
+    """
+    Keeps a Caster connected.
+
+    Disconnects are detected from socket connection events and from commands failing with connection errors.
+    pychromecast gets `grace` seconds to restore the socket itself, after that the caster reconnects
+    from scratch with a jittered exponential backoff. Commands issued meanwhile are buffered
+    and replayed in order once the device is back.
+    """
+
+    def __init__(self, reconnect: Callable[[], None], *, grace: float = 5, base_delay: float = 1,
+                 max_delay: float = 60, max_buffer: int = 20, jitter: Callable[[], float] = random.random):
+        """
+        Args:
+            reconnect: Connects to the device from scratch, raises if it fails.
+            grace: Seconds to wait for pychromecast to restore a lost socket by itself.
+            base_delay: Seconds between the first reconnect attempts, doubles after every failure.
+            max_delay: Maximum seconds between reconnect attempts.
+            max_buffer: Maximum number of buffered commands, the oldest ones are dropped.
+            jitter: Source of randomness between 0 and 1 for the backoff.
+        """
+        self.reconnect = reconnect
+        self.grace = grace
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+        self.reconnects = 0
+        self.attempts = 0
+        self.dropped = 0
+        self.downtime = 0.0
+        self.disconnected_at = None
+
+        self._buffer: deque[Callable[[], object]] = deque(maxlen=max_buffer)
+        # a buffered command is running, it's no longer in the buffer but newer commands still wait for it
+        self._replaying = False
+        self._device = None
+        self._connected: threading.Event = threading.Event()
+        self._stopped: threading.Event = threading.Event()
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def watch(self, cast_device: pychromecast.Chromecast) -> None:
+        """
+        Starts watching a freshly connected device.
+        """
+        with self._lock:
+            self._device = cast_device
+        cast_device.register_connection_listener(_DeviceWatcher(self, cast_device))
+        self._connected.set()
+
+    def stop(self) -> None:
+        """
+        Stops reconnecting.
+        """
+        self._stopped.set()
+        # the thread is a daemon, an attempt still connecting doesn't hold up the shutdown
+        if self._thread and self._thread is not threading.current_thread():
+            self._thread.join(STOP_TIMEOUT)
+
+    def call(self, command: Callable, *args, **kwargs) -> bool:
+        """
+        Runs a command now, or buffers it until the device is reconnected.
+
+        Returns:
+            True if the command ran, False if it was buffered.
+        """
+        with self._lock:
+            # keep the order while buffered commands are being replayed
+            if not self._connected.is_set() or self._buffer or self._replaying:
+                self._append(partial(command, *args, **kwargs))
+                return False
+
+        try:
+            command(*args, **kwargs)
+            return True
+        except DISCONNECT_ERRORS as error:
+            with self._lock:
+                self._append(partial(command, *args, **kwargs))
+            self.disconnected(repr(error))
+            return False
+
+    def disconnected(self, reason: str) -> None:
+        """
+        Marks the device as disconnected and starts reconnecting.
+        """
+        with self._lock:
+            # not connected means a reconnect is already under way, or the device was never connected
+            if self._stopped.is_set() or not self._connected.is_set():
+                return
+
+            self._connected.clear()
+            self.disconnected_at = time.monotonic()
+            print(f'Lost connection to the device ({reason}), reconnecting')
+
+            self._thread = threading.Thread(target=self._supervise, name='reconnect', daemon=True)
+            self._thread.start()
+
+    def on_connection_status(self, cast_device: pychromecast.Chromecast, status: ConnectionStatus) -> None:
+        """
+        Handles socket events of a watched device.
+        """
+        with self._lock:
+            if cast_device is not self._device:
+                return  # an old device being torn down
+
+        if status.status == CONNECTION_STATUS_CONNECTED:
+            self._connected.set()
+        elif status.status in DISCONNECT_STATUSES:
+            self.disconnected(status.status)
+
+    def metrics(self) -> dict[str, float]:
+        """
+        Gets reconnect counters, downtime in seconds includes the ongoing one.
+        """
+        with self._lock:
+            downtime = self.downtime
+            if self.disconnected_at is not None:
+                downtime += time.monotonic() - self.disconnected_at
+
+            return {
+                'connected': self._connected.is_set(),
+                'reconnects': self.reconnects,
+                'attempts': self.attempts,
+                'downtime': downtime,
+                'buffered': len(self._buffer),
+                'dropped': self.dropped,
+            }
+
+    def _append(self, command: Callable[[], object]) -> None:
+        if len(self._buffer) == self._buffer.maxlen:
+            self.dropped += 1
+        self._buffer.append(command)
+
+    def _supervise(self) -> None:
+        while self._reconnect():
+            with self._lock:
+                self.reconnects += 1
+                self.downtime += time.monotonic() - self.disconnected_at
+                self.disconnected_at = None
+            metrics = self.metrics()
+            print(f"Reconnected to the device: {metrics['reconnects']} reconnects, {metrics['attempts']} attempts, "
+                  f"{metrics['downtime']:.1f}s down, {metrics['buffered']} commands to replay, {metrics['dropped']} dropped")
+
+            if self._replay():
+                return
+
+            # a buffered command found the device gone again
+            with self._lock:
+                self._connected.clear()
+                self.disconnected_at = time.monotonic()
+
+    def _reconnect(self) -> bool:
+        # pychromecast retries a lost socket by itself, give it a chance first
+        if self._connected.wait(self.grace):
+            return True
+
+        attempt = 0
+        while not self._stopped.is_set():
+            attempt += 1
+            with self._lock:
+                self.attempts += 1
+            try:
+                self.reconnect()
+                return True
+            except Exception as error:
+                delay = self._backoff(attempt)
+                print(f'Reconnect attempt {attempt} failed ({error!r}), retrying in {delay:.1f}s')
+                self._stopped.wait(delay)
+
+        return False
+
+    def _replay(self) -> bool:
+        while True:
+            with self._lock:
+                if not self._buffer:
+                    self._replaying = False
+                    return True
+                command = self._buffer.popleft()
+                self._replaying = True
+
+            try:
+                command()
+            except DISCONNECT_ERRORS:
+                with self._lock:
+                    self._buffer.appendleft(command)
+                    self._replaying = False
+                return False
+            except Exception as error:
+                print(f'Buffered command failed: {error!r}')
+
+    def _backoff(self, attempt: int) -> float:
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+        # equal jitter, so devices that dropped together don't retry in lockstep
+        return delay / 2 + self.jitter() * delay / 2
+
+
+class _DeviceWatcher(ConnectionStatusListener):
+    """
+    Forwards socket events of one device to the supervisor.
+    """
+
+    def __init__(self, supervisor: ConnectionSupervisor, cast_device: pychromecast.Chromecast):
+        self.supervisor = supervisor
+        self.cast_device = cast_device
+
+    def new_connection_status(self, status: ConnectionStatus) -> None:
+        self.supervisor.on_connection_status(self.cast_device, status)
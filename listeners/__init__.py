@@ -1,16 +1,15 @@
 
-from typing import ItemsView
-
 from listeners import ntfy_listener, telegram_listener
 from listeners.abstract_listener import AbstractListener
 
 
 def get_listeners(config:dict) -> list[AbstractListener]:
     '''
-    Gets a list of available listeners
+    Gets a list of the listeners that are configured
     '''
-    return [
-        # ntfy_listener.NTFYListener(config),
-        # _TODO: figure out python async future call blocking
-        telegram_listener.TelegramListener(config)
-    ]
+    listeners = []
+    if config.get('TELEGRAM_BOT_TOKEN'):
+        listeners.append(telegram_listener.TelegramListener(config))
+    if config.get('NTFY_CHANNEL'):
+        listeners.append(ntfy_listener.NTFYListener(config))
+    return listeners
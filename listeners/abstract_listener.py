@@ -14,17 +14,24 @@ class MessageResult:
     Attributes:
         text (str): The message returned by the listener.
         extra (object, optional): Optional extra data returned by the listener. Defaults to None.
+        chat_id (object, optional): The conversation the message belongs to, if the listener has several. Defaults to None.
     """
     text: str
     extra: Optional[object] = None
     options: Optional[list[str]] = None
     video: Optional[ParseResult] = None
+    chat_id: Optional[object] = None
 
 class AbstractListener(ABC):
     '''
     Abstract listener
+
+    Attributes:
+        blocking (bool): Whether `start` blocks its event loop while listening, such listeners run in a thread.
     '''
 
+    blocking: bool = False
+
     @abstractmethod
     def __init__(self, config) -> None:
         pass
@@ -40,3 +47,20 @@ class AbstractListener(ABC):
         '''
         Listen to a message, call handler on message
         '''
+
+    def send_live(self, message: MessageResult, status: str = '') -> None:
+        '''
+        Send a message with a status line that `update_live` keeps up to date, where the listener can edit messages
+        '''
+        self.send(MessageResult(f'{message.text}\n{status}' if status else message.text, message.extra,
+                                message.options, message.video, message.chat_id))
+
+    def update_live(self, chat_id: object, status: str) -> None:
+        '''
+        Update the status line of the chat's last live message
+        '''
+
+    def stop(self) -> None:
+        '''
+        Stop listening, `start` returns soon after
+        '''
@@ -0,0 +1,145 @@
+import base64
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from parsers.abstract_parser import ParseResult
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS callbacks (token TEXT PRIMARY KEY, payload TEXT NOT NULL, used_at REAL NOT NULL);
+CREATE INDEX IF NOT EXISTS callbacks_used_at ON callbacks (used_at);
+'''
+
+# 72 bits, leaves room in the 64 bytes of callback data for a prefix
+TOKEN_BYTES = 9
+
+
+@dataclass
+class CallbackPayload:
+    """
+    Class to hold what a button press sends back to the handler.
+
+    Attributes:
+        text (str): The message the press stands for, e.g. `rp <url>` or a time code to resume at.
+        command (str, optional): The option the button belongs to. Defaults to None.
+        video (ParseResult, optional): The video the button was made for, so it isn't parsed again. Defaults to None.
+    """
+    text: str
+    command: Optional[str] = None
+    video: Optional[ParseResult] = None
+
+    def to_json(self) -> str:
+        '''
+        Serializes the payload to a JSON string
+        '''
+        return json.dumps({
+            'text': self.text,
+            'command': self.command,
+            'video': self.video.__dict__ if self.video else None,
+        }, sort_keys=True)
+
+    @staticmethod
+    def from_json(data: str) -> 'CallbackPayload':
+        '''
+        Deserializes a payload from a JSON string
+        '''
+        payload = json.loads(data)
+        video = payload.get('video')
+        if video:
+            # JSON turns the (title, url) tuples into lists
+            links = video.get('links')
+            video = ParseResult(**dict(video, links=[tuple(link) for link in links] if links is not None else None))
+        return CallbackPayload(payload['text'], payload.get('command'), video)
+
+
+class CallbackStore:
+    '''
+    SQLite store of inline button payloads behind short tokens.
+
+    Telegram only keeps 64 bytes of callback data with a button, which a url alone often doesn't fit in.
+    Buttons carry a token derived from their payload instead, so the same payload always gets the same token.
+    Payloads unused for `ttl` seconds are evicted, and the least recently used ones once there are more
+    than `max_entries`. The store is a file, buttons of earlier messages keep working after a restart.
+    '''
+
+    def __init__(self, path: str, max_entries: int = 1000, ttl: Optional[float] = 7 * 24 * 3600,
+                 clock: Callable[[], float] = time.time) -> None:
+        '''
+        Args:
+            path: The database file, created if it doesn't exist.
+            max_entries: Maximum number of payloads kept.
+            ttl: Seconds a payload is kept since it was last used, forever when None.
+            clock: Source of the current unix time.
+        '''
+        self.path = path
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.executescript(SCHEMA)
+
+    def put(self, payload: CallbackPayload) -> str:
+        '''
+        Stores a payload, returns the token it's found by
+        '''
+        data = payload.to_json()
+        token = base64.urlsafe_b64encode(hashlib.sha256(data.encode()).digest()[:TOKEN_BYTES]).decode()
+
+        with self._lock, self._connection:
+            self._connection.execute('INSERT OR REPLACE INTO callbacks VALUES (?, ?, ?)',
+                                     (token, data, self.clock()))
+            self._evict()
+
+        return token
+
+    def get(self, token: str) -> Optional[CallbackPayload]:
+        '''
+        Gets the payload of a token, None if it was evicted or never stored
+        '''
+        now = self.clock()
+        with self._lock, self._connection:
+            row = self._connection.execute('SELECT payload, used_at FROM callbacks WHERE token = ?',
+                                           (token,)).fetchone()
+            if not row or self.ttl is not None and row[1] < now - self.ttl:
+                self.misses += 1
+                return None
+
+            self._connection.execute('UPDATE callbacks SET used_at = ? WHERE token = ?', (now, token))
+            self.hits += 1
+
+        return CallbackPayload.from_json(row[0])
+
+    def count(self) -> int:
+        '''
+        Gets the number of payloads kept
+        '''
+        with self._lock:
+            return self._connection.execute('SELECT COUNT(*) FROM callbacks').fetchone()[0]
+
+    def close(self) -> None:
+        '''
+        Closes the database
+        '''
+        with self._lock:
+            self._connection.close()
+
+    def _evict(self) -> None:
+        evicted = 0
+        if self.ttl is not None:
+            evicted += self._connection.execute('DELETE FROM callbacks WHERE used_at < ?',
+                                                (self.clock() - self.ttl,)).rowcount
+        evicted += self._connection.execute(
+            'DELETE FROM callbacks WHERE token IN (SELECT token FROM callbacks ORDER BY used_at DESC LIMIT -1 OFFSET ?)',
+            (self.max_entries,)).rowcount
+        self.evictions += evicted
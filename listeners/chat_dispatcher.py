@@ -0,0 +1,116 @@
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Callable
+
+
+class ChatDispatcher:
+    '''
+    Runs message handlers on a bounded pool of workers.
+
+    Messages of a chat are handled one at a time in the order they arrived, different chats are handled
+    in parallel. A chat's next message goes to the back of the pool's queue, so a busy chat doesn't hold
+    a worker while other chats wait. Once `max_pending` messages are waiting, `dispatch` blocks
+    the listener for up to `timeout` seconds and then rejects the message.
+    '''
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 100, timeout: float = 10) -> None:
+        '''
+        Args:
+            max_workers: Number of messages handled at once.
+            max_pending: Number of dispatched messages not handled yet before new ones have to wait.
+            timeout: Seconds a message waits for room before it's rejected.
+        '''
+        self.max_pending = max_pending
+        self.timeout = timeout
+
+        self.submitted = 0
+        self.completed = 0
+        self.throttled = 0
+        self.rejected = 0
+        self.peak_pending = 0
+
+        self._queues: dict[object, deque[Callable[[], None]]] = {}
+        self._pending = 0
+        self._condition = threading.Condition()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='dispatch')
+
+    def dispatch(self, chat_id: object, handler: Callable, *args) -> bool:
+        '''
+        Queues `handler(*args)` behind the chat's earlier messages
+
+        Returns:
+            False if the message was rejected because too many are waiting.
+        '''
+        with self._condition:
+            if self._pending >= self.max_pending:
+                self.throttled += 1
+                if not self._condition.wait_for(lambda: self._pending < self.max_pending, self.timeout):
+                    self.rejected += 1
+                    return False
+
+            self._pending += 1
+            self.submitted += 1
+            self.peak_pending = max(self.peak_pending, self._pending)
+
+            queue = self._queues.get(chat_id)
+            is_idle = queue is None
+            if is_idle:
+                queue = self._queues[chat_id] = deque()
+            queue.append(partial(handler, *args))
+
+        # a chat that's already being handled picks the message up itself
+        if is_idle:
+            self._executor.submit(self._run_next, chat_id)
+
+        return True
+
+    def depth(self, chat_id: object) -> int:
+        '''
+        Gets the number of messages of a chat that are waiting or being handled
+        '''
+        with self._condition:
+            return len(self._queues.get(chat_id) or [])
+
+    def stats(self) -> dict[str, int]:
+        '''
+        Gets the queue depth and counters of dispatched, handled, delayed and rejected messages
+        '''
+        with self._condition:
+            return {
+                'pending': self._pending,
+                'peak_pending': self.peak_pending,
+                'chats': len(self._queues),
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'throttled': self.throttled,
+                'rejected': self.rejected,
+            }
+
+    def shutdown(self) -> None:
+        '''
+        Stops handling messages, the ones still waiting are dropped
+        '''
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def _run_next(self, chat_id: object) -> None:
+        with self._condition:
+            handler = self._queues[chat_id][0]
+
+        try:
+            handler()
+        except Exception as error:
+            print(f'Failed to handle a message from {chat_id}: {error!r}')
+
+        with self._condition:
+            queue = self._queues[chat_id]
+            queue.popleft()
+            if not queue:
+                del self._queues[chat_id]
+            self._pending -= 1
+            self.completed += 1
+            self._condition.notify_all()
+
+        if queue:
+            self._executor.submit(self._run_next, chat_id)
@@ -1,34 +1,86 @@
-
-
-from typing import Callable
+import json
+import socket
+import threading
+from typing import Callable, Optional
 
 import ntfpy
-from ntfpy.types.message import NTFYMessage
+import requests
 
 from listeners.abstract_listener import AbstractListener, MessageResult
 
+# seconds to wait for the server to accept the subscription
+CONNECT_TIMEOUT = 10
+# replies are published to the topic the commands come from, the tag tells them apart
+REPLY_TAG = 'chromecast-reply'
+
 
 class NTFYListener(AbstractListener):
     '''
     NTFY Listener
     '''
 
+    # the subscription is read with blocking requests
+    blocking = True
+
     def __init__(self, config: dict) -> None:
         server = ntfpy.NTFYServer("https://ntfy.sh")
         self.client = ntfpy.NTFYClient(server, config['NTFY_CHANNEL'])
 
+        self._response: Optional[requests.Response] = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
     def send(self, message: MessageResult) -> None:
         '''
         Sends message
         '''
-        self.client.send(message.text)
+        self.client.send(message.text, tags=[REPLY_TAG])
 
     async def start(self, handler: Callable[[AbstractListener, MessageResult], None]) -> None:
         '''
-        Starts listening
+        Starts listening, returns once `stop` is called or the server ends the subscription
         '''
+        # ntfpy's subscription can't be interrupted, the stream is read here so `stop` can shut it down
+        self._stopped.clear()
+        response = requests.get(f'{self.client.server.url}/{self.client.topic}/json', stream=True,
+                                timeout=(CONNECT_TIMEOUT, None))
+        with self._lock:
+            self._response = response
 
-        def _callback(message: NTFYMessage) -> None:
-            handler(message.message, self)
+        try:
+            # stopped while the subscription was being opened
+            if self._stopped.is_set():
+                return
+
+            for line in response.iter_lines():
+                if self._stopped.is_set():
+                    return
+                if not line:
+                    continue
+
+                event = json.loads(line)
+                # the subscription echoes the bot's own replies, they aren't commands
+                if event.get('event') == 'message' and REPLY_TAG not in (event.get('tags') or []):
+                    handler(self, MessageResult(event.get('message', '')))
+        except requests.RequestException:
+            if not self._stopped.is_set():
+                raise
+        finally:
+            with self._lock:
+                self._response = None
+            response.close()
+
+    def stop(self) -> None:
+        '''
+        Stops listening without waiting for the next message
+        '''
+        self._stopped.set()
+        with self._lock:
+            response = self._response
 
-        await self.client.subscribe(_callback)
+        if response:
+            try:
+                # closing the response doesn't wake up the thread reading it, shutting its socket down does
+                response.raw.connection.sock.shutdown(socket.SHUT_RDWR)
+            except (AttributeError, OSError):
+                pass
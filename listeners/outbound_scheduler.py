@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Hashable, Optional
+
+
+class TokenBucket:
+    '''
+    Allows `rate` actions a second on average and bursts of up to `capacity` actions
+    '''
+
+    def __init__(self, rate: float, capacity: float, now: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def delay(self, now: float) -> float:
+        '''
+        Gets the seconds until an action is allowed, 0 if it's allowed now
+        '''
+        self._refill(now)
+        return 0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def take(self, now: float) -> None:
+        '''
+        Spends a token on an action
+        '''
+        self._refill(now)
+        self.tokens -= 1
+
+    def _refill(self, now: float) -> None:
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class _Job:
+    def __init__(self, send: Callable[[], None], key: Optional[Hashable]) -> None:
+        self.send = send
+        self.key = key
+
+
+class OutboundScheduler:
+    '''
+    Sends messages on a background thread within a global and a per-chat rate limit.
+
+    Messages of a chat go out in order, chats take turns so a busy one doesn't hold up the others.
+    A message submitted with a key replaces the one with the same key that's still waiting, so a message
+    that's updated over and over is only sent in its latest form.
+    '''
+
+    def __init__(self, rate: float = 30, chat_rate: float = 1, chat_burst: float = 3,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        '''
+        Args:
+            rate: Messages a second to all chats.
+            chat_rate: Messages a second to a chat.
+            chat_burst: Messages sent to a chat at once before its rate applies.
+            clock: Source of monotonic time.
+        '''
+        self.rate = rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.clock = clock
+
+        self.sent = 0
+        self.replaced = 0
+        self.failed = 0
+
+        self._bucket = TokenBucket(rate, max(1, rate), clock())
+        self._chat_buckets: dict[Hashable, TokenBucket] = {}
+        self._chats: OrderedDict[Hashable, deque[_Job]] = OrderedDict()
+        self._keyed: dict[Hashable, _Job] = {}
+        self._stopped = False
+        self._condition = threading.Condition()
+        self._thread: threading.Thread = None
+
+    def submit(self, chat_id: Hashable, send: Callable[[], None], key: Optional[Hashable] = None) -> None:
+        '''
+        Queues `send` behind the chat's earlier messages, or in place of the waiting one with the same key
+        '''
+        with self._condition:
+            if self._stopped:
+                return
+
+            job = self._keyed.get(key) if key is not None else None
+            if job:
+                job.send = send
+                self.replaced += 1
+                return
+
+            job = _Job(send, key)
+            if key is not None:
+                self._keyed[key] = job
+            self._chats.setdefault(chat_id, deque()).append(job)
+
+            if not self._thread:
+                self._thread = threading.Thread(target=self._run, name='outbound', daemon=True)
+                self._thread.start()
+            self._condition.notify()
+
+    def pending(self) -> int:
+        '''
+        Gets the number of messages waiting to be sent
+        '''
+        with self._condition:
+            return sum(len(jobs) for jobs in self._chats.values())
+
+    def stop(self) -> None:
+        '''
+        Stops sending, the messages still waiting are dropped
+        '''
+        with self._condition:
+            self._stopped = True
+            self._chats.clear()
+            self._keyed.clear()
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                job = self._next()
+                if not job:
+                    return
+
+            try:
+                job.send()
+            except Exception as error:
+                with self._condition:
+                    self.failed += 1
+                print(f'Failed to send a message: {error!r}')
+
+    def _next(self) -> Optional[_Job]:
+        while not self._stopped:
+            now = self.clock()
+            wait = self._bucket.delay(now)
+            if not wait:
+                waits = {chat_id: self._chat_bucket(chat_id, now).delay(now) for chat_id in self._chats}
+                chat_id = next((chat_id for chat_id, chat_wait in waits.items() if not chat_wait), None)
+                if chat_id is not None:
+                    return self._take(chat_id, now)
+                wait = min(waits.values(), default=None)
+
+            self._condition.wait(wait)
+
+        return None
+
+    def _take(self, chat_id: Hashable, now: float) -> _Job:
+        self._bucket.take(now)
+        self._chat_buckets[chat_id].take(now)
+        self.sent += 1
+
+        jobs = self._chats.pop(chat_id)
+        job = jobs.popleft()
+        # the chat goes to the back of the line
+        if jobs:
+            self._chats[chat_id] = jobs
+        if job.key is not None:
+            del self._keyed[job.key]
+
+        return job
+
+    def _chat_bucket(self, chat_id: Hashable, now: float) -> TokenBucket:
+        bucket = self._chat_buckets.get(chat_id)
+        if not bucket:
+            bucket = self._chat_buckets[chat_id] = TokenBucket(self.chat_rate, self.chat_burst, now)
+        return bucket
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+from typing import Callable
+
+from listeners.abstract_listener import AbstractListener, MessageResult
+
+
+class ListenerSupervisor:
+    '''
+    Runs listeners side by side on one event loop.
+
+    Listeners that block while listening get a thread of their own. A listener that crashes or stops
+    by itself is started again after an exponential backoff, which resets once it has been listening for
+    `healthy_after` seconds. `stop` shuts all of them down together.
+    '''
+
+    def __init__(self, listeners: list[AbstractListener], *, base_delay: float = 1, max_delay: float = 60,
+                 healthy_after: float = 60, stop_timeout: float = 5,
+                 clock: Callable[[], float] = time.monotonic) -> None:
+        '''
+        Args:
+            listeners: Listeners to run.
+            base_delay: Seconds before the first restart of a listener, doubles after every quick failure.
+            max_delay: Maximum seconds before a restart.
+            healthy_after: Seconds a listener has to run for its backoff to reset.
+            stop_timeout: Seconds to wait for the listeners to stop before leaving them behind.
+            clock: Source of monotonic time.
+        '''
+        self.listeners = listeners
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.healthy_after = healthy_after
+        self.stop_timeout = stop_timeout
+        self.clock = clock
+
+        self.restarts = {_name(listener): 0 for listener in listeners}
+
+        self._loop: asyncio.AbstractEventLoop = None
+        self._stopping: asyncio.Event = None
+
+    async def run(self, handler: Callable[[AbstractListener, MessageResult], None]) -> None:
+        '''
+        Runs the listeners until `stop` is called or the task is cancelled
+        '''
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        tasks = [asyncio.create_task(self._supervise(listener, handler), name=_name(listener))
+                 for listener in self.listeners]
+
+        try:
+            await self._stopping.wait()
+        finally:
+            self._stopping.set()
+            await self._shutdown(tasks)
+
+    def stop(self) -> None:
+        '''
+        Stops all listeners, can be called from any thread
+        '''
+        if self._loop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    async def _supervise(self, listener: AbstractListener, handler: Callable) -> None:
+        name = _name(listener)
+        attempt = 0
+
+        while not self._stopping.is_set():
+            started = self.clock()
+            try:
+                await self._start(listener, handler)
+                if self._stopping.is_set():
+                    return
+                print(f'{name} stopped listening')
+            except Exception as error:
+                if self._stopping.is_set():
+                    return
+                print(f'{name} crashed: {error!r}')
+
+            attempt = 1 if self.clock() - started >= self.healthy_after else attempt + 1
+            delay = min(self.max_delay, self.base_delay * 2 ** (attempt - 1))
+            print(f'Restarting {name} in {delay:.1f}s')
+            try:
+                await asyncio.wait_for(self._stopping.wait(), delay)
+            except asyncio.TimeoutError:
+                self.restarts[name] += 1
+
+    async def _start(self, listener: AbstractListener, handler: Callable) -> None:
+        if not listener.blocking:
+            await listener.start(handler)
+            return
+
+        # the listener runs its own event loop in a thread, so it can block it without holding up the others
+        done = self._loop.create_future()
+
+        def finish(error: BaseException = None) -> None:
+            if done.done():
+                return
+            if error:
+                done.set_exception(error)
+            else:
+                done.set_result(None)
+
+        def listen() -> None:
+            error = None
+            try:
+                asyncio.run(listener.start(handler))
+            except BaseException as exception:  # pylint: disable=broad-exception-caught
+                error = exception
+            if not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(finish, error)
+
+        threading.Thread(target=listen, name=_name(listener), daemon=True).start()
+        await done
+
+    async def _shutdown(self, tasks: list[asyncio.Task]) -> None:
+        for listener in self.listeners:
+            try:
+                listener.stop()
+            except Exception as error:
+                print(f'Failed to stop {_name(listener)}: {error!r}')
+
+        # a listener that doesn't stop in time is left behind, its thread doesn't keep the app running
+        if not tasks:
+            return
+        _, pending = await asyncio.wait(tasks, timeout=self.stop_timeout)
+        for task in pending:
+            print(f'{task.get_name()} did not stop in time')
+            task.cancel()
+        if pending:
+            await asyncio.wait(pending)
+
+
+def _name(listener: AbstractListener) -> str:
+    return type(listener).__name__
@@ -1,10 +1,20 @@
 
 
-from typing import Callable
+import secrets
+import threading
+from dataclasses import dataclass
+from functools import partial
+from typing import Callable, Optional
+from urllib.parse import urlparse
 
 from telebot import TeleBot, types
 
 from listeners.abstract_listener import AbstractListener, MessageResult
+from listeners.callback_store import CallbackPayload, CallbackStore
+from listeners.chat_dispatcher import ChatDispatcher
+from listeners.outbound_scheduler import OutboundScheduler
+from listeners.webhook_server import WebhookServer
+from parsers.abstract_parser import ParseResult
 
 OPTIONS = {
     'play_rate': {
@@ -32,48 +42,121 @@ OPTIONS = {
     }
 }
 
+BUSY_MESSAGE = 'Too many commands are waiting, try again in a moment'
+EXPIRED_MESSAGE = 'This button has expired, send the command again'
+
+# callback data of buttons whose payload is in the CallbackStore
+TOKEN_PREFIX = '#'
+
+
+@dataclass(eq=False)
+class _LiveMessage:
+    '''
+    A chat's message whose status line is edited in place
+    '''
+    chat_id: int
+    text: str
+    markup: types.InlineKeyboardMarkup
+    status: str = ''
+    message_id: Optional[int] = None
+    shown: Optional[str] = None
+
+    @property
+    def content(self) -> str:
+        '''
+        The text with the latest status line
+        '''
+        return f'{self.text}\n{self.status}' if self.status else self.text
+
 
 class TelegramListener(AbstractListener):
     '''
-    Telegram bot listener
+    Telegram bot listener, messages are handled on a ChatDispatcher so a slow one only holds up its own chat.
+
+    Updates are long polled, unless `TELEGRAM_WEBHOOK_URL` is set, then Telegram posts them to a local
+    WebhookServer the url leads to. Replies go out through an OutboundScheduler that keeps them under
+    Telegram's rate limits.
     '''
 
+    # telebot polls with blocking requests, the webhook server blocks until it's stopped
+    blocking = True
+
     bot: TeleBot
+    dispatcher: ChatDispatcher
+    outbound: OutboundScheduler
+    callbacks: CallbackStore
+    webhook: Optional[WebhookServer] = None
 
     def __init__(self, config: dict) -> None:
         self.bot = TeleBot(config['TELEGRAM_BOT_TOKEN'])
+        self.dispatcher = ChatDispatcher(
+            max_workers=int(config.get('TELEGRAM_WORKERS', 4)),
+            max_pending=int(config.get('TELEGRAM_MAX_PENDING', 100)))
+        # Telegram allows about 30 messages a second in all and 1 a second to a chat, with short bursts
+        self.outbound = OutboundScheduler(
+            rate=float(config.get('TELEGRAM_RATE', 30)),
+            chat_rate=float(config.get('TELEGRAM_CHAT_RATE', 1)))
+
+        self.callbacks = CallbackStore(
+            config.get('TELEGRAM_CALLBACK_DB', 'callbacks.db'),
+            max_entries=int(config.get('TELEGRAM_CALLBACK_MAX_SIZE', 1000)))
+
+        self._live: dict[int, _LiveMessage] = {}
+        self._live_lock = threading.Lock()
+
+        self.webhook_url = config.get('TELEGRAM_WEBHOOK_URL')
+        if self.webhook_url:
+            self.webhook = WebhookServer(
+                self._on_update,
+                config.get('TELEGRAM_WEBHOOK_SECRET') or secrets.token_urlsafe(32),
+                host=config.get('TELEGRAM_WEBHOOK_HOST', '0.0.0.0'),
+                port=int(config.get('TELEGRAM_WEBHOOK_PORT', 8443)),
+                path=urlparse(self.webhook_url).path)
 
     def send(self, message: MessageResult) -> None:
         '''
         Handle message that was sent back to the listener
         '''
-        markup = types.InlineKeyboardMarkup(row_width=3)
-        buttons = []
-        if message.options:
-            buttons += [self._add_button(f'🧭 {option}', option) for option in message.options]
+        chat_id = message.extra.chat.id
+        self.outbound.submit(chat_id, partial(
+            self._send_message, chat_id, message.text, message.extra.id, self._markup(message)))
 
-        if message.video:
-            buttons.append(self._add_button(
-                OPTIONS['replay']['message'],
-                f'rp {message.video.original_url}', 'replay'))
+    def send_live(self, message: MessageResult, status: str = '') -> None:
+        '''
+        Sends a message whose status line is then edited in place, the chat's previous one isn't edited anymore
+        '''
+        chat_id = message.extra.chat.id
+        live = _LiveMessage(chat_id, message.text, self._markup(message), status)
+        with self._live_lock:
+            self._live[chat_id] = live
 
-        markup.add(*buttons)
-        try:
-            self.bot.send_message(message.extra.chat.id,
-                                  message.text,
-                                  reply_to_message_id=message.extra.id,
-                                  reply_markup=markup,
-                                  parse_mode="MarkdownV2",
-                                  disable_web_page_preview=True)
-        except Exception as error:
-            self.bot.send_message(message.extra.chat.id, repr(error))
+        def send() -> None:
+            sent = self._send_message(chat_id, live.content, message.extra.id, live.markup)
+            if sent:
+                live.message_id = sent.message_id
+                live.shown = live.content
+
+        self.outbound.submit(chat_id, send)
+
+    def update_live(self, chat_id: object, status: str) -> None:
+        '''
+        Edits the status line of the chat's live message, unchanged ones aren't edited
+        '''
+        with self._live_lock:
+            live = self._live.get(chat_id)
+            if not live or live.status == status:
+                return
+            live.status = status
+
+        # an edit that's still waiting is replaced, only the latest status is sent
+        self.outbound.submit(chat_id, partial(self._edit_live, live), key=live)
 
     async def start(self, handler: Callable[[AbstractListener, MessageResult], None]) -> None:
         '''
         Starts listening
         '''
 
-        print('TelegramListener is listening ...')
+        print(f'TelegramListener is listening {"on a webhook" if self.webhook else "by polling"} ...')
 
         ########################
         # Message Endpoints
@@ -87,23 +170,30 @@ class TelegramListener(AbstractListener):
 
             message = call.data
             option = None
-            if ';' in message:
+            video = None
+            if message.startswith(TOKEN_PREFIX):
+                payload = self.callbacks.get(message[len(TOKEN_PREFIX):])
+                if not payload:
+                    self._answer(call, EXPIRED_MESSAGE)
+                    return
+                message, option, video = payload.text, payload.command, payload.video
+            elif ';' in message:
                 option, message, *_ = message.split(';')
 
             if option and option == 'close':
                 parent_message = [int(item) for item in message.split(':')]
-                self.bot.delete_message(*parent_message)
+                self._submit(parent_message[0], self.bot.delete_message, *parent_message)
                 # self.bot.edit_message_reply_markup(call.message.chat.id, call.message.message_id, reply_markup=None)
-                self.bot.delete_message(call.message.chat.id, call.message.message_id)
+                self._submit(call.message.chat.id, self.bot.delete_message, call.message.chat.id, call.message.message_id)
             else:
-                handler(self, MessageResult(message, call.message))
+                self._dispatch(handler, MessageResult(message, call.message, video=video, chat_id=call.message.chat.id))
 
             if option:
                 callback_message = OPTIONS[option]['callback_message'].format(message)
             else:
                 callback_message = message
 
-            self.bot.answer_callback_query(call.id, text=callback_message)
+            self._answer(call, callback_message)
 
         @ self.bot.message_handler(func=self._commands_filter)
         def message_commands(message: types.Message):
@@ -122,7 +212,8 @@ class TelegramListener(AbstractListener):
                         callback_data=f'close;{message.chat.id}:{message.message_id}'
                     ))
 
-                    self.bot.send_message(
+                    self._submit(
+                        message.chat.id, self.bot.send_message,
                         message.chat.id, option['message'],
                         reply_markup=markup
                     )
@@ -133,9 +224,87 @@ class TelegramListener(AbstractListener):
             '''
             Handles user messages to the telegram bot that weren't handled previously
             '''
-            handler(self, MessageResult(message.text, message))
+            self._dispatch(handler, MessageResult(message.text, message, chat_id=message.chat.id))
+
+        if self.webhook:
+            # listen before Telegram is told where to post
+            self.webhook.start()
+            self.bot.set_webhook(url=self.webhook_url, secret_token=self.webhook.secret)
+            self.webhook.serve()
+        else:
+            # updates can't be polled while a webhook is set
+            self.bot.remove_webhook()
+            self.bot.infinity_polling()
+
+    def stop(self) -> None:
+        '''
+        Stops receiving and handling messages
+        '''
+        if self.webhook:
+            self.webhook.stop()
+        else:
+            self.bot.stop_polling()
+        self.dispatcher.shutdown()
+        self.outbound.stop()
+        self.callbacks.close()
+
+    def _on_update(self, update: dict) -> None:
+        # the same handlers as polled updates
+        self.bot.process_new_updates([types.Update.de_json(update)])
+
+    def _dispatch(self, handler: Callable[[AbstractListener, MessageResult], None], result: MessageResult) -> None:
+        # waits while the workers are saturated, which also holds off polling for more updates
+        if not self.dispatcher.dispatch(result.chat_id, handler, self, result):
+            self._submit(result.chat_id, self.bot.send_message, result.chat_id, BUSY_MESSAGE,
+                         reply_to_message_id=result.extra.id)
+
+    def _submit(self, chat_id: int, method: Callable, *args, **kwargs) -> None:
+        # every Bot API call to a chat waits for its turn in the rate limits
+        self.outbound.submit(chat_id, partial(method, *args, **kwargs))
 
-        self.bot.infinity_polling()
+    def _answer(self, call: types.CallbackQuery, text: str) -> None:
+        # answers stop the button's spinner and aren't chat messages, queued behind them they'd miss their window
+        self.bot.answer_callback_query(call.id, text=text)
+
+    def _send_message(self, chat_id: int, text: str, reply_to: int,
+                      markup: types.InlineKeyboardMarkup) -> Optional[types.Message]:
+        try:
+            return self.bot.send_message(chat_id,
+                                         text,
+                                         reply_to_message_id=reply_to,
+                                         reply_markup=markup,
+                                         parse_mode="MarkdownV2",
+                                         disable_web_page_preview=True)
+        except Exception as error:
+            self._submit(chat_id, self.bot.send_message, chat_id, repr(error))
+            return None
+
+    def _edit_live(self, live: _LiveMessage) -> None:
+        content = live.content
+        # the message failed to send, or the status changed back before the edit went out
+        if live.message_id is None or content == live.shown:
+            return
+
+        self.bot.edit_message_text(content, live.chat_id, live.message_id,
+                                   reply_markup=live.markup,
+                                   parse_mode="MarkdownV2",
+                                   disable_web_page_preview=True)
+        live.shown = content
+
+    def _markup(self, message: MessageResult) -> types.InlineKeyboardMarkup:
+        markup = types.InlineKeyboardMarkup(row_width=3)
+        buttons = []
+        if message.options:
+            buttons += [self._add_button(f'🧭 {option}', option, video=message.video) for option in message.options]
+
+        if message.video:
+            # the replay button plays the video it was made for without parsing it again
+            buttons.append(self._add_button(
+                OPTIONS['replay']['message'],
+                f'rp {message.video.original_url}', 'replay', message.video))
+
+        markup.add(*buttons)
+        return markup
 
     def _commands_filter(self, message: types.Message) -> bool:
         if not message.text.startswith('/'):
@@ -145,11 +314,12 @@ class TelegramListener(AbstractListener):
         command = message.text.split()[0][1:].lower()
         return command in commands
 
-    def _add_button(self, label: str, message: str, command: str = None) -> types.InlineKeyboardButton:
-        if command:
-            data = f"{command};{message}"[:64]
-        else:
-            data = message
+    def _add_button(self, label: str, message: str, command: str = None,
+                    video: ParseResult = None) -> types.InlineKeyboardButton:
+        data = f"{command};{message}" if command else message
+        # Telegram keeps 64 bytes of callback data, longer payloads and videos are kept server-side
+        if video or len(data.encode()) > 64 or data.startswith(TOKEN_PREFIX):
+            data = TOKEN_PREFIX + self.callbacks.put(CallbackPayload(message, command, video))
 
         return types.InlineKeyboardButton(
             text=label,
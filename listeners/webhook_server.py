@@ -0,0 +1,142 @@
+import hmac
+import json
+import threading
+from http import HTTPStatus
+from typing import Callable
+
+from utils.http_server_util import DaemonHTTPServer, QuietHTTPHandler
+
+# header Telegram puts the webhook's secret token in
+SECRET_HEADER = 'X-Telegram-Bot-Api-Secret-Token'
+
+# updates are small, anything larger isn't from Telegram
+MAX_BODY = 1024 * 1024
+
+
+class WebhookServer:
+    '''
+    Receives webhook updates over HTTP and passes them on as parsed JSON.
+
+    Requests without the secret token are turned away before their body is read. Every connection gets
+    a thread and is kept alive between updates, so bursts from several parallel connections are taken
+    as they come. `on_update` runs on the connection's thread and should hand the work off quickly.
+    '''
+
+    def __init__(self, on_update: Callable[[dict], None], secret: str, host: str = '0.0.0.0', port: int = 0,
+                 path: str = '/') -> None:
+        '''
+        Args:
+            on_update: Called with every update.
+            secret: Token the requests have to carry in the secret token header.
+            host: Address to listen on.
+            port: Port to listen on, 0 picks a free one.
+            path: Path updates are posted to.
+        '''
+        self.on_update = on_update
+        self.secret = secret
+        self.host = host
+        self.port = port
+        self.path = '/' + path.strip('/')
+
+        self.received = 0
+        self.rejected = 0
+
+        self._server: DaemonHTTPServer = None
+        self._stopped = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self) -> None:
+        '''
+        Starts listening on a background thread, if it isn't listening yet
+        '''
+        with self._lock:
+            if self._server:
+                return
+
+            # Telegram opens up to 40 connections at once
+            self._server = DaemonHTTPServer((self.host, self.port), _WebhookHandler, self, queue_size=64)
+            self.port = self._server.server_address[1]
+            self._stopped.clear()
+            threading.Thread(target=self._server.serve_forever, name='webhook', daemon=True).start()
+
+    def serve(self) -> None:
+        '''
+        Listens until `stop` is called
+        '''
+        self.start()
+        self._stopped.wait()
+
+    def stop(self) -> None:
+        '''
+        Stops listening
+        '''
+        with self._lock:
+            server, self._server = self._server, None
+
+        if server:
+            server.shutdown()
+            server.server_close()
+        self._stopped.set()
+
+    def authorized(self, token: str) -> bool:
+        '''
+        Whether a request carries the webhook's secret, compared in constant time
+        '''
+        return hmac.compare_digest((token or '').encode(), self.secret.encode())
+
+    def record_received(self) -> None:
+        '''
+        Counts an update that was taken
+        '''
+        with self._lock:
+            self.received += 1
+
+    def record_rejected(self) -> None:
+        '''
+        Counts a request turned down for a missing or wrong secret
+        '''
+        with self._lock:
+            self.rejected += 1
+
+
+class _WebhookHandler(QuietHTTPHandler):
+    '''
+    Takes updates posted to the webhook path
+    '''
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Pass an update on"""
+        webhook = self.server.owner
+
+        if self.path.split('?')[0] != webhook.path:
+            self._reply(HTTPStatus.NOT_FOUND)
+            return
+        if not webhook.authorized(self.headers.get(SECRET_HEADER)):
+            webhook.record_rejected()
+            self._reply(HTTPStatus.FORBIDDEN)
+            return
+
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY:
+            self._reply(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+            return
+
+        try:
+            update = json.loads(self.rfile.read(length))
+        except ValueError:
+            self._reply(HTTPStatus.BAD_REQUEST)
+            return
+
+        webhook.record_received()
+        try:
+            webhook.on_update(update)
+        except Exception as error:
+            print(f'Failed to handle a webhook update: {error!r}')
+        # Telegram resends updates that fail, which wouldn't go any better the second time
+        self._reply(HTTPStatus.OK)
+
+    def _reply(self, status: HTTPStatus) -> None:
+        # the connection is only kept when the request body was read
+        if status != HTTPStatus.OK:
+            self.close_connection = True
+        self._send_empty(status)
@@ -1,35 +1,126 @@
 import asyncio
 import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import partial
+from typing import Callable, Optional
 
 from pychromecast.error import NotConnected
 
-from caster import Caster
+from caster import (Caster, CasterPool, get_media_server, get_stream_relay, shutdown_media_server,
+                    shutdown_stream_relay)
+from caster._status import StatusSnapshot
 from listeners import get_listeners
 from listeners.abstract_listener import AbstractListener, MessageResult
+from listeners.supervisor import ListenerSupervisor
 from parsers import get_parser_for_url
+from parsers.abstract_parser import ParseResult
+from parsers.browser_pool import shutdown_browser_pool
+from parsers.cache import STREAM_CACHE
+from parsers.resolver import resolve
 from utils.string_utils import StringUtils
 
 VIDEO_PLAY_THRESHOLD = 30
+QUEUE_COMMANDS = ['queue', 'next', 'clear']
+GROUP_COMMAND = 'group'
+RECONNECTING_MESSAGE = '_Reconnecting to the device, the command will run once it is back_'
 
+# parses urls as soon as they arrive, while the devices are busy with earlier commands
+RESOLVE_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='resolve')
+
+# the device and video a chat's live now playing message follows
+LIVE_STATUS: dict[tuple[AbstractListener, object], tuple[Caster, ParseResult]] = {}
+LIVE_STATUS_LOCK = threading.Lock()
+
+
+def _resolve_video(url: str, on_error: Callable[[Exception], None] = None,
+                   known: ParseResult = None) -> Optional[ParseResult]:
+    # local files are played from the built-in media server
+    path = _shared_path(url)
+    if path:
+        return get_media_server().share(path)
+
+    # reuse a stream that was resolved recently and hasn't expired yet
+    video = STREAM_CACHE.get(url)
+
+    # or the one a button was made for, unless its stream has expired since
+    if not video and known and known.original_url == url:
+        STREAM_CACHE.put(url, known)
+        video = STREAM_CACHE.get(url)
 
-def _play_video(caster: Caster, listener: AbstractListener, url: str, result: MessageResult) -> None:
     # pass it to the parsers to get the video
-    for parser in get_parser_for_url(url):
-        try:
-            video = parser.parse(url)
-            if video:
-                break
-        except Exception as exception:
-            listener.send(MessageResult(StringUtils.escape_markdown(repr(exception)), result.extra))
+    if not video:
+        # race all eligible parsers unless it's turned off
+        parallel = os.environ.get('PARALLEL_PARSING', '1') != '0'
+        video = resolve(url, get_parser_for_url(url), on_error, parallel=parallel)
+        STREAM_CACHE.put(url, video)
+
+    return video
+
+
+def _shared_path(text: str) -> Optional[str]:
+    # paths outside of `MEDIA_DIRS` are taken for plain text, like missing ones, so chats can't probe the disk
+    path = StringUtils.find_local_path(text)
+    return path if path and get_media_server().allowed(path) else None
+
+
+def _find_source(text: str) -> Optional[str]:
+    # a url or a shared local file or directory
+    return StringUtils.find_url(text) or _shared_path(text)
+
+
+def _local_files(source: str) -> list[str]:
+    # the media files of a local directory are played one after another
+    path = _shared_path(source)
+    return get_media_server().media_files(path) if path else [source]
+
+
+def _error_reporter(listener: AbstractListener, result: MessageResult) -> Callable[[Exception], None]:
+    def on_error(exception: Exception) -> None:
+        listener.send(MessageResult(StringUtils.escape_markdown(repr(exception)), result.extra))
+
+    return on_error
+
+
+def _send_now_playing(caster: Caster, listener: AbstractListener, message: MessageResult, chat_id: object) -> None:
+    # the message's status line follows the device until another video plays
+    with LIVE_STATUS_LOCK:
+        LIVE_STATUS[(listener, chat_id)] = (caster, message.video)
+    listener.send_live(message, caster.status_line())
+
+
+def _update_live_status(caster: Caster, snapshot: StatusSnapshot, _: StatusSnapshot) -> None:
+    status = caster.status_line(snapshot)
+    with LIVE_STATUS_LOCK:
+        for (listener, chat_id), (following, video) in list(LIVE_STATUS.items()):
+            if following is not caster:
+                continue
+            if caster.current_video is not video:
+                del LIVE_STATUS[(listener, chat_id)]
+                continue
+            listener.update_live(chat_id, status)
+
+
+def _play_video(caster: Caster, listener: AbstractListener, url: str, result: MessageResult,
+                resolving: Future = None) -> None:
+    if resolving:
+        video = resolving.result()
+    else:
+        video = _resolve_video(url, _error_reporter(listener, result), result.video)
+
+    # looked up before the video starts and its new position is tracked
+    start_at = None
+    if video and video.support_resume and not video.is_live:
+        start_at = caster.state.history.lookup(video.original_url, video.title)
 
     try:
         if video:
             caster.play(video)
         else:
             raise Exception("No video to play")
-    # if there's another app interrupting, reconnect to the device
+    # the connection supervisor reconnects to the device and replays the command
     except NotConnected:
-        caster.play(video)
+        raise
     # debug on client side
     except Exception as exception:
         listener.send(MessageResult(StringUtils.escape_markdown(repr(exception)), result.extra))
@@ -37,15 +128,132 @@ def _play_video(caster: Caster, listener: AbstractListener, url: str, result: Me
 
     options = []
     now_playing = caster.now_playing(video)
-    if video.support_resume and not video.is_live:
-        if video.title in caster.state.history:
-            start_at = caster.state.history[video.title]
-            if start_at > VIDEO_PLAY_THRESHOLD and (not video.duration or start_at <= video.duration - VIDEO_PLAY_THRESHOLD):
-                time_code = StringUtils.seconds_to_timestamp(start_at)
-                now_playing += f"\n_You didn't finish watching this video last time and stopped at `{time_code}`\\. Resume?_"
-                options.append(time_code)
+    if start_at is not None:
+        if start_at > VIDEO_PLAY_THRESHOLD and (not video.duration or start_at <= video.duration - VIDEO_PLAY_THRESHOLD):
+            time_code = StringUtils.seconds_to_timestamp(start_at)
+            now_playing += f"\n_You didn't finish watching this video last time and stopped at `{time_code}`\\. Resume?_"
+            options.append(time_code)
 
-    listener.send(MessageResult(now_playing, result.extra, options, video))
+    _send_now_playing(caster, listener, MessageResult(now_playing, result.extra, options, video), result.chat_id)
+
+
+def _handle_queue(caster: Caster, listener: AbstractListener, command: str, url: str, result: MessageResult) -> None:
+    if command == 'next':
+        try:
+            video = caster.play_next()
+        except Exception as exception:
+            listener.send(MessageResult(StringUtils.escape_markdown(repr(exception)), result.extra))
+            return
+
+        if video:
+            _send_now_playing(caster, listener, MessageResult(caster.now_playing(video), result.extra, video=video),
+                              result.chat_id)
+        else:
+            listener.send(MessageResult('_The queue is empty_', result.extra))
+    elif command == 'clear':
+        caster.clear_queue()
+        listener.send(MessageResult('_The queue is cleared_', result.extra))
+    elif url:
+        positions = [caster.enqueue(source) for source in _local_files(url)]
+        if not positions:
+            listener.send(MessageResult('_No media files to queue_', result.extra))
+            return
+        listener.send(MessageResult(f'_Queued at position {positions[0]}_', result.extra))
+    else:
+        items = caster.list_queue()
+        lines = [f'{index}\\. {StringUtils.escape_markdown(item.video.title if item.video else item.url)}'
+                 for index, item in enumerate(items, start=1)]
+        listener.send(MessageResult(str.join('\n', lines) or '_The queue is empty_', result.extra))
+
+
+def _handle_group(pool: CasterPool, listener: AbstractListener, result: MessageResult) -> None:
+    # `group <url>` plays on all devices in sync, `group stop` stops syncing them, `group` reports their skew
+    url = _find_source(result.text)
+    argument = result.text.lstrip('/')[len(GROUP_COMMAND):].strip().lower()
+
+    if url:
+        video = _resolve_video(url, _error_reporter(listener, result))
+        if not video:
+            listener.send(MessageResult('_No video to play_', result.extra))
+            return
+        pool.play_group(video)
+        listener.send(MessageResult(pool.default.now_playing(video), result.extra, video=video))
+    elif argument == 'stop':
+        pool.stop_group()
+        listener.send(MessageResult('_Devices play on their own now_', result.extra))
+    elif pool.group:
+        listener.send(MessageResult(StringUtils.escape_markdown(pool.group.report()), result.extra))
+    else:
+        listener.send(MessageResult('_No group is playing_', result.extra))
+
+
+def _play_directory(caster: Caster, listener: AbstractListener, url: str, result: MessageResult) -> None:
+    files = _local_files(url)
+    if not files:
+        listener.send(MessageResult('_No media files to play_', result.extra))
+        return
+    for path in files[1:]:
+        caster.enqueue(path)
+    _play_video(caster, listener, files[0], result)
+
+
+def _start_resolving(caster: Caster, listener: AbstractListener, result: MessageResult) -> Optional[Future]:
+    # only urls that are going to be played right away, the queue resolves its own
+    url = _find_source(result.text)
+    command = result.text.lstrip('/').split(' ')[0].lower()
+    if not url or command in QUEUE_COMMANDS or os.path.isdir(url):
+        return None
+    if result.text == f'rp {url}' and caster.current_video and caster.current_video.original_url == url:
+        return None
+
+    return RESOLVE_EXECUTOR.submit(_resolve_video, url, _error_reporter(listener, result), result.video)
+
+
+def _on_command_done(listener: AbstractListener, result: MessageResult, future: Future) -> None:
+    if future.cancelled():
+        return
+    if future.exception():
+        listener.send(MessageResult(StringUtils.escape_markdown(repr(future.exception())), result.extra))
+    elif future.result() is False:
+        listener.send(MessageResult(RECONNECTING_MESSAGE, result.extra))
+
+
+def _handle_message(caster: Caster, listener: AbstractListener, result: MessageResult,
+                    resolving: Future = None) -> None:
+    url = _find_source(result.text)
+    number = StringUtils.get_float(result.text)
+    seconds = StringUtils.timestamp_to_seconds(result.text)
+    skip_seconds = StringUtils.extract_number(result.text)
+    command = result.text.lstrip('/').split(' ')[0].lower()
+
+    # playback queue: `queue <url>` adds, `queue` lists, `next` plays the next one, `clear` empties it
+    if command in QUEUE_COMMANDS:
+        _handle_queue(caster, listener, command, url, result)
+    # replaying a video, if this is a currently playing video
+    # then restart it skipping video parsing
+    elif url and result.text == f'rp {url}':
+        if caster.current_video and caster.current_video.original_url == url:
+            caster.play()
+        else:
+            _play_video(caster, listener, url, result, resolving)
+    # local directory was provided, play its first media file and queue the rest
+    elif url and os.path.isdir(url):
+        _play_directory(caster, listener, url, result)
+    # video url or local file was provided, parse and play
+    elif url:
+        _play_video(caster, listener, url, result, resolving)
+    # time code was provided
+    elif seconds:
+        caster.seek(seconds)
+    # FF or rewind
+    elif skip_seconds:
+        caster.skip(skip_seconds)
+    # volume or play rate
+    elif number >= 0:
+        if 0.5 <= number <= 2:  # 0.5 - 2 - play rate
+            caster.set_playback_rate(number)
+        else:  # 0 - 100 - volume
+            caster.set_volume(number)
 
 
 def main():
@@ -53,43 +261,52 @@ def main():
     Entry point of the app
     '''
 
-    with Caster(os.environ.get('CHROMECAST_DEVICE')) as caster:
-        caster.connect()
+    # a comma separated list of devices, the first one is the default
+    device_names = os.environ.get('CHROMECAST_DEVICES') or os.environ.get('CHROMECAST_DEVICE') or ''
+    device_names = [name.strip() for name in device_names.split(',') if name.strip()]
 
-        caster.start_debug_thread()
+    listeners = get_listeners(dict(os.environ))
+    if not listeners:
+        raise Exception('No listeners are configured, set TELEGRAM_BOT_TOKEN or NTFY_CHANNEL')
+
+    # play remote streams through a local caching proxy
+    relay = get_stream_relay() if os.environ.get('STREAM_RELAY', '0') != '0' else None
+
+    with CasterPool(device_names, _resolve_video, relay) as pool:
+        pool.connect()
+
+        pool.default.start_status_display()
+        for caster in pool.casters.values():
+            caster.status.subscribe(partial(_update_live_status, caster))
 
         def on_callback(listener: AbstractListener, result: MessageResult) -> None:
             """
-            Handles messages from a listener
+            Handles messages from a listener, `@<device name>` prefix picks the device
             """
-            url = StringUtils.find_url(result.text)
-            number = StringUtils.get_float(result.text)
-            seconds = StringUtils.timestamp_to_seconds(result.text)
-            skip_seconds = StringUtils.extract_number(result.text)
-
-            # replaying a video, if this is a currently playing video
-            # then restart it skipping video parsing
-            if url and result.text == f'rp {url}':
-                if caster.current_video and caster.current_video.original_url == url:
-                    caster.play()
-                else:
-                    _play_video(caster, listener, url, result)
-            # video url was provided, parse and play
-            elif url:
-                _play_video(caster, listener, url, result)
-            # time code was provided
-            elif seconds:
-                caster.seek(seconds)
-            # FF or rewind
-            elif skip_seconds:
-                caster.skip(skip_seconds)
-            # volume or play rate
-            elif number >= 0:
-                if 0.5 <= number <= 2:  # 0.5 - 2 - play rate
-                    caster.set_playback_rate(number)
-                else:  # 0 - 100 - volume
-                    caster.set_volume(number)
-
-        for listener in get_listeners(dict(os.environ)):
-            loop = asyncio.get_event_loop()
-            loop.run_until_complete(listener.start(handler=on_callback))
+            caster, text = pool.route(result.chat_id, result.text)
+            if not text:
+                listener.send(MessageResult(f'_Commands go to {StringUtils.escape_markdown(caster.chromecast_name)} now_', result.extra))
+                return
+
+            message = MessageResult(text, result.extra, video=result.video, chat_id=result.chat_id)
+            # group playback involves all devices, so it runs off the device command threads
+            if text.lstrip('/').split(' ')[0].lower() == GROUP_COMMAND:
+                future = RESOLVE_EXECUTOR.submit(_handle_group, pool, listener, message)
+                future.add_done_callback(lambda done: _on_command_done(listener, message, done))
+                return
+
+            # parsing doesn't need the device, so it overlaps with the commands still running on it
+            resolving = _start_resolving(caster, listener, message)
+            # don't hold up the listener while the device is busy, reply once the command is done
+            future = caster.submit(caster.supervisor.call, _handle_message, caster, listener, message, resolving)
+            future.add_done_callback(lambda done: _on_command_done(listener, message, done))
+
+        try:
+            # all listeners run at once, restarted if they crash, until the app is interrupted
+            asyncio.run(ListenerSupervisor(listeners).run(on_callback))
+        finally:
+            RESOLVE_EXECUTOR.shutdown(wait=False, cancel_futures=True)
+            # quit the warm browsers along with the caster
+            shutdown_browser_pool()
+            shutdown_media_server()
+            shutdown_stream_relay()
@@ -0,0 +1,176 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Iterator, Optional
+
+from selenium import webdriver
+
+
+def create_browser() -> webdriver.Chrome:
+    '''
+    Starts a headless Chrome browser
+    '''
+    options = webdriver.ChromeOptions()
+    options.add_argument('headless')
+    return webdriver.Chrome(options=options)
+
+
+@dataclass
+class PooledBrowser:
+    """
+    Class to hold a browser and the number of pages it has loaded.
+    """
+    driver: Any
+    base_handle: str
+    pages: int = 0
+
+
+class BrowserPool:
+    '''
+    A bounded pool of warm headless browsers.
+
+    Every parse gets its own tab, browsers are recycled after `max_pages` pages
+    or when a page's JS heap grows past `max_memory_mb`.
+    Callers wait in line when all browsers are busy.
+    '''
+
+    def __init__(self, max_size: int = 2, max_pages: int = 50, max_memory_mb: float = 512,
+                 acquire_timeout: float = 60, factory: Callable[[], Any] = create_browser) -> None:
+        self.max_size = max_size
+        self.max_pages = max_pages
+        self.max_memory_mb = max_memory_mb
+        self.acquire_timeout = acquire_timeout
+        self.factory = factory
+
+        self._idle: list[PooledBrowser] = []
+        self._total = 0
+        self._closed = False
+        self._condition = threading.Condition()
+
+    @contextmanager
+    def page(self) -> Iterator[Any]:
+        '''
+        Borrows a browser switched to a fresh tab, the tab is closed afterwards
+        '''
+        browser = self._acquire()
+        discard = True
+        try:
+            browser.driver.switch_to.new_window('tab')
+            yield browser.driver
+            discard = self._close_tab(browser)
+        finally:
+            self._release(browser, discard)
+
+    def shutdown(self) -> None:
+        '''
+        Quits all idle browsers, busy ones are quit when they're returned
+        '''
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._total -= len(idle)
+            self._condition.notify_all()
+
+        for browser in idle:
+            _quit(browser)
+
+    def stats(self) -> dict[str, int]:
+        '''
+        Gets the number of running and idle browsers
+        '''
+        with self._condition:
+            return {'total': self._total, 'idle': len(self._idle)}
+
+    def _acquire(self) -> PooledBrowser:
+        deadline = time.monotonic() + self.acquire_timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError('Browser pool is shut down')
+                if self._idle:
+                    return self._idle.pop()
+                if self._total < self.max_size:
+                    self._total += 1
+                    break
+
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or not self._condition.wait(remaining):
+                    raise TimeoutError('No browser became available')
+
+        # start the browser outside of the lock, it takes a while
+        try:
+            driver = self.factory()
+            return PooledBrowser(driver, driver.current_window_handle)
+        except Exception:
+            with self._condition:
+                self._total -= 1
+                self._condition.notify()
+            raise
+
+    def _release(self, browser: PooledBrowser, discard: bool) -> None:
+        with self._condition:
+            if discard or self._closed:
+                self._total -= 1
+            else:
+                self._idle.append(browser)
+            self._condition.notify()
+
+        if discard or self._closed:
+            _quit(browser)
+
+    def _close_tab(self, browser: PooledBrowser) -> bool:
+        '''
+        Closes the current tab, returns whether the browser should be recycled
+        '''
+        driver = browser.driver
+        browser.pages += 1
+
+        heap_size = driver.execute_script(
+            'return window.performance.memory ? window.performance.memory.usedJSHeapSize : 0') or 0
+
+        driver.delete_all_cookies()
+        driver.close()
+        driver.switch_to.window(browser.base_handle)
+
+        return browser.pages >= self.max_pages or heap_size / 2**20 > self.max_memory_mb
+
+
+def _quit(browser: PooledBrowser) -> None:
+    try:
+        browser.driver.quit()
+    except Exception:
+        pass  # the browser is already gone
+
+
+_POOL: Optional[BrowserPool] = None
+_POOL_LOCK = threading.Lock()
+
+
+def get_browser_pool() -> BrowserPool:
+    '''
+    Gets the pool shared by all parsers.
+    Its size and recycling are configured with `BROWSER_POOL_SIZE`, `BROWSER_MAX_PAGES` and `BROWSER_MAX_MEMORY_MB`
+    '''
+    global _POOL  # pylint: disable=global-statement
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = BrowserPool(
+                max_size=int(os.environ.get('BROWSER_POOL_SIZE', 2)),
+                max_pages=int(os.environ.get('BROWSER_MAX_PAGES', 50)),
+                max_memory_mb=float(os.environ.get('BROWSER_MAX_MEMORY_MB', 512)))
+
+        return _POOL
+
+
+def shutdown_browser_pool() -> None:
+    '''
+    Quits the shared browsers if any were started
+    '''
+    global _POOL  # pylint: disable=global-statement
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+
+    if pool:
+        pool.shutdown()
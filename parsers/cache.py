@@ -0,0 +1,112 @@
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+from parsers import utils
+from parsers.abstract_parser import ParseResult
+
+
+@dataclass
+class CacheEntry:
+    """
+    Class to hold a cached parser result and the time it stops being playable.
+    """
+    video: ParseResult
+    expires_at: float
+
+
+class StreamCache:
+    '''
+    LRU cache of resolved streams keyed by a canonical media id.
+
+    Entries expire with the stream url itself (googlevideo `expire=` parameter),
+    or after `default_ttl` seconds when the url has no expiry.
+    '''
+
+    def __init__(self, max_size: int = 128, default_ttl: float = 600, expiry_margin: float = 300,
+                 clock: Callable[[], float] = time.time) -> None:
+        '''
+        Args:
+            max_size: Maximum number of entries before the least recently used one is evicted.
+            default_ttl: Lifetime in seconds of entries whose stream url has no expiry.
+            expiry_margin: Seconds before the stream expiry when an entry is no longer handed out,
+                players keep requesting the url during playback.
+            clock: Source of the current unix time.
+        '''
+        self.max_size = max_size
+        self.default_ttl = default_ttl
+        self.expiry_margin = expiry_margin
+        self.clock = clock
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries: OrderedDict[str, CacheEntry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, url: str) -> Optional[ParseResult]:
+        '''
+        Gets a cached result for a url, if there's one that hasn't expired yet
+        '''
+        key = utils.canonical_id(url)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.expires_at - self.expiry_margin > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.video
+
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, url: str, video: ParseResult) -> None:
+        '''
+        Caches a parser result for a url
+        '''
+        if not video or not video.url:
+            return
+
+        expires_at = utils.stream_expiry(video.url) or self.clock() + self.default_ttl
+
+        key = utils.canonical_id(url)
+        with self._lock:
+            self._entries[key] = CacheEntry(video, expires_at)
+            self._entries.move_to_end(key)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, url: str) -> None:
+        '''
+        Removes a url from the cache, e.g. when its stream failed to play
+        '''
+        with self._lock:
+            self._entries.pop(utils.canonical_id(url), None)
+
+    def clear(self) -> None:
+        '''
+        Removes all entries
+        '''
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        '''
+        Gets cache counters
+        '''
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+STREAM_CACHE = StreamCache()
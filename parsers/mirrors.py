@@ -0,0 +1,199 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import requests
+
+from parsers import session
+
+
+@dataclass
+class MirrorHealth:
+    """
+    Class to hold health info of a mirror.
+
+    Attributes:
+        base_url: The mirror's url, e.g. `https://yewtu.be`.
+        latency: Moving average of response time in seconds, None until the first response.
+        failure_score: Moving average of failures between 0 (healthy) and 1 (always failing).
+        consecutive_failures: Number of failures in a row, opens the circuit breaker.
+        opened_at: Time the circuit breaker was opened, None while it's closed.
+    """
+    base_url: str
+    latency: Optional[float] = None
+    failure_score: float = 0
+    consecutive_failures: int = 0
+    opened_at: Optional[float] = None
+
+
+class MirrorError(Exception):
+    '''
+    Raised when no mirror could provide a stream, holds errors from every mirror
+    '''
+
+    def __init__(self, errors: dict[str, Exception]) -> None:
+        self.errors = errors
+        details = ', '.join(f'{mirror}: {error!r}' for mirror, error in errors.items())
+        super().__init__(f'All mirrors failed ({details})' if errors else 'No healthy mirrors available')
+
+
+class MirrorManager:
+    '''
+    Probes invidious mirrors fastest first and keeps track of their health.
+
+    Mirrors are probed in latency order, the next one is started if the previous one
+    hasn't answered within `hedge_delay` seconds or has failed.
+    Mirrors failing `failure_threshold` times in a row are skipped for `cooldown` seconds,
+    after that a single probe decides whether they are back.
+    '''
+
+    def __init__(self, mirrors: list[str], *, timeout: float = 5, hedge_delay: float = 0.5,
+                 failure_threshold: int = 3, cooldown: float = 60, smoothing: float = 0.3,
+                 clock: Callable[[], float] = time.monotonic,
+                 http: Optional[requests.Session] = None) -> None:
+        self.mirrors = [MirrorHealth(mirror if '://' in mirror else f'https://{mirror}') for mirror in mirrors]
+        self.timeout = timeout
+        self.hedge_delay = hedge_delay
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.smoothing = smoothing
+        self.clock = clock
+        self._http = http
+
+        self._executor = ThreadPoolExecutor(max_workers=max(len(self.mirrors), 1), thread_name_prefix='mirror')
+        self._lock = threading.Lock()
+
+    def ranked(self) -> list[MirrorHealth]:
+        '''
+        Gets mirrors that aren't behind an open circuit breaker, best ones first
+        '''
+        now = self.clock()
+        with self._lock:
+            available = [mirror for mirror in self.mirrors
+                         if mirror.opened_at is None or now - mirror.opened_at >= self.cooldown]
+
+        # mirrors without measurements go first so they get a chance to be measured
+        return sorted(available, key=lambda mirror: (round(mirror.failure_score, 1), mirror.latency or 0))
+
+    def get_stream(self, youtube_id: str) -> Optional[str]:
+        '''
+        Gets a youtube video stream url from the fastest healthy mirror
+
+        Raises:
+            MirrorError: If every mirror failed or none is available.
+        '''
+        candidates = self.ranked()
+        if not candidates:
+            raise MirrorError({})
+
+        futures: dict[Future, MirrorHealth] = {}
+        claims: dict[Future, float] = {}
+        errors: dict[str, Exception] = {}
+
+        def start_next() -> None:
+            while candidates:
+                mirror = candidates.pop(0)
+                claimed, opened_at = self._claim(mirror)
+                if not claimed:
+                    continue  # another request is already probing the half-open mirror
+
+                future = self._executor.submit(self._probe, mirror, youtube_id)
+                futures[future] = mirror
+                if opened_at is not None:
+                    claims[future] = opened_at
+                return
+
+        start_next()
+        try:
+            while futures:
+                done, _ = wait(futures, timeout=self.hedge_delay if candidates else None, return_when=FIRST_COMPLETED)
+                if not done:
+                    start_next()  # the mirror is slow, hedge with the next best one
+                    continue
+
+                for future in done:
+                    mirror = futures.pop(future)
+                    try:
+                        stream_url = future.result()
+                        if stream_url:
+                            return stream_url
+                    except Exception as error:
+                        errors[mirror.base_url] = error
+
+                    start_next()
+        finally:
+            for future, mirror in futures.items():
+                # a half-open mirror that wasn't probed after all gives its trial back
+                if future.cancel() and future in claims:
+                    self._release(mirror, claims[future])
+
+        if errors:
+            raise MirrorError(errors)
+
+        return None
+
+    def stats(self) -> list[MirrorHealth]:
+        '''
+        Gets a snapshot of mirrors health
+        '''
+        with self._lock:
+            return [MirrorHealth(**mirror.__dict__) for mirror in self.mirrors]
+
+    def _claim(self, mirror: MirrorHealth) -> tuple[bool, Optional[float]]:
+        # half-open: re-arm the breaker so only this probe gets through until it reports back
+        now = self.clock()
+        with self._lock:
+            opened_at = mirror.opened_at
+            if opened_at is None:
+                return True, None
+            if now - opened_at < self.cooldown:
+                return False, None
+
+            mirror.opened_at = now
+            return True, opened_at
+
+    def _release(self, mirror: MirrorHealth, opened_at: float) -> None:
+        with self._lock:
+            if mirror.opened_at is not None:
+                mirror.opened_at = opened_at
+
+    def _probe(self, mirror: MirrorHealth, youtube_id: str) -> Optional[str]:
+        started = self.clock()
+        try:
+            http = self._http or session.get_session()
+            response = http.get(f'{mirror.base_url}/latest_version?id={youtube_id}&itag=22',
+                                allow_redirects=False, timeout=self.timeout)
+        except Exception:
+            self._record(mirror, self.clock() - started, failed=True)
+            raise
+
+        if response.status_code >= 500:
+            self._record(mirror, self.clock() - started, failed=True)
+            response.raise_for_status()
+
+        self._record(mirror, self.clock() - started, failed=False)
+
+        if response.is_redirect:
+            return response.next.url
+
+        return None
+
+    def _record(self, mirror: MirrorHealth, latency: float, failed: bool) -> None:
+        with self._lock:
+            if mirror.latency is None:
+                mirror.latency = latency
+            else:
+                mirror.latency += self.smoothing * (latency - mirror.latency)
+            mirror.failure_score += self.smoothing * (float(failed) - mirror.failure_score)
+
+            if not failed:
+                mirror.consecutive_failures = 0
+                mirror.opened_at = None
+                return
+
+            mirror.consecutive_failures += 1
+            # a failing half-open mirror goes straight back behind the breaker
+            if mirror.consecutive_failures >= self.failure_threshold:
+                mirror.opened_at = self.clock()
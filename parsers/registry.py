@@ -0,0 +1,83 @@
+import re
+from urllib.parse import urlsplit
+
+from parsers.abstract_parser import AbstractParser
+
+# scheme, optional user info, host, optional port, path and query of an absolute url
+URL_PATTERN = re.compile(r'^(?:[a-zA-Z][a-zA-Z0-9+.-]*:)?//(?:[^@/?#]*@)?([^:/?#]*)(?::\d*)?([^?#]*)(?:\?([^#]*))?')
+
+
+class ParserRegistry:
+    '''
+    Routes urls to parsers.
+
+    Domains are indexed by hostname, so a url is matched by looking up its host and each parent domain
+    (`www.youtube.com`, `youtube.com`, `com`) rather than scanning every domain.
+    Entries starting with `/` are path rules, e.g. `/watch?v=` matches `/watch` with a `v` query parameter on any host.
+    '''
+
+    def __init__(self, fallback: list[AbstractParser]) -> None:
+        self.fallback = fallback
+        self._hosts: dict[str, list[AbstractParser]] = {}
+        self._paths: dict[str, list[tuple[frozenset[str], list[AbstractParser]]]] = {}
+
+    @staticmethod
+    def from_parsers(parsers: list[AbstractParser], fallback: list[AbstractParser]) -> 'ParserRegistry':
+        '''
+        Builds a registry from parsers' supported domains, earlier parsers take priority
+        '''
+        registry = ParserRegistry(fallback)
+        for parser in parsers:
+            registry.register(parser, parser.supported_domains())
+
+        return registry
+
+    def register(self, parser: AbstractParser, domains: list[str]) -> None:
+        '''
+        Registers a parser for domains or path rules
+        '''
+        for domain in domains:
+            if not domain.startswith('/'):
+                self._hosts.setdefault(domain.lower().rstrip('.'), []).append(parser)
+                continue
+
+            rule = urlsplit(domain)
+            query_keys = _query_keys(rule.query)
+            rules = self._paths.setdefault(rule.path.rstrip('/'), [])
+            for keys, parsers in rules:
+                if keys == query_keys:
+                    parsers.append(parser)
+                    break
+            else:
+                rules.append((query_keys, [parser]))
+
+    def lookup(self, url: str) -> list[AbstractParser]:
+        '''
+        Gets parsers for a url, the fallback if none match
+        '''
+        match = URL_PATTERN.match(url)
+        if not match:
+            return self.fallback
+
+        host, path, query = match.groups()
+
+        # the host itself, then every parent domain
+        host = host.lower().rstrip('.')
+        while host:
+            parsers = self._hosts.get(host)
+            if parsers:
+                return parsers
+            host = host.partition('.')[2]
+
+        rules = self._paths.get(path.rstrip('/'))
+        if rules:
+            query_keys = _query_keys(query or '')
+            for keys, parsers in rules:
+                if keys <= query_keys:
+                    return parsers
+
+        return self.fallback
+
+
+def _query_keys(query: str) -> frozenset[str]:
+    return frozenset(pair.partition('=')[0] for pair in query.split('&') if pair)
@@ -0,0 +1,81 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Callable, Optional
+
+from parsers.abstract_parser import AbstractParser, ParseResult
+
+PARSER_EXECUTOR = ThreadPoolExecutor(max_workers=4, thread_name_prefix='parser')
+
+
+def resolve(url: str, parsers: list[AbstractParser],
+            on_error: Optional[Callable[[Exception], None]] = None, *,
+            parallel: bool = True, patience: float = 2.0,
+            executor: ThreadPoolExecutor = PARSER_EXECUTOR) -> Optional[ParseResult]:
+    '''
+    Runs the url through the parsers and returns the first non-empty result in priority order.
+
+    Args:
+        url: The url to parse.
+        parsers: Parsers ordered by priority.
+        on_error: Called with every exception raised by a parser.
+        parallel: Whether to start all parsers at once instead of one after another.
+        patience: Seconds a finished lower priority result waits for slower higher priority parsers.
+        executor: Executor to run the parsers on when `parallel` is set.
+    '''
+    if not parallel or len(parsers) < 2:
+        return _resolve_sequential(url, parsers, on_error)
+
+    futures = [executor.submit(parser.parse, url) for parser in parsers]
+    try:
+        return _race(futures, on_error, patience)
+    finally:
+        # losers are either cancelled before they start or ignored
+        for future in futures:
+            future.cancel()
+
+
+def _resolve_sequential(url: str, parsers: list[AbstractParser],
+                        on_error: Optional[Callable[[Exception], None]]) -> Optional[ParseResult]:
+    for parser in parsers:
+        try:
+            video = parser.parse(url)
+            if video:
+                return video
+        except Exception as exception:
+            if on_error:
+                on_error(exception)
+
+    return None
+
+
+def _race(futures: list[Future], on_error: Optional[Callable[[Exception], None]], patience: float) -> Optional[ParseResult]:
+    results: dict[int, ParseResult] = {}
+    pending = set(futures)
+    deadline = None
+
+    while pending:
+        timeout = None if deadline is None else max(0, deadline - time.monotonic())
+        done, pending = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+        if not done:
+            break  # higher priority parsers ran out of patience
+
+        for future in done:
+            try:
+                video = future.result()
+                if video:
+                    results[futures.index(future)] = video
+            except Exception as exception:
+                if on_error:
+                    on_error(exception)
+
+        # the best result wins once every parser ahead of it has failed
+        for index, future in enumerate(futures):
+            if index in results:
+                return results[index]
+            if not future.done():
+                break
+
+        if results and deadline is None:
+            deadline = time.monotonic() + patience
+
+    return results[min(results)] if results else None
@@ -0,0 +1,108 @@
+import os
+import threading
+from typing import Optional
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from parsers import consts
+
+
+class PooledAdapter(HTTPAdapter):
+    '''
+    HTTP adapter that keeps track of how often connections to each host are reused
+    '''
+
+    def __init__(self, *args, **kwargs) -> None:
+        self._pools: dict[str, list] = {}
+        self._requests: dict[str, int] = {}
+        self._stats_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def get_connection_with_tls_context(self, request, verify, proxies=None, cert=None):
+        pool = super().get_connection_with_tls_context(request, verify, proxies=proxies, cert=cert)
+
+        host = urlparse(request.url).netloc
+        with self._stats_lock:
+            self._requests[host] = self._requests.get(host, 0) + 1
+            pools = self._pools.setdefault(host, [])
+            if pool not in pools:
+                pools.append(pool)
+
+        return pool
+
+    def stats(self) -> dict[str, dict[str, int]]:
+        '''
+        Gets number of requests and newly opened connections per host
+        '''
+        with self._stats_lock:
+            stats = {}
+            for host, pools in self._pools.items():
+                connections = sum(pool.num_connections for pool in pools)
+                stats[host] = {
+                    'requests': self._requests[host],
+                    'connections': connections,
+                    'reused': self._requests[host] - connections,
+                }
+            return stats
+
+
+def create_session(pool_connections: int = 10, pool_maxsize: int = 10,
+                   retries: int = 2, backoff_factor: float = 0.3,
+                   status_forcelist: tuple[int, ...] = ()) -> requests.Session:
+    '''
+    Creates a keep-alive session with browser-like default headers.
+
+    Args:
+        pool_connections: Number of hosts to keep connection pools for.
+        pool_maxsize: Maximum number of connections kept alive per host.
+        retries: Number of retries for failed connections and `status_forcelist` responses.
+        backoff_factor: Backoff between retries, doubles after every retry.
+        status_forcelist: Response codes to retry idempotent requests on.
+    '''
+    retry = Retry(total=retries, connect=retries, read=0, status=retries, redirect=False,
+                  status_forcelist=status_forcelist, backoff_factor=backoff_factor, raise_on_status=False)
+    adapter = PooledAdapter(pool_connections=pool_connections, pool_maxsize=pool_maxsize, max_retries=retry)
+
+    session = requests.Session()
+    # bodies are decoded by urllib3, which only asks for the encodings it can decode, brotli isn't a dependency
+    session.headers.update({name: value for name, value in consts.BROWSER_HEADERS.items() if name != 'Accept-Encoding'})
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+
+    return session
+
+
+_SESSION: Optional[requests.Session] = None
+_SESSION_LOCK = threading.Lock()
+
+
+def get_session() -> requests.Session:
+    '''
+    Gets a session shared by all parsers.
+    Pool sizes and retries are configured with `HTTP_POOL_CONNECTIONS`, `HTTP_POOL_MAXSIZE` and `HTTP_RETRIES`
+    '''
+    global _SESSION  # pylint: disable=global-statement
+    with _SESSION_LOCK:
+        if _SESSION is None:
+            _SESSION = create_session(
+                pool_connections=int(os.environ.get('HTTP_POOL_CONNECTIONS', 10)),
+                pool_maxsize=int(os.environ.get('HTTP_POOL_MAXSIZE', 10)),
+                retries=int(os.environ.get('HTTP_RETRIES', 2)))
+
+        return _SESSION
+
+
+def connection_stats(session: Optional[requests.Session] = None) -> dict[str, dict[str, int]]:
+    '''
+    Gets per host connection reuse stats of a session, the shared one by default
+    '''
+    session = session or get_session()
+    stats = {}
+    for adapter in set(session.adapters.values()):
+        if isinstance(adapter, PooledAdapter):
+            stats.update(adapter.stats())
+
+    return stats
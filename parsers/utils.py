@@ -1,4 +1,5 @@
-from urllib.parse import urlparse
+from typing import Optional
+from urllib.parse import parse_qs, urlencode, urlparse
 
 from parsers import consts
 
@@ -19,3 +20,73 @@ def fix_url(url: str) -> str:
         url = url.replace(original_domain, consts.YOUTUBE_URLS[0])
 
     return url
+
+
+def youtube_id(url: str) -> Optional[str]:
+    '''
+    Extracts a youtube video id from youtube, youtu.be or invidious links
+    '''
+    parsed_url = urlparse(url)
+    path = parsed_url.path.rstrip('/')
+    host = (parsed_url.hostname or '').lower()
+    if host.startswith('www.') or host.startswith('m.'):
+        host = host.split('.', 1)[1]
+
+    if host == 'youtu.be':
+        return path[1:] or None
+
+    # other sites use the same paths for their own ids
+    if host not in consts.YOUTUBE_URLS + consts.INVIDIOUS_URLS:
+        return None
+
+    if path == '/watch':
+        return parse_qs(parsed_url.query).get('v', [None])[0]
+
+    parts = path.split('/')
+    if len(parts) >= 3 and parts[1] in ('shorts', 'embed', 'live', 'v'):
+        return parts[2]
+
+    return None
+
+
+def canonical_id(url: str) -> str:
+    '''
+    Gets a canonical id for a media url, so the same video is recognized
+    regardless of a mirror, tracking parameters or a `www.` prefix
+    '''
+    video_id = youtube_id(url)
+    if video_id:
+        return f'youtube:{video_id}'
+
+    parsed_url = urlparse(url)
+    host = (parsed_url.hostname or '').lower()
+    if host.startswith('www.'):
+        host = host[4:]
+
+    query = sorted((key, value) for key, values in parse_qs(parsed_url.query).items()
+                   for value in values if not key.startswith('utm_'))
+
+    canonical = f'{host}{parsed_url.path.rstrip("/")}'
+    if query:
+        canonical += f'?{urlencode(query)}'
+
+    return canonical
+
+
+def stream_expiry(stream_url: str) -> Optional[float]:
+    '''
+    Gets the unix timestamp a googlevideo stream url expires at,
+    either from the `expire=` query parameter or the `/expire/<ts>/` path segment of HLS manifests
+    '''
+    parsed_url = urlparse(stream_url)
+
+    expire = parse_qs(parsed_url.query).get('expire', [None])[0]
+    if not expire:
+        parts = parsed_url.path.split('/')
+        if 'expire' in parts and parts.index('expire') + 1 < len(parts):
+            expire = parts[parts.index('expire') + 1]
+
+    try:
+        return float(expire) if expire else None
+    except ValueError:
+        return None
@@ -1,7 +1,59 @@
-from bs4 import BeautifulSoup
-from selenium import webdriver
+import json
+import threading
+from typing import Callable, Optional
+from urllib.parse import urljoin, urlparse
+
+from bs4 import BeautifulSoup, SoupStrainer
 
 from parsers.abstract_parser import AbstractParser, ParseResult
+from parsers.browser_pool import get_browser_pool
+from parsers.session import get_session
+
+MEDIA_EXTENSIONS = {'.mp4': 'video/mp4', '.webm': 'video/webm', '.mov': 'video/quicktime', '.m3u8': 'application/x-mpegURL'}
+
+# only the tags that can describe a video, skips building the rest of the DOM
+VIDEO_TAGS = SoupStrainer(['title', 'meta', 'video', 'source', 'script'])
+
+
+class TierStats:
+    '''
+    Per-domain counters of which tier found a video
+    '''
+
+    def __init__(self, min_attempts: int = 5) -> None:
+        '''
+        Args:
+            min_attempts: Number of attempts after which a tier that never succeeded for a domain is skipped.
+        '''
+        self.min_attempts = min_attempts
+        self._stats: dict[str, dict[str, list[int]]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, domain: str, tier: str, success: bool) -> None:
+        '''
+        Records an attempt of a tier
+        '''
+        with self._lock:
+            attempts = self._stats.setdefault(domain, {}).setdefault(tier, [0, 0])
+            attempts[0] += 1
+            attempts[1] += int(success)
+
+    def should_try(self, domain: str, tier: str) -> bool:
+        '''
+        Whether a tier has a chance of working for a domain
+        '''
+        with self._lock:
+            attempts, successes = self._stats.get(domain, {}).get(tier, [0, 0])
+            return attempts < self.min_attempts or successes > 0
+
+    def stats(self) -> dict[str, dict[str, dict[str, int]]]:
+        '''
+        Gets attempts and successes per domain and tier
+        '''
+        with self._lock:
+            return {domain: {tier: {'attempts': attempts, 'successes': successes}
+                             for tier, (attempts, successes) in tiers.items()}
+                    for domain, tiers in self._stats.items()}
 
 
 class WebParser(AbstractParser):
@@ -9,6 +61,8 @@ class WebParser(AbstractParser):
     Finds videos on a web page
     '''
 
+    tier_stats = TierStats()
+
     @staticmethod
     def supported_domains() -> list[str]:
         return ['rumble.com', 'vkplay.live']
@@ -19,37 +73,139 @@ class WebParser(AbstractParser):
         Parse
         '''
 
-        # Start a headless Chrome browser using Selenium
-        options = webdriver.ChromeOptions()
-        options.add_argument('headless')
-        browser = webdriver.Chrome(options=options)
+        domain = urlparse(url).hostname
+        tiers: list[tuple[str, Callable[[str], str]]] = [
+            ('static', WebParser.fetch_static),
+            ('browser', WebParser.fetch_rendered),
+        ]
+
+        # skip tiers that never work for this domain, but always keep the browser as the last resort
+        tiers = [tier for tier in tiers if WebParser.tier_stats.should_try(domain, tier[0])] or tiers[-1:]
 
-        # Load a web page that uses JavaScript to build the DOM
-        browser.get(url)
+        video = None
+        for tier, fetch in tiers:
+            try:
+                video = WebParser.parse_html(fetch(url), url)
+            except Exception:
+                if tier == tiers[-1][0]:
+                    raise
+                video = None
 
-        # Extract the HTML content of the page
-        html = browser.page_source
-        soup = BeautifulSoup(html, 'html.parser')
+            WebParser.tier_stats.record(domain, tier, bool(video and video.url))
+            if video and video.url:
+                break
 
-        title = soup.title.string
+        return video
+
+    @staticmethod
+    def fetch_static(url: str) -> str:
+        '''
+        Gets the server rendered HTML of a page
+        '''
+        response = get_session().get(url, timeout=10)
+        response.raise_for_status()
+        return response.text
+
+    @staticmethod
+    def fetch_rendered(url: str) -> str:
+        '''
+        Gets the HTML of a page after JavaScript has built the DOM
+        '''
+        # Borrow a warm headless Chrome tab from the pool
+        with get_browser_pool().page() as browser:
+            # Load a web page that uses JavaScript to build the DOM
+            browser.get(url)
+
+            # Extract the HTML content of the page
+            return browser.page_source
+
+    @staticmethod
+    def parse_html(html: str, url: str) -> ParseResult:
+        '''
+        Finds a video in `<video>`, `<source>`, `og:video` or JSON-LD `VideoObject` tags
+        '''
+        soup = BeautifulSoup(html, 'html.parser', parse_only=VIDEO_TAGS)
+
+        meta = {tag.get('property') or tag.get('name'): tag.get('content')
+                for tag in soup.find_all('meta') if tag.get('content')}
+        title = meta.get('og:title') or (soup.title.string if soup.title else None)
+        thumbnail_url = meta.get('og:image')
         video_url = ''
-        thumbnail_url = ''
+        mime_type = None
 
         # find all videos on the webpage
-        videos = soup.find_all('video')
-        for video in videos:
-            src = video.get('src')
-            thumbnail_url = video.get('poster')
-
-            if src:
-                video_url = src
-                print(video_url)
-            else:
-                children = video.findChildren('source')
-                for child in children:
-                    src = child.get('src')
-                    if src:
-                        video_url = src
-                        print(video_url)
-
-        return ParseResult(video_url, url, title, 'video/mp4', thumbnail_url)
+        for video in soup.find_all('video'):
+            thumbnail_url = video.get('poster') or thumbnail_url
+            for src, src_type in [(video.get('src'), video.get('type'))] + \
+                    [(child.get('src'), child.get('type')) for child in video.find_all('source')]:
+                if _is_playable(src):
+                    video_url, mime_type = src, src_type
+
+        if not video_url:
+            for src in [meta.get('og:video:secure_url'), meta.get('og:video:url'), meta.get('og:video')]:
+                if _is_playable(src) and _is_media(src, meta.get('og:video:type')):
+                    video_url, mime_type = src, meta.get('og:video:type')
+                    break
+
+        if not video_url:
+            video_object = _find_video_object(soup)
+            if video_object and _is_playable(video_object.get('contentUrl')):
+                video_url = video_object['contentUrl']
+                mime_type = video_object.get('encodingFormat')
+                title = title or video_object.get('name')
+                thumbnail_url = thumbnail_url or _first(video_object.get('thumbnailUrl'))
+
+        if video_url:
+            video_url = urljoin(url, video_url)
+        if thumbnail_url:
+            thumbnail_url = urljoin(url, thumbnail_url)
+
+        return ParseResult(video_url, url, title, _mime_type(video_url, mime_type), thumbnail_url)
+
+
+def _is_playable(src: Optional[str]) -> bool:
+    # blob: urls only exist inside the browser that created them
+    return bool(src) and not src.startswith('blob:')
+
+
+def _is_media(src: str, mime_type: Optional[str]) -> bool:
+    # og:video often points to an embeddable HTML player rather than a stream
+    if mime_type:
+        return mime_type.startswith('video/') or 'mpegurl' in mime_type.lower()
+    return any(urlparse(src).path.lower().endswith(extension) for extension in MEDIA_EXTENSIONS)
+
+
+def _mime_type(src: str, mime_type: Optional[str]) -> str:
+    if mime_type and '/' in mime_type:
+        return mime_type
+
+    path = urlparse(src).path.lower()
+    for extension, extension_mime_type in MEDIA_EXTENSIONS.items():
+        if path.endswith(extension):
+            return extension_mime_type
+
+    return 'video/mp4'
+
+
+def _first(value):
+    return value[0] if isinstance(value, list) and value else value
+
+
+def _find_video_object(soup: BeautifulSoup) -> Optional[dict]:
+    for script in soup.find_all('script', type='application/ld+json'):
+        try:
+            data = json.loads(script.string or '')
+        except ValueError:
+            continue
+
+        items = data if isinstance(data, list) else [data]
+        while items:
+            item = items.pop(0)
+            if not isinstance(item, dict):
+                continue
+            item_types = item.get('@type')
+            if 'VideoObject' in (item_types if isinstance(item_types, list) else [item_types]):
+                return item
+            items.extend(item.get('@graph', []))
+
+    return None
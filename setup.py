@@ -3,11 +3,12 @@ from setuptools import find_packages, setup
 setup(
     name="Caster Modules",
     version="0.1",
-    packages=find_packages(exclude=('tests*',)),
+    packages=find_packages(exclude=('tests*', 'benchmarks*')),
     python_requires=">=3.9",
     install_requires=[
         'PyChromecast',
         'pytube',
+        'requests',
         'ntfpy',
         'beautifulsoup4',
         'selenium',
@@ -16,7 +16,7 @@ async def main():
     def handle(listener: AbstractListener, result: MessageResult) -> None:
         url = StringUtils.find_url(result.text)
         if url:
-            parsed_video = get_parser_for_url(result.text)[0].parse(result.text)
+            parsed_video = get_parser_for_url(url)[0].parse(url)
             listener.send(MessageResult(parsed_video.to_json(), result.extra))
 
     listeners = get_listeners(dict(os.environ))
@@ -0,0 +1,138 @@
+import threading
+import time
+import unittest
+
+from parsers.browser_pool import BrowserPool
+
+
+class _FakeSwitchTo:
+    def __init__(self, driver):
+        self.driver = driver
+
+    def new_window(self, _):
+        """Open a tab"""
+        self.driver.tabs += 1
+
+    def window(self, _):
+        """Switch to a tab"""
+
+
+class _FakeDriver:
+    '''
+    Pretends to be a selenium driver
+    '''
+
+    instances = []
+
+    def __init__(self, heap_size: int = 0):
+        self.heap_size = heap_size
+        self.tabs = 1
+        self.quit_called = False
+        self.current_window_handle = 'base'
+        self.switch_to = _FakeSwitchTo(self)
+        _FakeDriver.instances.append(self)
+
+    def execute_script(self, _):
+        """Report the JS heap size"""
+        return self.heap_size
+
+    def delete_all_cookies(self):
+        """Clear cookies"""
+
+    def close(self):
+        """Close the current tab"""
+        self.tabs -= 1
+
+    def quit(self):
+        """Quit the browser"""
+        self.quit_called = True
+
+
+class TestBrowserPool(unittest.TestCase):
+    """Test cases for the BrowserPool class"""
+
+    def setUp(self):
+        _FakeDriver.instances = []
+
+    def test_reuse(self):
+        """Test that a warm browser is reused and every page gets its own tab"""
+
+        pool = BrowserPool(max_size=2, factory=_FakeDriver)
+        for _ in range(3):
+            with pool.page() as driver:
+                self.assertEqual(driver.tabs, 2)
+
+        self.assertEqual(len(_FakeDriver.instances), 1)
+        self.assertEqual(_FakeDriver.instances[0].tabs, 1)
+        self.assertEqual(pool.stats(), {'total': 1, 'idle': 1})
+
+    def test_recycling(self):
+        """Test that browsers are recycled after N pages or when they use too much memory"""
+
+        pool = BrowserPool(max_pages=2, factory=_FakeDriver)
+        for _ in range(2):
+            with pool.page():
+                pass
+        self.assertTrue(_FakeDriver.instances[0].quit_called)
+
+        pool = BrowserPool(max_memory_mb=1, factory=lambda: _FakeDriver(heap_size=2**21))
+        with pool.page():
+            pass
+        self.assertTrue(_FakeDriver.instances[-1].quit_called)
+        self.assertEqual(pool.stats(), {'total': 0, 'idle': 0})
+
+    def test_bounded(self):
+        """Test that concurrent pages wait for a browser instead of starting new ones"""
+
+        pool = BrowserPool(max_size=1, factory=_FakeDriver)
+        busy = []
+
+        def parse():
+            with pool.page():
+                busy.append(1)
+                self.assertEqual(len(busy), 1)
+                time.sleep(0.05)
+                busy.pop()
+
+        threads = [threading.Thread(target=parse) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(len(_FakeDriver.instances), 1)
+
+        pool.acquire_timeout = 0.05
+        with pool.page():
+            with self.assertRaises(TimeoutError):
+                with pool.page():
+                    pass
+
+    def test_failing_page(self):
+        """Test that a browser is discarded when a page fails"""
+
+        pool = BrowserPool(factory=_FakeDriver)
+        with self.assertRaises(ValueError):
+            with pool.page():
+                raise ValueError()
+
+        self.assertTrue(_FakeDriver.instances[0].quit_called)
+        self.assertEqual(pool.stats(), {'total': 0, 'idle': 0})
+
+    def test_shutdown(self):
+        """Test that shutdown quits all browsers"""
+
+        pool = BrowserPool(factory=_FakeDriver)
+        with pool.page():
+            pass
+        with pool.page():
+            pool.shutdown()
+
+        self.assertTrue(all(driver.quit_called for driver in _FakeDriver.instances))
+        with self.assertRaises(RuntimeError):
+            with pool.page():
+                pass
+
+
+if __name__ == '__main__':
+    unittest.main()
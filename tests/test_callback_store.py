@@ -0,0 +1,82 @@
+import os
+import tempfile
+import unittest
+
+from listeners.callback_store import CallbackPayload, CallbackStore
+from listeners.telegram_listener import TOKEN_PREFIX, TelegramListener
+from parsers.abstract_parser import ParseResult
+
+VIDEO = ParseResult(url='https://example.com/stream.m3u8', original_url='https://example.com/watch?v=' + 'x' * 80,
+                    title='Video', mime_type='application/x-mpegURL', duration=120, support_resume=True,
+                    links=[('Source', 'https://example.com/')])
+
+
+class TestCallbackStore(unittest.TestCase):
+    """Test cases for the CallbackStore class"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.directory.cleanup)
+        self.path = os.path.join(self.directory.name, 'callbacks.db')
+        self.now = [1000.0]
+
+    def _store(self, **kwargs) -> CallbackStore:
+        store = CallbackStore(self.path, clock=lambda: self.now[0], **kwargs)
+        self.addCleanup(store.close)
+        return store
+
+    def test_round_trip(self):
+        """Test that payloads are found by short tokens after a restart"""
+        store = self._store()
+        payload = CallbackPayload(f'rp {VIDEO.original_url}', 'replay', VIDEO)
+
+        token = store.put(payload)
+        self.assertLessEqual(len(token), 12)
+        self.assertEqual(store.put(payload), token)
+        self.assertIsNone(store.get('unknown'))
+        store.close()
+
+        store = self._store()
+        restored = store.get(token)
+        self.assertEqual(restored, payload)
+        self.assertEqual((store.hits, store.misses), (1, 0))
+
+    def test_eviction(self):
+        """Test that the least recently used and expired payloads are evicted"""
+        store = self._store(max_entries=2, ttl=100)
+
+        tokens = []
+        for index in range(3):
+            if index == 2:
+                store.get(tokens[0])
+            tokens.append(store.put(CallbackPayload(f'{index}')))
+            self.now[0] += 10
+
+        self.assertEqual(store.count(), 2)
+        self.assertIsNone(store.get(tokens[1]))
+        self.assertEqual(store.get(tokens[0]).text, '0')
+
+        self.now[0] += 95
+        self.assertIsNone(store.get(tokens[2]))
+        self.assertEqual(store.get(tokens[0]).text, '0')
+        store.put(CallbackPayload('3'))
+        self.assertEqual(store.count(), 2)
+        self.assertEqual(store.evictions, 2)
+
+    def test_buttons(self):
+        """Test that buttons keep long payloads and videos server-side"""
+        listener = TelegramListener({'TELEGRAM_BOT_TOKEN': '123456:test-token', 'TELEGRAM_CALLBACK_DB': self.path})
+        self.addCleanup(listener.callbacks.close)
+        self.addCleanup(listener.outbound.stop)
+
+        self.assertEqual(listener._add_button('🧭', '00:01:00').callback_data, '00:01:00')  # pylint: disable=protected-access
+        button = listener._add_button('🔁', f'rp {VIDEO.original_url}', 'replay', VIDEO)  # pylint: disable=protected-access
+
+        self.assertTrue(button.callback_data.startswith(TOKEN_PREFIX))
+        self.assertLessEqual(len(button.callback_data.encode()), 64)
+        self.assertEqual(listener.callbacks.get(button.callback_data[len(TOKEN_PREFIX):]),
+                         CallbackPayload(f'rp {VIDEO.original_url}', 'replay', VIDEO))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from caster import Caster
+from caster._status import StatusSnapshot
+from parsers.abstract_parser import ParseResult
+
+
+class TestCaster(unittest.TestCase):
+    """Test cases for the Caster class"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        patcher = mock.patch('caster._state.State.file_loc', return_value=f'{self.directory.name}/settings.json')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.directory.cleanup)
+        self.caster = Caster('Living Room')
+        self.addCleanup(self.caster.__exit__, None, None, None)
+
+    def test_submit(self):
+        """Test that commands run one at a time in order without blocking the caller"""
+        started = threading.Semaphore(0)
+        proceed = threading.Semaphore(0)
+        ran = []
+
+        def slow_play():
+            started.release()
+            proceed.acquire(timeout=2)  # pylint: disable=consider-using-with
+            ran.append('play')
+
+        submitted = time.monotonic()
+        play = self.caster.submit(slow_play)
+        seek = self.caster.submit(ran.append, 'seek')
+        self.assertLess(time.monotonic() - submitted, 0.1)
+
+        self.assertTrue(started.acquire(timeout=2))  # pylint: disable=consider-using-with
+        self.assertFalse(seek.done())
+        proceed.release()
+
+        seek.result(timeout=2)
+        self.assertTrue(play.done())
+        self.assertEqual(ran, ['play', 'seek'])
+
+    def test_submit_error(self):
+        """Test that a failing command fails its future and the next ones still run"""
+        failing = self.caster.submit(int, 'not a number')
+        following = self.caster.submit(int, '42')
+
+        self.assertIsInstance(failing.exception(timeout=2), ValueError)
+        self.assertEqual(following.result(timeout=2), 42)
+
+    def test_history_keys(self):
+        """Test that positions are only kept under the page url of the video that was played"""
+        self.caster.current_video = ParseResult('https://cdn.example.com/stream.mp4?expire=1&sig=abc',
+                                                'https://example.com/watch/1', 'Video', 'video/mp4')
+        stream = StatusSnapshot(title='Video', content_id='https://cdn.example.com/stream.mp4?expire=1&sig=abc',
+                                current_time=120)
+        other = StatusSnapshot(title='Something else', content_id='https://cdn.example.com/other.mp4?sig=def',
+                               current_time=60)
+
+        self.caster._track_history(other, StatusSnapshot())  # pylint: disable=protected-access
+        self.assertEqual(len(self.caster.state.history), 0)
+
+        self.caster._track_history(stream, StatusSnapshot())  # pylint: disable=protected-access
+        self.assertEqual(self.caster.state.history['https://example.com/watch/1'], 120)
+        self.assertEqual(len(self.caster.state.history), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,75 @@
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+from caster import Caster, CasterPool
+from parsers.abstract_parser import ParseResult
+
+
+class TestCasterPool(unittest.TestCase):
+    """Test cases for the CasterPool class"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        patcher = mock.patch('caster._state.State.file_loc', return_value=f'{self.directory.name}/settings.json')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.directory.cleanup)
+        self.pool = CasterPool(['Living Room', 'Living Room TV', 'Bedroom'])
+
+    def test_connect(self):
+        """Test that devices connect concurrently and failing ones are left out"""
+
+        def connect(caster: Caster):
+            time.sleep(0.2)
+            if caster.chromecast_name == 'Bedroom':
+                raise RuntimeError('unreachable')
+
+        started = time.monotonic()
+        with mock.patch.object(Caster, 'connect', autospec=True, side_effect=connect):
+            self.pool.connect()
+
+        self.assertLess(time.monotonic() - started, 0.5)
+        self.assertEqual(self.pool.connected, ['Living Room', 'Living Room TV'])
+
+        with mock.patch.object(Caster, 'connect', side_effect=RuntimeError()):
+            with self.assertRaises(RuntimeError):
+                CasterPool(['Bedroom']).connect()
+
+    def test_route(self):
+        """Test routing by device prefix and per-chat defaults"""
+
+        self.pool.connected = ['Living Room', 'Living Room TV', 'Bedroom']
+        casters = self.pool.casters
+
+        self.assertEqual(self.pool.route(1, '50'), (casters['Living Room'], '50'))
+        self.assertEqual(self.pool.route(1, '@bedroom 50'), (casters['Bedroom'], '50'))
+        self.assertEqual(self.pool.route(1, '@living_room_tv +10'), (casters['Living Room TV'], '+10'))
+        self.assertEqual(self.pool.route(1, '@Living Room +10'), (casters['Living Room'], '+10'))
+        self.assertEqual(self.pool.route(1, '@bedroomx 50'), (casters['Living Room'], '@bedroomx 50'))
+
+        # a bare prefix makes the device the chat's default
+        self.assertEqual(self.pool.route(1, '@Bedroom'), (casters['Bedroom'], ''))
+        self.assertEqual(self.pool.route(1, '50'), (casters['Bedroom'], '50'))
+        self.assertEqual(self.pool.route(2, '50'), (casters['Living Room'], '50'))
+
+    def test_replace_group(self):
+        """Test that a group is stopped when another one starts and when the pool stops syncing"""
+        self.pool.connected = ['Living Room', 'Bedroom']
+        video = ParseResult('https://example.com/video.mp4', 'https://example.com/video.mp4', 'Video', 'video/mp4')
+
+        groups = []
+        with mock.patch('caster._pool.GroupPlayer', side_effect=lambda casters: groups.append(mock.Mock()) or groups[-1]):
+            self.pool.play_group(video)
+            self.pool.play_group(video)
+            groups[0].stop.assert_called_once_with()
+            groups[1].stop.assert_not_called()
+
+            self.pool.stop_group()
+            groups[1].stop.assert_called_once_with()
+            self.assertIsNone(self.pool.group)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import threading
+import time
+import unittest
+
+from listeners.chat_dispatcher import ChatDispatcher
+
+
+class TestChatDispatcher(unittest.TestCase):
+    """Test cases for the ChatDispatcher class"""
+
+    def setUp(self):
+        self.dispatcher = ChatDispatcher(max_workers=4, max_pending=100, timeout=1)
+        self.addCleanup(self.dispatcher.shutdown)
+
+    def _wait(self, condition, timeout=2):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail('timed out')
+            time.sleep(0.01)
+
+    def test_chat_order(self):
+        """Test that messages of a chat are handled one at a time in order"""
+        handled = []
+        running = []
+
+        def handle(index):
+            running.append(index)
+            self.assertEqual(len(running), 1)
+            time.sleep(0.01)
+            handled.append(index)
+            running.remove(index)
+
+        for index in range(10):
+            self.assertTrue(self.dispatcher.dispatch(1, handle, index))
+
+        self._wait(lambda: self.dispatcher.stats()['completed'] == 10)
+        self.assertEqual(handled, list(range(10)))
+        self.assertEqual(self.dispatcher.depth(1), 0)
+
+    def test_parallel_chats(self):
+        """Test that a slow chat doesn't hold up the others"""
+        release = threading.Event()
+        handled = []
+
+        self.dispatcher.dispatch(1, release.wait, 5)
+        self.dispatcher.dispatch(1, handled.append, 'slow')
+        for chat_id in range(2, 5):
+            self.dispatcher.dispatch(chat_id, handled.append, chat_id)
+
+        self._wait(lambda: len(handled) == 3)
+        self.assertEqual(sorted(handled), [2, 3, 4])
+        self.assertEqual(self.dispatcher.depth(1), 2)
+
+        release.set()
+        self._wait(lambda: 'slow' in handled)
+
+    def test_failure(self):
+        """Test that a failing handler doesn't stop its chat"""
+        handled = []
+
+        self.dispatcher.dispatch(1, lambda: 1 / 0)
+        self.dispatcher.dispatch(1, handled.append, 'next')
+
+        self._wait(lambda: handled == ['next'])
+
+    def test_backpressure(self):
+        """Test that messages wait for room and are rejected once it doesn't free up"""
+        dispatcher = ChatDispatcher(max_workers=1, max_pending=2, timeout=0.2)
+        self.addCleanup(dispatcher.shutdown)
+        release = threading.Event()
+
+        self.assertTrue(dispatcher.dispatch(1, release.wait, 5))
+        self.assertTrue(dispatcher.dispatch(2, release.wait, 5))
+        self.assertFalse(dispatcher.dispatch(3, print))
+
+        # waits until the first message is handled
+        threading.Timer(0.05, release.set).start()
+        self.assertTrue(dispatcher.dispatch(3, lambda: None))
+        self._wait(lambda: dispatcher.stats()['completed'] == 3)
+
+        self.assertEqual(dispatcher.stats(), {
+            'pending': 0,
+            'peak_pending': 2,
+            'chats': 0,
+            'submitted': 3,
+            'completed': 3,
+            'throttled': 2,
+            'rejected': 1,
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
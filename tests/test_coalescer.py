@@ -0,0 +1,96 @@
+import threading
+import unittest
+
+from caster._coalescer import CommandCoalescer
+
+
+class _FakeTimer:
+    '''
+    Collects the timers instead of running them, tests fire them by hand
+    '''
+
+    def __init__(self):
+        self.timers = []
+
+    def __call__(self, interval, function, args):
+        timer = threading.Timer(interval, function, args)
+        timer.start = lambda: None
+        self.timers.append(timer)
+        return timer
+
+    def fire(self):
+        """Close every open window"""
+        timers, self.timers = self.timers, []
+        for timer in timers:
+            if not timer.finished.is_set():
+                timer.function(*timer.args)
+
+
+class TestCommandCoalescer(unittest.TestCase):
+    """Test cases for the CommandCoalescer class"""
+
+    def setUp(self):
+        self.timer = _FakeTimer()
+        self.coalescer = CommandCoalescer(timer=self.timer)
+        self.sent = []
+
+    def _send(self, kind):
+        return lambda value: self.sent.append((kind, value))
+
+    def test_relative_burst(self):
+        """Test that a burst of skips becomes one absolute seek"""
+        for _ in range(5):
+            self.coalescer.submit('seek', lambda target: (target if target is not None else 100) + 10,
+                                  self._send('seek'))
+
+        self.assertEqual(self.coalescer.pending('seek'), 150)
+        self.assertEqual(self.sent, [])
+        self.timer.fire()
+
+        self.assertEqual(self.sent, [('seek', 150)])
+        self.assertEqual(self.coalescer.stats(), {'submitted': 5, 'sent': 1, 'coalesced': 4})
+
+    def test_last_writer_wins(self):
+        """Test that an absolute command replaces the pending value and kinds don't mix"""
+        self.coalescer.submit('seek', lambda _: 30, self._send('seek'))
+        self.coalescer.submit('volume', lambda _: 40, self._send('volume'))
+        self.coalescer.submit('seek', lambda target: target + 10, self._send('seek'))
+        self.coalescer.submit('seek', lambda _: 5, self._send('seek'))
+        self.coalescer.submit('volume', lambda _: 60, self._send('volume'))
+        self.timer.fire()
+
+        self.assertEqual(sorted(self.sent), [('seek', 5), ('volume', 60)])
+        self.assertEqual(self.coalescer.stats()['coalesced'], 3)
+
+    def test_new_burst_after_window(self):
+        """Test that commands after a window closes are sent separately"""
+        self.coalescer.submit('rate', lambda _: 1.5, self._send('rate'))
+        self.timer.fire()
+        self.coalescer.submit('rate', lambda _: 2, self._send('rate'))
+        self.timer.fire()
+
+        self.assertEqual(self.sent, [('rate', 1.5), ('rate', 2)])
+
+    def test_cancel(self):
+        """Test that cancelled commands are never sent"""
+        self.coalescer.submit('seek', lambda _: 30, self._send('seek'))
+        self.coalescer.submit('volume', lambda _: 40, self._send('volume'))
+        self.coalescer.cancel('seek')
+        self.timer.fire()
+        self.coalescer.submit('seek', lambda _: 10, self._send('seek'))
+        self.coalescer.cancel()
+        self.timer.fire()
+
+        self.assertEqual(self.sent, [('volume', 40)])
+        self.assertIsNone(self.coalescer.pending('seek'))
+
+    def test_real_timer(self):
+        """Test that the window closes by itself"""
+        coalescer = CommandCoalescer(window=0.05)
+        done = threading.Semaphore(0)
+        coalescer.submit('seek', lambda _: 1, lambda value: done.release())
+        coalescer.submit('seek', lambda _: 2, lambda value: done.release())
+
+        self.assertTrue(done.acquire(timeout=2))  # pylint: disable=consider-using-with
+        self.assertFalse(done.acquire(timeout=0.2))  # pylint: disable=consider-using-with
+        self.assertEqual(coalescer.stats(), {'submitted': 2, 'sent': 1, 'coalesced': 1})
@@ -0,0 +1,57 @@
+import os
+import tempfile
+import threading
+import unittest
+from unittest import mock
+from uuid import uuid4
+
+from pychromecast.models import CastInfo, HostServiceInfo
+
+from caster import _endpoint
+from caster._endpoint import DeviceEndpoint
+
+
+class TestDeviceEndpoint(unittest.TestCase):
+    """Test cases for the DeviceEndpoint class"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.patch = mock.patch.object(_endpoint, 'FILE_LOC', os.path.join(self.directory.name, 'devices.json'))
+        self.patch.start()
+
+    def tearDown(self):
+        self.patch.stop()
+        self.directory.cleanup()
+
+    def test_round_trip(self):
+        """Test that a saved endpoint connects to the same device"""
+
+        uuid = uuid4()
+        cast_info = CastInfo({HostServiceInfo('192.168.1.10', 8009)}, uuid, 'Chromecast', 'Living Room',
+                             '192.168.1.10', 8009, 'cast', 'Google Inc.')
+
+        self.assertIsNone(DeviceEndpoint.load('Living Room'))
+
+        DeviceEndpoint.from_cast_info(cast_info).save()
+        DeviceEndpoint('Bedroom', '192.168.1.11', 8009, str(uuid4())).save()
+
+        self.assertEqual(DeviceEndpoint.load('Living Room').to_cast_info(), cast_info)
+        self.assertEqual(DeviceEndpoint.load('Bedroom').host, '192.168.1.11')
+
+    def test_concurrent_saves(self):
+        """Test that devices saving at the same time keep each other's endpoints"""
+
+        names = [f'Device {index}' for index in range(20)]
+        threads = [threading.Thread(target=DeviceEndpoint(name, '192.168.1.10', 8009, str(uuid4())).save)
+                   for name in names]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertTrue(all(DeviceEndpoint.load(name) for name in names))
+        self.assertEqual(os.listdir(self.directory.name), ['devices.json'])
+
+
+if __name__ == '__main__':
+    unittest.main()
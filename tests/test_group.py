@@ -0,0 +1,117 @@
+import tempfile
+import unittest
+from unittest import mock
+
+from caster import Caster, GroupPlayer
+from parsers.abstract_parser import ParseResult
+
+
+class TestGroupPlayer(unittest.TestCase):
+    """Test cases for the GroupPlayer class"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        patcher = mock.patch('caster._state.State.file_loc', return_value=f'{self.directory.name}/settings.json')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.directory.cleanup)
+
+        self.now = 1000.0
+        self.casters = [self._caster(name) for name in ['Living Room', 'Bedroom', 'Kitchen', 'Office']]
+        self.group = GroupPlayer(self.casters, interval=5, tolerance=0.1, seek_threshold=1, max_nudge=0.1,
+                                 clock=lambda: self.now)
+        self.addCleanup(self.group.stop)
+
+    def _caster(self, name: str) -> Caster:
+        caster = Caster(name)
+        self.addCleanup(caster.__exit__, None, None, None)
+        caster.cast_device = mock.Mock()
+        caster.round_trip = mock.Mock(return_value=0)
+        caster.supervisor.call = lambda command, *args: command(*args) or True
+        caster.status.clock = lambda: self.now
+        caster.status.expect(player_state='PLAYING', content_id='video', playback_rate=1)
+        return caster
+
+    def _at(self, caster: Caster, position: float, round_trip: float = 0):
+        caster.status.expect(current_time=position, updated_at=self.now)
+        caster.round_trip.return_value = round_trip
+
+    def test_correct(self):
+        """Test that small skews are nudged, large ones seeked and the ones within tolerance left alone"""
+        leader, ahead, behind, synced = self.casters
+        self._at(leader, 100)
+        self._at(ahead, 100.5)
+        self._at(behind, 97, round_trip=0.2)
+        self._at(synced, 100.05)
+
+        skews = {skew.name: skew for skew in self.group.correct()}
+
+        self.assertAlmostEqual(skews['Bedroom'].skew, 0.5)
+        self.assertEqual(skews['Bedroom'].correction, 'nudge')
+        self.assertAlmostEqual(ahead.cast_device.media_controller.send_message.call_args[0][0]['playbackRate'], 0.9)
+        self.assertEqual(ahead.state.play_rate, 1)
+
+        # half of the round trip is added to both the reported position and the seek target
+        self.assertAlmostEqual(skews['Kitchen'].skew, -2.9)
+        self.assertEqual(skews['Kitchen'].correction, 'seek')
+        self.assertAlmostEqual(behind.cast_device.media_controller.seek.call_args[0][0], 100.1)
+
+        self.assertIsNone(skews['Office'].correction)
+        synced.cast_device.media_controller.seek.assert_not_called()
+        synced.cast_device.media_controller.send_message.assert_not_called()
+
+        self.assertIn('Bedroom: +500 ms, round trip 0 ms, nudge', self.group.report())
+
+        # back within tolerance, the nudged device goes back to the leader's rate
+        self.now += 5
+        self._at(leader, 105)
+        self._at(ahead, 105.05)
+        self.group.correct()
+        self.assertEqual(ahead.cast_device.media_controller.send_message.call_args[0][0]['playbackRate'], 1)
+
+    def test_other_content(self):
+        """Test that devices playing something else are left alone"""
+        leader, other = self.casters[:2]
+        self._at(leader, 100)
+        self._at(other, 10)
+        other.status.expect(content_id='another video')
+
+        self.group.correct()
+        other.cast_device.media_controller.seek.assert_not_called()
+
+    def test_play(self):
+        """Test that all devices start the video and the followers are aligned to the leader"""
+        video = ParseResult('https://example.com/video.mp4', 'https://example.com/video.mp4', 'Video', 'video/mp4')
+        for caster in self.casters:
+            caster.play = mock.Mock()
+            self._at(caster, 0, round_trip=0.1)
+        self._at(self.casters[0], 2, round_trip=0.1)
+
+        self.group.play(video)
+
+        for caster in self.casters:
+            caster.play.assert_called_once_with(video)
+        for caster in self.casters[1:]:
+            self.assertAlmostEqual(caster.cast_device.media_controller.seek.call_args[0][0], 2.1)
+        self.casters[0].cast_device.media_controller.seek.assert_not_called()
+
+    def test_failed_leader(self):
+        """Test that the group doesn't start without its leader"""
+        self.casters[0].play = mock.Mock(side_effect=RuntimeError('unreachable'))
+        for caster in self.casters[1:]:
+            caster.play = mock.Mock()
+
+        with self.assertRaises(RuntimeError):
+            self.group.play(ParseResult('https://example.com/video.mp4', 'https://example.com/video.mp4',
+                                        'Video', 'video/mp4'))
+
+    def test_stop(self):
+        """Test that a stopped group releases its threads"""
+        self.group.stop()
+
+        with self.assertRaises(RuntimeError):
+            self.group.align()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+import asyncio
+import threading
+import unittest
+
+from listeners.abstract_listener import AbstractListener, MessageResult
+from listeners.supervisor import ListenerSupervisor
+
+
+class _Listener(AbstractListener):
+    '''
+    Sends one message to the handler and listens until stopped, fails its first `failures` starts
+    '''
+
+    def __init__(self, config: dict) -> None:
+        self.failures = config.get('failures', 0)
+        self.starts = 0
+        self.stopped = threading.Event()
+
+    def send(self, message: MessageResult) -> None:
+        pass
+
+    async def start(self, handler):
+        self.starts += 1
+        if self.starts <= self.failures:
+            raise RuntimeError('lost connection')
+        handler(self, MessageResult(type(self).__name__))
+        while not self.stopped.is_set():
+            await asyncio.sleep(0.01)
+
+    def stop(self) -> None:
+        self.stopped.set()
+
+
+class _BlockingListener(_Listener):
+    '''
+    Blocks its event loop while listening
+    '''
+
+    blocking = True
+
+    async def start(self, handler):
+        self.starts += 1
+        if self.starts <= self.failures:
+            raise RuntimeError('lost connection')
+        handler(self, MessageResult(type(self).__name__))
+        self.stopped.wait()
+
+
+class TestListenerSupervisor(unittest.TestCase):
+    """Test cases for the ListenerSupervisor class"""
+
+    def _run(self, supervisor: ListenerSupervisor, messages: int) -> list[str]:
+        received = []
+
+        def handler(_, result):
+            received.append(result.text)
+            if len(received) == messages:
+                supervisor.stop()
+
+        asyncio.run(asyncio.wait_for(supervisor.run(handler), 5))
+        return received
+
+    def test_concurrent(self):
+        """Test that a blocking listener doesn't hold up the others and all stop together"""
+        listeners = [_BlockingListener({}), _Listener({})]
+        supervisor = ListenerSupervisor(listeners)
+
+        received = self._run(supervisor, 2)
+
+        self.assertEqual(sorted(received), ['_BlockingListener', '_Listener'])
+        self.assertTrue(all(listener.stopped.is_set() for listener in listeners))
+        self.assertEqual(supervisor.restarts, {'_BlockingListener': 0, '_Listener': 0})
+
+    def test_restart(self):
+        """Test that crashed listeners are restarted"""
+        listeners = [_BlockingListener({'failures': 2}), _Listener({'failures': 1})]
+        supervisor = ListenerSupervisor(listeners, base_delay=0.01)
+
+        received = self._run(supervisor, 2)
+
+        self.assertEqual(sorted(received), ['_BlockingListener', '_Listener'])
+        self.assertEqual([listener.starts for listener in listeners], [3, 2])
+        self.assertEqual(supervisor.restarts, {'_BlockingListener': 2, '_Listener': 1})
+
+
+if __name__ == '__main__':
+    unittest.main()
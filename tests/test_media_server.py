@@ -0,0 +1,159 @@
+import http.client
+import os
+import tempfile
+import threading
+import unittest
+from urllib.parse import urlparse
+
+from caster import MediaServer
+from caster._media_server import parse_range
+
+
+class TestMediaServer(unittest.TestCase):
+    """Test cases for the MediaServer class"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.directory.cleanup)
+        self.content = os.urandom(256 * 1024)
+        self.path = self._write('movie.mp4', self.content)
+
+        self.server = MediaServer(host='127.0.0.1', advertised_host='127.0.0.1', roots=[self.directory.name])
+        self.addCleanup(self.server.stop)
+        self.video = self.server.share(self.path)
+
+    def _write(self, name: str, content: bytes) -> str:
+        path = os.path.join(self.directory.name, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as file:
+            file.write(content)
+        return path
+
+    def _request(self, method: str = 'GET', headers: dict = None, path: str = None) -> http.client.HTTPResponse:
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.port, timeout=5)
+        self.addCleanup(connection.close)
+        connection.request(method, path or urlparse(self.video.url).path, headers=headers or {})
+        return connection.getresponse()
+
+    def test_share(self):
+        """Test that a shared file plays from the server"""
+        self.assertEqual(self.video.title, 'movie')
+        self.assertEqual(self.video.mime_type, 'video/mp4')
+        self.assertTrue(self.video.url.startswith(f'http://127.0.0.1:{self.server.port}/'))
+
+        response = self._request()
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.headers['Content-Type'], 'video/mp4')
+        self.assertEqual(response.headers['Accept-Ranges'], 'bytes')
+        self.assertEqual(response.read(), self.content)
+
+    def test_range(self):
+        """Test that byte ranges are served partially"""
+        response = self._request(headers={'Range': 'bytes=1000-1999'})
+        self.assertEqual(response.status, 206)
+        self.assertEqual(response.headers['Content-Range'], f'bytes 1000-1999/{len(self.content)}')
+        self.assertEqual(response.read(), self.content[1000:2000])
+
+        response = self._request(headers={'Range': 'bytes=-100'})
+        self.assertEqual(response.read(), self.content[-100:])
+
+        response = self._request(headers={'Range': f'bytes={len(self.content)}-'})
+        self.assertEqual(response.status, 416)
+        self.assertEqual(response.headers['Content-Range'], f'bytes */{len(self.content)}')
+
+    def test_keep_alive(self):
+        """Test that seeks reuse the connection"""
+        connection = http.client.HTTPConnection('127.0.0.1', self.server.port, timeout=5)
+        self.addCleanup(connection.close)
+        for start in [0, 5000, 100000]:
+            connection.request('GET', urlparse(self.video.url).path, headers={'Range': f'bytes={start}-{start + 9}'})
+            self.assertEqual(connection.getresponse().read(), self.content[start:start + 10])
+
+    def test_head(self):
+        """Test that HEAD sends headers only"""
+        response = self._request('HEAD')
+        self.assertEqual(response.headers['Content-Length'], str(len(self.content)))
+        self.assertEqual(response.read(), b'')
+
+    def test_copy(self):
+        """Test that files are served without sendfile too"""
+        self.server.use_sendfile = False
+        response = self._request(headers={'Range': 'bytes=100000-'})
+        self.assertEqual(response.read(), self.content[100000:])
+
+    def test_concurrent_streams(self):
+        """Test that several devices stream at once"""
+        results = [None] * 4
+
+        def stream(index):
+            connection = http.client.HTTPConnection('127.0.0.1', self.server.port, timeout=5)
+            connection.request('GET', urlparse(self.video.url).path)
+            results[index] = connection.getresponse().read()
+            connection.close()
+
+        threads = [threading.Thread(target=stream, args=[index]) for index in range(len(results))]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(results, [self.content] * len(results))
+
+    def test_not_shared(self):
+        """Test that only shared media files are served"""
+        self.assertEqual(self._request(path='/0123456789abcdef/other.mp4').status, 404)
+
+        with self.assertRaises(ValueError):
+            self.server.share(self._write('notes.txt', b'secret'))
+        with tempfile.NamedTemporaryFile(suffix='.mp4') as outside:
+            with self.assertRaises(ValueError):
+                self.server.share(outside.name)
+            self.assertEqual(self.server.media_files(outside.name), [])
+            self.assertEqual(self.server.media_files(os.path.dirname(outside.name)), [])
+
+            # nothing is shared until directories are configured
+            with self.assertRaises(ValueError):
+                MediaServer().share(self.path)
+            self.assertFalse(MediaServer().allowed(self.path))
+
+    def test_links_outside(self):
+        """Test that links don't lead out of the shared directories"""
+        with tempfile.TemporaryDirectory() as outside:
+            target = os.path.join(outside, 'private.mp4')
+            with open(target, 'wb') as file:
+                file.write(b'secret')
+            os.symlink(target, os.path.join(self.directory.name, 'link.mp4'))
+            os.symlink(outside, os.path.join(self.directory.name, 'linked'))
+
+            self.assertFalse(self.server.allowed(os.path.join(self.directory.name, 'link.mp4')))
+            self.assertEqual(self.server.media_files(os.path.join(self.directory.name, 'linked')), [])
+            self.assertEqual(self.server.media_files(self.directory.name), [self.path])
+            with self.assertRaises(ValueError):
+                self.server.share(os.path.join(self.directory.name, 'link.mp4'))
+
+    def test_media_files(self):
+        """Test that media files of a directory are listed in order"""
+        self._write('b/2.mkv', b'')
+        self._write('b/1.webm', b'')
+        self._write('a.mp3', b'')
+        self._write('cover.txt', b'')
+
+        self.assertEqual(
+            [os.path.relpath(path, self.directory.name) for path in self.server.media_files(self.directory.name)],
+            ['a.mp3', 'movie.mp4', os.path.join('b', '1.webm'), os.path.join('b', '2.mkv')])
+        self.assertEqual(self.server.media_files(self.path), [self.path])
+
+    def test_parse_range(self):
+        """Test parsing of Range headers"""
+        self.assertIsNone(parse_range(None, 100))
+        self.assertIsNone(parse_range('items=0-1', 100))
+        self.assertEqual(parse_range('bytes=0-', 100), (0, 99))
+        self.assertEqual(parse_range('bytes=10-2000', 100), (10, 99))
+        self.assertEqual(parse_range('bytes=-1000', 100), (0, 99))
+        self.assertEqual(parse_range('bytes=0-9, 20-29', 100), (0, 9))
+        with self.assertRaises(ValueError):
+            parse_range('bytes=50-10', 100)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,139 @@
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from parsers.mirrors import MirrorError, MirrorManager
+
+STREAM_URL = 'http://stream.invalid/videoplayback?expire=1700000000'
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    '''
+    Behaves like an invidious mirror depending on the server's `mode`
+    '''
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Handle a probe"""
+        self.server.hits += 1
+        if self.server.mode == 'hang':
+            time.sleep(1)
+
+        if self.server.mode == 'redirect':
+            self.send_response(302)
+            self.send_header('Location', STREAM_URL)
+        elif self.server.mode == 'error':
+            self.send_response(503)
+        else:
+            self.send_response(404)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *_):  # pylint: disable=arguments-differ
+        pass
+
+
+def _start_stub(mode: str) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(('127.0.0.1', 0), _StubHandler)
+    server.daemon_threads = True
+    server.block_on_close = False
+    server.mode = mode
+    server.hits = 0
+    threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+    return server
+
+
+def _url(server: ThreadingHTTPServer) -> str:
+    return f'http://127.0.0.1:{server.server_address[1]}'
+
+
+class TestMirrorManager(unittest.TestCase):
+    """Test cases for the MirrorManager class against local stub mirrors"""
+
+    def setUp(self):
+        self.servers = {mode: _start_stub(mode) for mode in ['redirect', 'error', 'hang', 'missing']}
+
+    def tearDown(self):
+        for server in self.servers.values():
+            server.shutdown()
+            server.server_close()
+
+    def test_redirect(self):
+        """Test that a redirecting mirror wins over failing and hanging ones"""
+
+        manager = MirrorManager([_url(self.servers[mode]) for mode in ['hang', 'error', 'redirect']],
+                                timeout=0.5, hedge_delay=0.05)
+
+        started = time.monotonic()
+        self.assertEqual(manager.get_stream('dQw4w9WgXcQ'), STREAM_URL)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+        # the working mirror is ranked first once the hanging one times out
+        time.sleep(0.7)
+        self.assertEqual(manager.ranked()[0].base_url, _url(self.servers['redirect']))
+
+    def test_all_failing(self):
+        """Test that errors of every mirror are reported"""
+
+        manager = MirrorManager([_url(self.servers['error']), _url(self.servers['hang'])], timeout=0.2, hedge_delay=0.05)
+
+        with self.assertRaises(MirrorError) as context:
+            manager.get_stream('dQw4w9WgXcQ')
+        self.assertEqual(len(context.exception.errors), 2)
+
+    def test_no_stream(self):
+        """Test that a healthy mirror without the video returns nothing"""
+
+        manager = MirrorManager([_url(self.servers['missing'])])
+        self.assertIsNone(manager.get_stream('dQw4w9WgXcQ'))
+        self.assertEqual(manager.stats()[0].consecutive_failures, 0)
+
+    def test_circuit_breaker(self):
+        """Test that a failing mirror is skipped until the cooldown passes"""
+
+        now = [0.0]
+        server = self.servers['error']
+        manager = MirrorManager([_url(server)], failure_threshold=2, cooldown=60, clock=lambda: now[0])
+
+        for _ in range(2):
+            with self.assertRaises(MirrorError):
+                manager.get_stream('dQw4w9WgXcQ')
+        self.assertEqual(manager.ranked(), [])
+
+        with self.assertRaises(MirrorError):
+            manager.get_stream('dQw4w9WgXcQ')
+        self.assertEqual(server.hits, 2)
+
+        # half-open after the cooldown, a single failing probe opens it again
+        now[0] = 61
+        with self.assertRaises(MirrorError):
+            manager.get_stream('dQw4w9WgXcQ')
+        self.assertEqual(server.hits, 3)
+        self.assertEqual(manager.ranked(), [])
+
+    def test_half_open_while_healthy(self):
+        """Test that an opened mirror is still probed after its cooldown while another one keeps winning"""
+
+        now = [0.0]
+        working, failing = self.servers['redirect'], self.servers['error']
+        manager = MirrorManager([_url(failing), _url(working)], failure_threshold=1, cooldown=60,
+                                hedge_delay=5, clock=lambda: now[0])
+
+        self.assertEqual(manager.get_stream('dQw4w9WgXcQ'), STREAM_URL)
+        self.assertEqual(failing.hits, 1)
+
+        # listing the half-open mirror doesn't use up its trial
+        for now[0] in [61, 90, 125]:
+            self.assertEqual(manager.get_stream('dQw4w9WgXcQ'), STREAM_URL)
+        self.assertEqual(failing.hits, 1)
+
+        working.mode = 'error'
+        now[0] = 130
+        with self.assertRaises(MirrorError) as context:
+            manager.get_stream('dQw4w9WgXcQ')
+        self.assertEqual(len(context.exception.errors), 2)
+        self.assertEqual(failing.hits, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import asyncio
+import json
+import queue
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ntfpy
+import requests
+
+from listeners.abstract_listener import MessageResult
+from listeners.ntfy_listener import NTFYListener
+
+
+class _FakeNTFY(BaseHTTPRequestHandler):
+    '''
+    Publishes posted messages to the subscription, like ntfy does for every subscriber of a topic
+    '''
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Publish a message"""
+        message = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        self.server.events.put({'event': 'message', 'message': message['message'], 'tags': message.get('tags')})
+        self.send_response(200)
+        self.send_header('Content-Length', '2')
+        self.end_headers()
+        self.wfile.write(b'{}')
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Stream the subscription"""
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/x-ndjson')
+        self.send_header('Transfer-Encoding', 'chunked')
+        self.end_headers()
+        self._write({'event': 'open'})
+
+        deadline = time.monotonic() + 10
+        while time.monotonic() < deadline:
+            try:
+                self._write(self.server.events.get(timeout=0.1))
+            except queue.Empty:
+                continue
+            except OSError:
+                return
+
+    def _write(self, event: dict) -> None:
+        line = json.dumps(event).encode() + b'\n'
+        self.wfile.write(f'{len(line):x}\r\n'.encode() + line + b'\r\n')
+        self.wfile.flush()
+
+    def log_message(self, *_):  # pylint: disable=arguments-differ
+        pass
+
+
+class TestNTFYListener(unittest.TestCase):
+    """Test cases for the NTFYListener class"""
+
+    def setUp(self):
+        server = ThreadingHTTPServer(('127.0.0.1', 0), _FakeNTFY)
+        server.daemon_threads = True
+        server.events = queue.Queue()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+
+        self.url = f'http://127.0.0.1:{server.server_address[1]}'
+        self.listener = NTFYListener({'NTFY_CHANNEL': 'topic'})
+        self.listener.client = ntfpy.NTFYClient(ntfpy.NTFYServer(self.url), 'topic')
+        self.messages = queue.Queue()
+        self.thread = threading.Thread(target=asyncio.run, args=(self.listener.start(self._handler),), daemon=True)
+        self.thread.start()
+        self.addCleanup(self.listener.stop)
+
+    def _handler(self, _, result):
+        self.messages.put(result.text)
+
+    def _publish(self, text: str) -> None:
+        requests.post(f'{self.url}/', json={'topic': 'topic', 'message': text}, timeout=5)
+
+    def test_stop(self):
+        """Test that a listener waiting for the next message stops right away"""
+        self._publish('pause')
+        self.assertEqual(self.messages.get(timeout=5), 'pause')
+
+        started = time.monotonic()
+        self.listener.stop()
+        self.thread.join(timeout=5)
+
+        self.assertFalse(self.thread.is_alive())
+        self.assertLess(time.monotonic() - started, 1)
+        self.assertTrue(self.messages.empty())
+
+    def test_own_replies(self):
+        """Test that replies the topic echoes back aren't taken for commands"""
+        self.listener.send(MessageResult('Now playing [Channel Url](https://www\\.youtube\\.com/channel/x)'))
+        self._publish('pause')
+
+        self.assertEqual(self.messages.get(timeout=5), 'pause')
+        self.assertTrue(self.messages.empty())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,97 @@
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+
+from listeners.abstract_listener import MessageResult
+from listeners.outbound_scheduler import OutboundScheduler, TokenBucket
+from listeners.telegram_listener import TelegramListener
+
+
+class TestOutboundScheduler(unittest.TestCase):
+    """Test cases for the OutboundScheduler class and the live messages sent through it"""
+
+    def _wait(self, condition, timeout=2):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail('timed out')
+            time.sleep(0.01)
+
+    def test_token_bucket(self):
+        """Test that a bucket allows a burst and then its rate"""
+        bucket = TokenBucket(rate=2, capacity=3, now=0)
+
+        for _ in range(3):
+            self.assertEqual(bucket.delay(0), 0)
+            bucket.take(0)
+        self.assertEqual(bucket.delay(0), 0.5)
+        self.assertEqual(bucket.delay(0.5), 0)
+        bucket.take(0.5)
+        self.assertEqual(bucket.delay(0.75), 0.25)
+        # unused time doesn't save up more than the capacity
+        self.assertEqual(bucket.delay(100), 0)
+        self.assertEqual(bucket.tokens, 3)
+
+    def test_chat_rate(self):
+        """Test that a chat is held to its rate while the others aren't held up"""
+        scheduler = OutboundScheduler(rate=100, chat_rate=20, chat_burst=1)
+        self.addCleanup(scheduler.stop)
+        sent = []
+
+        started = time.monotonic()
+        for index in range(5):
+            scheduler.submit(1, lambda index=index: sent.append((1, index, time.monotonic() - started)))
+        scheduler.submit(2, lambda: sent.append((2, 0, time.monotonic() - started)))
+
+        self._wait(lambda: len(sent) == 6)
+        self.assertEqual([index for chat_id, index, _ in sent if chat_id == 1], list(range(5)))
+        # 5 messages at 20 a second take 0.2 seconds, the other chat goes second
+        self.assertGreaterEqual(sent[-1][2], 0.19)
+        self.assertEqual(sent[1][0], 2)
+        self.assertLess(sent[1][2], 0.05)
+
+    def test_replace(self):
+        """Test that a waiting message is replaced by a newer one with the same key"""
+        scheduler = OutboundScheduler()
+        self.addCleanup(scheduler.stop)
+        release = threading.Event()
+        sent = []
+
+        scheduler.submit(1, release.wait)
+        self._wait(lambda: scheduler.pending() == 0)
+        for index in range(5):
+            scheduler.submit(1, lambda index=index: sent.append(('edit', index)), key='status')
+        scheduler.submit(1, lambda: sent.append(('reply', 0)))
+        release.set()
+
+        self._wait(lambda: len(sent) == 2)
+        self.assertEqual(sent, [('edit', 4), ('reply', 0)])
+        self.assertEqual((scheduler.sent, scheduler.replaced), (3, 4))
+
+    def test_live_message(self):
+        """Test that a live message is edited in place and only when its status changes"""
+        listener = TelegramListener({'TELEGRAM_BOT_TOKEN': '123456:test-token', 'TELEGRAM_CALLBACK_DB': ':memory:'})
+        self.addCleanup(listener.outbound.stop)
+        listener.bot = mock.Mock()
+        listener.bot.send_message.return_value = SimpleNamespace(message_id=7)
+        request = SimpleNamespace(id=3, chat=SimpleNamespace(id=10))
+
+        listener.send_live(MessageResult('Video', request, chat_id=10), '▶️ 0%')
+        self._wait(lambda: listener.bot.send_message.called)
+        listener.update_live(10, '▶️ 0%')
+        listener.update_live(10, '▶️ 50%')
+        listener.update_live(20, '▶️ 50%')
+        self._wait(lambda: listener.bot.edit_message_text.called)
+        listener.update_live(10, '▶️ 50%')
+
+        listener.bot.send_message.assert_called_once()
+        self.assertEqual(listener.bot.send_message.call_args.args, (10, 'Video\n▶️ 0%'))
+        self.assertEqual(listener.bot.edit_message_text.call_args.args, ('Video\n▶️ 50%', 10, 7))
+        self.assertEqual(listener.outbound.pending(), 0)
+        self.assertEqual(listener.bot.edit_message_text.call_count, 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
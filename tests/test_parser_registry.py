@@ -0,0 +1,35 @@
+import unittest
+
+from parsers import fallback, get_parser_for_url, invidious, tube, web
+
+
+class TestParserRegistry(unittest.TestCase):
+    """Test cases for parser routing"""
+
+    def test_hosts(self):
+        """Test routing by hostname and its parent domains"""
+
+        youtube = [tube.TubeParser, invidious.InvidiousParser]
+        self.assertEqual(get_parser_for_url('https://www.youtube.com/watch?v=dQw4w9WgXcQ'), youtube)
+        self.assertEqual(get_parser_for_url('https://M.YouTube.com./shorts/dQw4w9WgXcQ'), youtube)
+        self.assertEqual(get_parser_for_url('https://youtu.be/dQw4w9WgXcQ'), youtube)
+        self.assertEqual(get_parser_for_url('https://rumble.com/v123-video.html'), [web.WebParser])
+
+    def test_path_rules(self):
+        """Test routing invidious mirrors by the /watch?v= path"""
+
+        youtube = [tube.TubeParser, invidious.InvidiousParser]
+        self.assertEqual(get_parser_for_url('https://yewtu.be/watch?v=dQw4w9WgXcQ'), youtube)
+        self.assertEqual(get_parser_for_url('https://yewtu.be/watch?t=10&v=dQw4w9WgXcQ'), youtube)
+
+    def test_no_false_matches(self):
+        """Test that domains and paths only match in their own url parts"""
+
+        self.assertEqual(get_parser_for_url('https://notyoutube.com/video'), [fallback.FallbackParser])
+        self.assertEqual(get_parser_for_url('https://example.com/?ref=youtube.com'), [fallback.FallbackParser])
+        self.assertEqual(get_parser_for_url('https://example.com/page?next=/watch?v=1'), [fallback.FallbackParser])
+        self.assertEqual(get_parser_for_url('https://example.com/watch?list=1'), [fallback.FallbackParser])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import threading
+import unittest
+
+from caster._queue import PlaybackQueue
+from parsers.abstract_parser import ParseResult
+
+
+class _Resolver:
+    '''
+    Resolves urls into streams expiring at `expires_at`
+    '''
+
+    def __init__(self, expires_at: float = 10**10):
+        self.expires_at = expires_at
+        self.calls = []
+        self.called = threading.Semaphore(0)
+
+    def __call__(self, url: str) -> ParseResult:
+        self.calls.append(url)
+        self.called.release()
+        if 'fail' in url:
+            raise RuntimeError(url)
+        return ParseResult(f'https://r1.googlevideo.com/videoplayback?expire={self.expires_at}', url, url, 'video/mp4')
+
+
+class TestPlaybackQueue(unittest.TestCase):
+    """Test cases for the PlaybackQueue class"""
+
+    def test_prefetch(self):
+        """Test that only the next items are resolved in advance"""
+
+        resolver = _Resolver()
+        queue = PlaybackQueue(resolver, prefetch=2)
+        for index in range(4):
+            self.assertEqual(queue.enqueue(f'https://youtu.be/{index}'), index + 1)
+
+        items = queue.items()
+        self.assertIsNotNone(items[0].future)
+        self.assertIsNotNone(items[1].future)
+        self.assertIsNone(items[2].future)
+
+        item = queue.pop()
+        self.assertEqual(item.result(5).original_url, 'https://youtu.be/0')
+        self.assertIsNotNone(items[2].future)
+        items[2].future.result(5)
+        self.assertEqual(resolver.calls, [f'https://youtu.be/{index}' for index in range(3)])
+
+    def test_failure(self):
+        """Test that a failed resolution is raised when the item is played"""
+
+        queue = PlaybackQueue(_Resolver())
+        queue.enqueue('https://youtu.be/fail')
+
+        with self.assertRaises(RuntimeError):
+            queue.pop().result(5)
+        self.assertIsNone(queue.pop())
+
+    def test_refresh(self):
+        """Test that expiring streams are resolved again"""
+
+        resolver = _Resolver(expires_at=1000)
+        queue = PlaybackQueue(resolver, refresh_margin=300, min_refresh_interval=0.05, clock=lambda: 800)
+        queue.enqueue('https://youtu.be/1')
+        queue.items()[0].future.result(5)
+
+        # the stream expires within the margin, so it's refreshed after the minimal interval
+        resolver.called.acquire()  # pylint: disable=consider-using-with
+        self.assertTrue(resolver.called.acquire(timeout=5))  # pylint: disable=consider-using-with
+        self.assertEqual(len(resolver.calls), 2)
+
+        queue.clear()
+        self.assertEqual(queue.items(), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
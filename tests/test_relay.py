@@ -0,0 +1,197 @@
+import http.client
+import os
+import re
+import tempfile
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse
+
+from caster import DiskCache, StreamRelay
+from parsers import session
+from parsers.abstract_parser import ParseResult
+
+CONTENT = os.urandom(10 * 1000)
+SEGMENTS = [os.urandom(500) for _ in range(4)]
+PLAYLIST = '#EXTM3U\n#EXT-X-KEY:METHOD=AES-128,URI="key.bin"\n' + ''.join(
+    f'#EXTINF:4.0,\nseg{index}.ts\n' for index in range(len(SEGMENTS))) + '#EXT-X-ENDLIST\n'
+
+
+class _UpstreamHandler(BaseHTTPRequestHandler):
+    '''
+    Serves a video with ranges, the same one without them and an HLS playlist, counts requests per path
+    '''
+
+    protocol_version = 'HTTP/1.1'
+    requests: dict[str, int] = {}
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Serve the upstream media"""
+        path = self.path.split('?')[0]
+        self.requests[path] = self.requests.get(path, 0) + 1
+
+        body = {'/video.mp4': CONTENT, '/norange.mp4': CONTENT, '/list.m3u8': PLAYLIST.encode(),
+                '/key.bin': b'key'}.get(path)
+        if path.startswith('/seg'):
+            body = SEGMENTS[int(path[4:-3])]
+
+        match = re.match(r'bytes=(\d+)-(\d+)', self.headers['Range'] or '')
+        if path == '/video.mp4' and match:
+            start, end = int(match.group(1)), min(int(match.group(2)), len(body) - 1)
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{end}/{len(body)}')
+            body = body[start:end + 1]
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):  # pylint: disable=arguments-differ
+        pass
+
+
+class TestStreamRelay(unittest.TestCase):
+    """Test cases for the StreamRelay class"""
+
+    def setUp(self):
+        _UpstreamHandler.requests = {}
+        self.upstream = ThreadingHTTPServer(('127.0.0.1', 0), _UpstreamHandler)
+        self.upstream.daemon_threads = True
+        threading.Thread(target=self.upstream.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        self.addCleanup(self.upstream.server_close)
+        self.addCleanup(self.upstream.shutdown)
+
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.directory.cleanup)
+        self.relay = self._relay()
+
+    def _relay(self, **kwargs) -> StreamRelay:
+        relay = StreamRelay(DiskCache(self.directory.name, 1024 * 1024), host='127.0.0.1', advertised_host='127.0.0.1',
+                            block_size=1000, session=session.create_session(), **kwargs)
+        self.addCleanup(relay.stop)
+        return relay
+
+    def _video(self, path: str, mime_type: str = 'video/mp4') -> ParseResult:
+        return ParseResult(f'http://127.0.0.1:{self.upstream.server_address[1]}{path}?token=1',
+                           'https://www.youtube.com/watch?v=dQw4w9WgXcQ', 'Video', mime_type)
+
+    def _get(self, url: str, headers: dict = None) -> http.client.HTTPResponse:
+        parsed_url = urlparse(url)
+        connection = http.client.HTTPConnection(parsed_url.hostname, parsed_url.port, timeout=5)
+        self.addCleanup(connection.close)
+        connection.request('GET', parsed_url.path, headers=headers or {})
+        return connection.getresponse()
+
+    def _wait_for(self, condition):
+        deadline = time.monotonic() + 2
+        while not condition() and time.monotonic() < deadline:
+            time.sleep(0.01)
+
+    def test_stream(self):
+        """Test that a stream is relayed in blocks"""
+        url = self.relay.relay(self._video('/video.mp4'))
+        self.assertTrue(url.startswith(f'http://127.0.0.1:{self.relay.port}/'))
+
+        response = self._get(url)
+        self.assertEqual(response.status, 200)
+        self.assertEqual(response.headers['Content-Type'], 'video/mp4')
+        self.assertEqual(response.read(), CONTENT)
+
+        response = self._get(url, {'Range': 'bytes=2500-4499'})
+        self.assertEqual(response.status, 206)
+        self.assertEqual(response.headers['Content-Range'], f'bytes 2500-4499/{len(CONTENT)}')
+        self.assertEqual(response.read(), CONTENT[2500:4500])
+
+    def test_seek_back(self):
+        """Test that seeking back is served from the cache, also after the video is resolved again"""
+        relay = self._relay(prefetch=0)
+        url = relay.relay(self._video('/video.mp4'))
+        self.assertEqual(self._get(url, {'Range': 'bytes=0-2999'}).read(), CONTENT[:3000])
+        fetched = _UpstreamHandler.requests['/video.mp4']
+
+        self.assertEqual(self._get(url, {'Range': 'bytes=1500-1999'}).read(), CONTENT[1500:2000])
+        self.assertEqual(_UpstreamHandler.requests['/video.mp4'], fetched)
+
+        relay = self._relay(prefetch=0)
+        url = relay.relay(self._video('/video.mp4'))
+        self.assertEqual(self._get(url, {'Range': 'bytes=0-999'}).read(), CONTENT[:1000])
+        self.assertEqual(_UpstreamHandler.requests['/video.mp4'], fetched)
+
+    def test_prefetch(self):
+        """Test that blocks ahead of the playhead are fetched in the background"""
+        relay = self._relay(prefetch=3)
+        url = relay.relay(self._video('/video.mp4'))
+        self.assertEqual(self._get(url, {'Range': 'bytes=0-999'}).read(), CONTENT[:1000])
+
+        resource_id = urlparse(url).path.split('/')[1]
+        self._wait_for(lambda: all(f'{resource_id}-{index}' in relay.cache for index in range(4)))
+        self.assertEqual([f'{resource_id}-{index}' in relay.cache for index in range(5)], [True] * 4 + [False])
+
+    def test_no_ranges(self):
+        """Test that a stream without range support is passed through"""
+        url = self.relay.relay(self._video('/norange.mp4'))
+        self.assertEqual(self._get(url).read(), CONTENT)
+        self.assertEqual(self._get(url).read(), CONTENT)
+        self.assertEqual(self.relay.cache.stats()['size'], 0)
+
+    def test_playlist(self):
+        """Test that HLS segments go through the relay and the following ones are prefetched"""
+        url = self.relay.relay(self._video('/list.m3u8', 'application/x-mpegURL'))
+        playlist = self._get(url).read().decode()
+
+        relay_url = f'http://127.0.0.1:{self.relay.port}/'
+        segment_urls = [line for line in playlist.splitlines() if line and not line.startswith('#')]
+        self.assertEqual(len(segment_urls), len(SEGMENTS))
+        self.assertTrue(all(segment_url.startswith(relay_url) for segment_url in segment_urls))
+        self.assertIn(f'URI="{relay_url}', playlist)
+
+        self.assertEqual(self._get(segment_urls[0]).read(), SEGMENTS[0])
+        self._wait_for(lambda: '/seg3.ts' in _UpstreamHandler.requests)
+        for segment_url, segment in zip(segment_urls, SEGMENTS):
+            self.assertEqual(self._get(segment_url).read(), segment)
+        self.assertEqual([_UpstreamHandler.requests[f'/seg{index}.ts'] for index in range(len(SEGMENTS))], [1] * 4)
+
+    def test_not_relayed(self):
+        """Test that live and local videos are played directly"""
+        video = self._video('/video.mp4')
+        video.is_live = True
+        self.assertEqual(self.relay.relay(video), video.url)
+
+        video = self._video('/video.mp4')
+        video.original_url = '/home/user/video.mp4'
+        self.assertEqual(self.relay.relay(video), video.url)
+
+    def test_unknown(self):
+        """Test that unknown ids aren't served"""
+        self.relay.start()
+        self.assertEqual(self._get(f'http://127.0.0.1:{self.relay.port}/0123456789abcdef/video.mp4').status, 404)
+
+
+class TestDiskCache(unittest.TestCase):
+    """Test cases for the DiskCache class"""
+
+    def test_eviction(self):
+        """Test that the least recently used blobs are evicted when the cache is full and kept across restarts"""
+        with tempfile.TemporaryDirectory() as directory:
+            cache = DiskCache(directory, 300)
+            for key in ['a', 'b', 'c']:
+                cache.put(key, key.encode() * 100)
+            self.assertEqual(cache.get('a'), b'a' * 100)
+
+            cache.put('d', b'd' * 100)
+            self.assertIsNone(cache.get('b'))
+            self.assertEqual(sorted(os.listdir(directory)), ['a', 'c', 'd'])
+            self.assertEqual(cache.stats(), {'hits': 1, 'misses': 1, 'evictions': 1, 'size': 3, 'bytes': 300})
+
+            restarted = DiskCache(directory, 200)
+            self.assertEqual(restarted.stats()['size'], 2)
+            self.assertEqual(restarted.get('d'), b'd' * 100)
+
+            restarted.discard('d')
+            self.assertNotIn('d', restarted)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,73 @@
+import time
+import unittest
+
+from parsers.abstract_parser import AbstractParser, ParseResult
+from parsers.resolver import resolve
+
+
+def _parser(name: str, delay: float = 0, fail: bool = False, empty: bool = False) -> AbstractParser:
+    class _Parser(AbstractParser):
+        @staticmethod
+        def supported_domains() -> list[str]:
+            return []
+
+        @staticmethod
+        def parse(url: str) -> ParseResult:
+            time.sleep(delay)
+            if fail:
+                raise RuntimeError(name)
+            if empty:
+                return None
+            return ParseResult(url, url, name, 'video/mp4')
+
+    return _Parser
+
+
+class TestResolver(unittest.TestCase):
+    """Test cases for the parser resolver"""
+
+    def test_priority_order(self):
+        """Test that a faster lower priority parser doesn't win over a higher priority one"""
+
+        video = resolve('https://example.com', [_parser('first', 0.1), _parser('second')])
+        self.assertEqual(video.title, 'first')
+
+    def test_failing_parser(self):
+        """Test that a failing parser doesn't delay the next one"""
+
+        errors = []
+        started = time.monotonic()
+        video = resolve('https://example.com', [_parser('first', 0.1, fail=True), _parser('second'), _parser('third')],
+                        errors.append)
+
+        self.assertEqual(video.title, 'second')
+        self.assertEqual([str(error) for error in errors], ['first'])
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_patience(self):
+        """Test that a slow higher priority parser is abandoned after the patience period"""
+
+        started = time.monotonic()
+        video = resolve('https://example.com', [_parser('slow', 2), _parser('fast')], patience=0.1)
+
+        self.assertEqual(video.title, 'fast')
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_no_result(self):
+        """Test that nothing is returned when all parsers come back empty"""
+
+        self.assertIsNone(resolve('https://example.com', [_parser('first', empty=True), _parser('second', fail=True)]))
+        self.assertIsNone(resolve('https://example.com', [_parser('first', empty=True)], parallel=False))
+
+    def test_sequential(self):
+        """Test the sequential mode"""
+
+        errors = []
+        video = resolve('https://example.com', [_parser('first', fail=True), _parser('second')], errors.append, parallel=False)
+
+        self.assertEqual(video.title, 'second')
+        self.assertEqual(len(errors), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from parsers import consts, session
+
+
+class _KeepAliveHandler(BaseHTTPRequestHandler):
+    '''
+    Answers every request on a persistent connection
+    '''
+
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        """Echo the user agent"""
+        body = self.headers['User-Agent'].encode()
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *_):  # pylint: disable=arguments-differ
+        pass
+
+
+class TestSession(unittest.TestCase):
+    """Test cases for the pooled session"""
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), _KeepAliveHandler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True).start()
+        self.host = f'127.0.0.1:{self.server.server_address[1]}'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_connection_reuse(self):
+        """Test that consecutive requests to a host share one connection"""
+
+        http = session.create_session()
+        for _ in range(5):
+            response = http.get(f'http://{self.host}/', timeout=5)
+            self.assertEqual(response.text, consts.BROWSER_HEADERS['User-Agent'])
+
+        self.assertEqual(session.connection_stats(http)[self.host], {'requests': 5, 'connections': 1, 'reused': 4})
+
+    def test_encodings(self):
+        """Test that the session only accepts encodings its responses can be decoded from"""
+
+        http = session.create_session()
+        self.assertEqual(http.headers['Accept-Encoding'], requests.utils.default_headers()['Accept-Encoding'])
+        self.assertEqual(http.headers['User-Agent'], consts.BROWSER_HEADERS['User-Agent'])
+
+
+if __name__ == '__main__':
+    unittest.main()
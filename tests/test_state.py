@@ -0,0 +1,128 @@
+import json
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest import mock
+
+from caster._state import State
+from caster._store import StateStore
+
+VIDEO_URL = 'https://www.youtube.com/watch?v=dQw4w9WgXcQ'
+
+
+class TestState(unittest.TestCase):
+    """Test cases for the State class and its store"""
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()  # pylint: disable=consider-using-with
+        self.addCleanup(self.directory.cleanup)
+        self.file_loc = os.path.join(self.directory.name, 'settings.json')
+        patcher = mock.patch('caster._state.State.file_loc', return_value=self.file_loc)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _rows(self, table: str) -> list[tuple]:
+        with sqlite3.connect(State.db_loc('Living Room')) as connection:
+            return connection.execute(f'SELECT * FROM {table} ORDER BY 1').fetchall()
+
+    def test_round_trip(self):
+        """Test that settings and history survive a restart"""
+        state = State.init_state('Living Room')
+        self.assertEqual((state.play_rate, state.volume), (1, 100))
+        self.assertNotIn(VIDEO_URL, state.history)
+
+        state.play_rate = 1.5
+        state.volume = 30
+        state.history[VIDEO_URL] = 42
+        state.history['https://example.com/video.mp4'] = 7
+        del state.history['https://example.com/video.mp4']
+        state.save_state()
+
+        state = State.init_state('Living Room')
+        self.addCleanup(state.save_state)
+        self.assertEqual((state.play_rate, state.volume), (1.5, 30))
+        self.assertEqual(len(state.history), 1)
+        with self.assertRaises(KeyError):
+            _ = state.history['https://example.com/video.mp4']
+
+        # the same video from a mirror or a short link
+        self.assertEqual(state.history['https://yewtu.be/watch?v=dQw4w9WgXcQ&t=10'], 42)
+        self.assertEqual(state.history.lookup('https://youtu.be/dQw4w9WgXcQ'), 42)
+
+    def test_write_behind(self):
+        """Test that changes are written in the background, not by the caller"""
+        state = State(StateStore(State.db_loc('Living Room'), flush_interval=60))
+        self.addCleanup(state.save_state)
+
+        state.history[VIDEO_URL] = 42
+        state.volume = 30
+        self.assertEqual(state.history[VIDEO_URL], 42)
+        self.assertEqual(self._rows('positions'), [])
+
+        state.store.flush()
+        self.assertEqual([row[:2] for row in self._rows('positions')], [('youtube:dQw4w9WgXcQ', 42)])
+        self.assertEqual(self._rows('settings'), [('volume', 30)])
+
+        # only changes since the last flush are written
+        state.store.flush()
+        self.assertEqual(state.store.flushes, 1)
+
+    def test_import_json(self):
+        """Test that a new database starts from the JSON state file"""
+        with open(self.file_loc, 'w', encoding='utf-8') as file:
+            json.dump({'play_rate': 1.25, 'volume': 50, 'history': {'[720p] Video': 120}}, file)
+
+        state = State.init_state('Living Room')
+        self.assertEqual((state.play_rate, state.volume), (1.25, 50))
+        # title keyed positions are matched by the title without the parser's prefix
+        self.assertIsNone(state.history.lookup(VIDEO_URL))
+        self.assertEqual(state.history.lookup(VIDEO_URL, '[Invidious] Video'), 120)
+        self.assertEqual(state.history[VIDEO_URL], 120)
+        state.history[VIDEO_URL] = 130
+        state.save_state()
+
+        # the file isn't imported again over newer positions
+        state = State.init_state('Living Room')
+        self.addCleanup(state.save_state)
+        self.assertEqual(state.history.lookup(VIDEO_URL, '[720p] Video'), 130)
+        self.assertIsNone(state.history.lookup('https://example.com/video.mp4', '[720p] Video'))
+
+    def test_title_database(self):
+        """Test that a database with a title keyed history is migrated"""
+        with sqlite3.connect(State.db_loc('Living Room')) as connection:
+            connection.execute('CREATE TABLE history (title TEXT PRIMARY KEY, position REAL, updated_at REAL)')
+            connection.execute("INSERT INTO history VALUES ('[720p] Video', 120, 0)")
+        connection.close()
+
+        state = State.init_state('Living Room')
+        self.addCleanup(state.save_state)
+        self.assertEqual(state.history.lookup(VIDEO_URL, 'Video'), 120)
+
+    def test_eviction(self):
+        """Test that the least recently watched and too old videos are evicted"""
+        now = [1000.0]
+        store = StateStore(State.db_loc('Living Room'), max_entries=2, max_age=100, clock=lambda: now[0])
+        self.addCleanup(store.close)
+        state = State(store)
+
+        for index in range(3):
+            state.history[f'https://example.com/{index}.mp4'] = index + 1
+            now[0] += 10
+        state.history['https://example.com/0.mp4'] = 5
+        store.flush()
+
+        self.assertEqual(len(state.history), 2)
+        self.assertNotIn('https://example.com/1.mp4', state.history)
+        self.assertIn('https://example.com/0.mp4', state.history)
+
+        now[0] += 95
+        state.history['https://example.com/3.mp4'] = 4
+        store.flush()
+        self.assertEqual(len(state.history), 2)
+        self.assertNotIn('https://example.com/2.mp4', state.history)
+        self.assertEqual(store.evictions, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
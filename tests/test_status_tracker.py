@@ -0,0 +1,124 @@
+import queue
+import threading
+import time
+import unittest
+
+from pychromecast.controllers.media import MediaStatus
+
+from caster._status import StatusTracker
+
+
+class _FakeMediaController:
+    def __init__(self):
+        self.status = MediaStatus()
+        self.polled = threading.Semaphore(0)
+
+    def register_status_listener(self, _):
+        """Register a listener"""
+
+    def update_status(self):
+        """Request a status update"""
+        self.polled.release()
+
+
+class _FakeDevice:
+    '''
+    Pretends to be a connected Chromecast
+    '''
+
+    name = 'Living Room'
+    model_name = 'Chromecast'
+    status = None
+
+    def __init__(self):
+        self.media_controller = _FakeMediaController()
+
+    def register_status_listener(self, _):
+        """Register a listener"""
+
+
+def _media_status(player_state: str, current_time: float = 0, duration: float = None,
+                  playback_rate: float = 1) -> MediaStatus:
+    status = MediaStatus()
+    status.update({'status': [{'playerState': player_state, 'currentTime': current_time, 'mediaSessionId': 1,
+                               'playbackRate': playback_rate, 'media': {'duration': duration}}]})
+    return status
+
+
+class TestStatusTracker(unittest.TestCase):
+    """Test cases for the StatusTracker class"""
+
+    def test_subscribers(self):
+        """Test that subscribers get every change in order"""
+
+        tracker = StatusTracker()
+        events = queue.Queue()
+        unsubscribe = tracker.subscribe(lambda snapshot, previous: events.put((snapshot, previous)))
+        tracker.attach(_FakeDevice())
+
+        tracker.new_media_status(_media_status('PLAYING', 10))
+        tracker.new_media_status(_media_status('PAUSED', 12))
+
+        states = [events.get(timeout=5)[0].player_state for _ in range(4)]
+        self.assertEqual(states[2:], ['PLAYING', 'PAUSED'])
+        self.assertEqual(tracker.snapshot.device_name, 'Living Room')
+        self.assertEqual(tracker.snapshot.current_time, 12)
+
+        unsubscribe()
+        tracker.new_media_status(_media_status('PLAYING', 12))
+        with self.assertRaises(queue.Empty):
+            events.get(timeout=0.1)
+
+        tracker.stop()
+
+    def test_fallback_poll(self):
+        """Test that the device is polled only when playback events go stale"""
+
+        now = [time.time()]
+        device = _FakeDevice()
+        tracker = StatusTracker(stale_after=0.1, clock=lambda: now[0])
+        tracker.attach(device)
+
+        tracker.new_media_status(_media_status('IDLE'))
+        self.assertFalse(device.media_controller.polled.acquire(timeout=0.3))  # pylint: disable=consider-using-with
+
+        tracker.new_media_status(_media_status('PLAYING'))
+        now[0] += 1
+        self.assertTrue(device.media_controller.polled.acquire(timeout=1))  # pylint: disable=consider-using-with
+
+        start = time.monotonic()
+        tracker.stop()
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    def test_position(self):
+        """Test that the position is extrapolated while playing and resynced by events"""
+
+        now = [1000.0]
+        tracker = StatusTracker(clock=lambda: now[0])
+
+        tracker.new_media_status(_media_status('PLAYING', 10, duration=100, playback_rate=1.5))
+        now[0] += 4
+        self.assertEqual(tracker.position(), 16)
+
+        # a seek applies right away, and the estimate keeps moving from there
+        tracker.expect(current_time=50)
+        now[0] += 2
+        self.assertEqual(tracker.position(), 53)
+
+        # a new rate only applies from the moment it was sent
+        tracker.expect(playback_rate=1)
+        now[0] += 2
+        self.assertEqual(tracker.position(), 55)
+
+        now[0] += 100
+        self.assertEqual(tracker.position(), 100)
+
+        tracker.new_media_status(_media_status('PAUSED', 42, duration=100))
+        now[0] += 10
+        self.assertEqual(tracker.position(), 42)
+        self.assertEqual(tracker.snapshot.position(now[0] + 10), 42)
+        tracker.stop()
+
+
+if __name__ == '__main__':
+    unittest.main()
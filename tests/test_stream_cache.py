@@ -0,0 +1,93 @@
+import unittest
+
+from parsers import utils
+from parsers.abstract_parser import ParseResult
+from parsers.cache import StreamCache
+
+
+class FakeClock:
+    """A controllable time source"""
+
+    def __init__(self, now: float = 1000):
+        self.now = now
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def _video(stream_url: str) -> ParseResult:
+    return ParseResult(stream_url, 'https://youtube.com/watch?v=dQw4w9WgXcQ', 'Title', 'video/mp4')
+
+
+class TestStreamCache(unittest.TestCase):
+    """Test cases for the StreamCache class"""
+
+    def test_canonical_id(self):
+        """Test that the same video from different links gets the same id"""
+
+        self.assertEqual(utils.canonical_id('https://www.youtube.com/watch?v=dQw4w9WgXcQ&t=10'), 'youtube:dQw4w9WgXcQ')
+        self.assertEqual(utils.canonical_id('https://youtu.be/dQw4w9WgXcQ'), 'youtube:dQw4w9WgXcQ')
+        self.assertEqual(utils.canonical_id('https://yewtu.be/watch?v=dQw4w9WgXcQ'), 'youtube:dQw4w9WgXcQ')
+        self.assertEqual(utils.canonical_id('https://m.youtube.com/shorts/dQw4w9WgXcQ'), 'youtube:dQw4w9WgXcQ')
+        self.assertEqual(utils.canonical_id('https://www.rumble.com/v123/?utm_source=x#top'), 'rumble.com/v123')
+        # the same paths on other sites aren't youtube videos
+        self.assertEqual(utils.canonical_id('https://example.com/watch?v=abc'), 'example.com/watch?v=abc')
+        self.assertEqual(utils.canonical_id('https://vimeo.com/watch?v=abc'), 'vimeo.com/watch?v=abc')
+
+    def test_stream_expiry(self):
+        """Test the stream_expiry function"""
+
+        self.assertEqual(utils.stream_expiry('https://r1.googlevideo.com/videoplayback?expire=1700000000&itag=22'), 1700000000)
+        self.assertEqual(utils.stream_expiry('https://manifest.googlevideo.com/api/manifest/hls_variant/expire/1700000000/ei/abc'), 1700000000)
+        self.assertIsNone(utils.stream_expiry('https://example.com/video.mp4'))
+
+    def test_expiry(self):
+        """Test that entries are dropped before their stream url expires"""
+
+        clock = FakeClock()
+        cache = StreamCache(expiry_margin=60, clock=clock)
+        cache.put('https://youtu.be/dQw4w9WgXcQ', _video('https://r1.googlevideo.com/videoplayback?expire=1200'))
+
+        self.assertIsNotNone(cache.get('https://www.youtube.com/watch?v=dQw4w9WgXcQ'))
+
+        clock.now = 1150
+        self.assertIsNone(cache.get('https://www.youtube.com/watch?v=dQw4w9WgXcQ'))
+        self.assertEqual(cache.stats(), {'size': 0, 'hits': 1, 'misses': 1, 'evictions': 0})
+
+    def test_default_ttl(self):
+        """Test that urls without an expiry live for the default ttl"""
+
+        clock = FakeClock()
+        cache = StreamCache(default_ttl=300, expiry_margin=0, clock=clock)
+        cache.put('https://rumble.com/v1', _video('https://example.com/video.mp4'))
+
+        clock.now = 1299
+        self.assertIsNotNone(cache.get('https://rumble.com/v1'))
+        clock.now = 1300
+        self.assertIsNone(cache.get('https://rumble.com/v1'))
+
+    def test_lru_eviction(self):
+        """Test that the least recently used entry is evicted first"""
+
+        cache = StreamCache(max_size=2, clock=FakeClock())
+        cache.put('https://rumble.com/v1', _video('https://example.com/1.mp4'))
+        cache.put('https://rumble.com/v2', _video('https://example.com/2.mp4'))
+        cache.get('https://rumble.com/v1')
+        cache.put('https://rumble.com/v3', _video('https://example.com/3.mp4'))
+
+        self.assertIsNotNone(cache.get('https://rumble.com/v1'))
+        self.assertIsNone(cache.get('https://rumble.com/v2'))
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_empty_results(self):
+        """Test that empty results are not cached"""
+
+        cache = StreamCache(clock=FakeClock())
+        cache.put('https://rumble.com/v1', None)
+        cache.put('https://rumble.com/v2', _video(''))
+
+        self.assertEqual(cache.stats()['size'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,3 +1,5 @@
+import os
+import tempfile
 import unittest
 
 from utils.string_utils import StringUtils
@@ -61,6 +63,20 @@ class TestStringUtils(unittest.TestCase):
         self.assertEqual(StringUtils.progress_bar(60, 60, 10),
                          '|██████████|             100%             00:01:00 / 00:01:00')
 
+    def test_find_local_path(self):
+        """Test the find_local_path method"""
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'my movie.mp4')
+            open(path, 'wb').close()  # pylint: disable=consider-using-with
+
+            self.assertEqual(StringUtils.find_local_path(path), path)
+            self.assertEqual(StringUtils.find_local_path(f'queue {path}'), path)
+            self.assertEqual(StringUtils.find_local_path(f'file://{directory}/my%20movie.mp4'), path)
+            self.assertEqual(StringUtils.find_local_path(directory), directory)
+            self.assertIsNone(StringUtils.find_local_path(os.path.join(directory, 'missing.mp4')))
+            self.assertIsNone(StringUtils.find_local_path('50'))
+
 
 if __name__ == '__main__':
     unittest.main()
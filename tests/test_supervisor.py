@@ -0,0 +1,175 @@
+import threading
+import time
+import unittest
+from unittest import mock
+
+from pychromecast.error import NotConnected
+from pychromecast.socket_client import (CONNECTION_STATUS_CONNECTED, CONNECTION_STATUS_LOST,
+                                        ConnectionStatus)
+
+from caster import _supervisor as _supervisor_module
+from caster._supervisor import ConnectionSupervisor
+
+
+class _FakeDevice:
+    '''
+    Pretends to be a Chromecast reporting socket events
+    '''
+
+    def __init__(self):
+        self.listeners = []
+
+    def register_connection_listener(self, listener):
+        """Register a listener"""
+        self.listeners.append(listener)
+
+    def report(self, status: str):
+        """Send a socket event to the listeners"""
+        for listener in self.listeners:
+            listener.new_connection_status(ConnectionStatus(status, None, None))
+
+
+class _FakeReconnect:
+    '''
+    Fails a number of times, then hands the supervisor a new device
+    '''
+
+    def __init__(self, failures: int = 0):
+        self.failures = failures
+        self.supervisor = None
+        self.done = threading.Semaphore(0)
+
+    def __call__(self):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError('device unreachable')
+
+        self.supervisor.watch(_FakeDevice())
+        self.done.release()
+
+
+def _supervisor(failures: int = 0, **kwargs) -> tuple[ConnectionSupervisor, _FakeReconnect, _FakeDevice]:
+    reconnect = _FakeReconnect(failures)
+    supervisor = ConnectionSupervisor(reconnect, grace=0, base_delay=0.01, jitter=lambda: 1, **kwargs)
+    reconnect.supervisor = supervisor
+    device = _FakeDevice()
+    supervisor.watch(device)
+    return supervisor, reconnect, device
+
+
+class TestConnectionSupervisor(unittest.TestCase):
+    """Test cases for the ConnectionSupervisor class"""
+
+    def test_runs_commands_when_connected(self):
+        """Test that commands run right away while the device is connected"""
+        supervisor, _, _ = _supervisor()
+        ran = []
+
+        self.assertTrue(supervisor.call(ran.append, 'play'))
+        self.assertEqual(ran, ['play'])
+        self.assertEqual(supervisor.metrics()['buffered'], 0)
+        supervisor.stop()
+
+    def test_replays_buffered_commands_in_order(self):
+        """Test that commands sent while disconnected run in order after a reconnect"""
+        supervisor, _, _ = _supervisor(failures=2)
+        ran = []
+        replayed = threading.Semaphore(0)
+
+        def command(name: str):
+            if not ran:
+                ran.append(None)
+                raise NotConnected()
+            ran.append(name)
+            replayed.release()
+
+        self.assertFalse(supervisor.call(command, 'play'))
+        self.assertFalse(supervisor.call(command, 'seek'))
+
+        self.assertTrue(replayed.acquire(timeout=2))  # pylint: disable=consider-using-with
+        self.assertTrue(replayed.acquire(timeout=2))  # pylint: disable=consider-using-with
+        supervisor.stop()
+
+        self.assertEqual(ran, [None, 'play', 'seek'])
+        metrics = supervisor.metrics()
+        self.assertTrue(metrics['connected'])
+        self.assertEqual(metrics['reconnects'], 1)
+        self.assertEqual(metrics['attempts'], 3)
+        self.assertEqual(metrics['buffered'], 0)
+        self.assertGreater(metrics['downtime'], 0)
+
+    def test_commands_wait_for_replay(self):
+        """Test that a new command waits for a buffered one that is still replaying"""
+        supervisor, reconnect, device = _supervisor()
+        ran = []
+        replaying = threading.Semaphore(0)
+
+        def slow(name: str):
+            replaying.release()
+            time.sleep(0.3)
+            ran.append(name)
+
+        device.report(CONNECTION_STATUS_LOST)
+        self.assertFalse(supervisor.call(slow, 'buffered'))
+        self.assertTrue(reconnect.done.acquire(timeout=2))  # pylint: disable=consider-using-with
+        self.assertTrue(replaying.acquire(timeout=2))  # pylint: disable=consider-using-with
+
+        self.assertFalse(supervisor.call(ran.append, 'new'))
+        self.assertEqual(ran, [])
+        supervisor.stop()
+
+        self.assertEqual(ran, ['buffered', 'new'])
+
+    def test_socket_events(self):
+        """Test that a lost socket starts reconnecting and old devices are ignored"""
+        supervisor, reconnect, device = _supervisor()
+
+        device.report(CONNECTION_STATUS_LOST)
+        self.assertTrue(reconnect.done.acquire(timeout=2))  # pylint: disable=consider-using-with
+
+        # the replaced device going down must not trigger another reconnect
+        device.report(CONNECTION_STATUS_LOST)
+        device.report(CONNECTION_STATUS_CONNECTED)
+        supervisor.stop()
+
+        self.assertTrue(supervisor.metrics()['connected'])
+        self.assertEqual(supervisor.metrics()['reconnects'], 1)
+
+    def test_buffer_limit(self):
+        """Test that the oldest commands are dropped when the buffer is full"""
+        supervisor, _, device = _supervisor(failures=100, max_buffer=2)
+        supervisor.base_delay = 10
+        ran = []
+
+        device.report(CONNECTION_STATUS_LOST)
+        for command in ['play', 'seek', 'pause']:
+            self.assertFalse(supervisor.call(ran.append, command))
+        supervisor.stop()
+
+        metrics = supervisor.metrics()
+        self.assertFalse(metrics['connected'])
+        self.assertEqual(metrics['buffered'], 2)
+        self.assertEqual(metrics['dropped'], 1)
+        self.assertEqual(ran, [])
+
+    def test_stop_timeout(self):
+        """Test that stopping doesn't wait for a reconnect attempt that hangs"""
+        release = threading.Event()
+        supervisor = ConnectionSupervisor(release.wait, grace=0, base_delay=0.01, jitter=lambda: 1)
+        device = _FakeDevice()
+        supervisor.watch(device)
+
+        device.report(CONNECTION_STATUS_LOST)
+        with mock.patch.object(_supervisor_module, 'STOP_TIMEOUT', 0.05):
+            started = time.monotonic()
+            supervisor.stop()
+        release.set()
+
+        self.assertLess(time.monotonic() - started, 1)
+
+    def test_backoff(self):
+        """Test that retry delays grow exponentially up to the limit"""
+        supervisor = ConnectionSupervisor(lambda: None, base_delay=1, max_delay=8, jitter=lambda: 0)
+        delays = [supervisor._backoff(attempt) for attempt in range(1, 6)]  # pylint: disable=protected-access
+
+        self.assertEqual(delays, [0.5, 1, 2, 4, 4])
@@ -0,0 +1,90 @@
+import unittest
+from unittest import mock
+
+from parsers.web import TierStats, WebParser
+
+PAGE_URL = 'https://example.com/videos/1'
+
+
+class TestWebParser(unittest.TestCase):
+    """Test cases for the WebParser class"""
+
+    def test_video_tag(self):
+        """Test finding a video in <video> and <source> tags"""
+
+        video = WebParser.parse_html('''
+            <html><head><title>Page</title></head><body>
+            <video poster="/poster.jpg"><source src="/media/1.m3u8"></video>
+            </body></html>''', PAGE_URL)
+
+        self.assertEqual(video.url, 'https://example.com/media/1.m3u8')
+        self.assertEqual(video.mime_type, 'application/x-mpegURL')
+        self.assertEqual(video.thumbnail_url, 'https://example.com/poster.jpg')
+        self.assertEqual(video.title, 'Page')
+
+    def test_blob_is_skipped(self):
+        """Test that browser-only blob urls are not returned"""
+
+        video = WebParser.parse_html('<video src="blob:https://example.com/123"></video>', PAGE_URL)
+        self.assertEqual(video.url, '')
+
+    def test_og_video(self):
+        """Test finding a video in og:video tags, skipping embedded players"""
+
+        video = WebParser.parse_html('''
+            <meta property="og:title" content="OG Title">
+            <meta property="og:video" content="https://example.com/embed/1">
+            <meta property="og:video:type" content="text/html">''', PAGE_URL)
+        self.assertEqual(video.url, '')
+
+        video = WebParser.parse_html('''
+            <meta property="og:title" content="OG Title">
+            <meta property="og:image" content="https://example.com/1.jpg">
+            <meta property="og:video:secure_url" content="https://cdn.example.com/1.mp4">''', PAGE_URL)
+        self.assertEqual(video.url, 'https://cdn.example.com/1.mp4')
+        self.assertEqual(video.title, 'OG Title')
+        self.assertEqual(video.thumbnail_url, 'https://example.com/1.jpg')
+
+    def test_json_ld(self):
+        """Test finding a video in a JSON-LD VideoObject"""
+
+        video = WebParser.parse_html('''
+            <script type="application/ld+json">
+            {"@graph": [{"@type": "WebPage"},
+                        {"@type": ["VideoObject"], "name": "LD Title", "contentUrl": "https://cdn.example.com/1.webm",
+                         "thumbnailUrl": ["https://cdn.example.com/1.jpg"]}]}
+            </script>''', PAGE_URL)
+
+        self.assertEqual(video.url, 'https://cdn.example.com/1.webm')
+        self.assertEqual(video.mime_type, 'video/webm')
+        self.assertEqual(video.title, 'LD Title')
+        self.assertEqual(video.thumbnail_url, 'https://cdn.example.com/1.jpg')
+
+    def test_tier_stats(self):
+        """Test that a tier that never works for a domain is skipped"""
+
+        stats = TierStats(min_attempts=2)
+        stats.record('example.com', 'static', False)
+        self.assertTrue(stats.should_try('example.com', 'static'))
+
+        stats.record('example.com', 'static', False)
+        self.assertFalse(stats.should_try('example.com', 'static'))
+        self.assertTrue(stats.should_try('example.org', 'static'))
+        self.assertEqual(stats.stats(), {'example.com': {'static': {'attempts': 2, 'successes': 0}}})
+
+    def test_tier_fallback(self):
+        """Test that the browser is only used when the static page has no video"""
+
+        with mock.patch.object(WebParser, 'tier_stats', TierStats(min_attempts=1)), \
+                mock.patch.object(WebParser, 'fetch_static', return_value='<title>Static</title>') as fetch_static, \
+                mock.patch.object(WebParser, 'fetch_rendered', return_value='<video src="/1.mp4"></video>') as fetch_rendered:
+            self.assertEqual(WebParser.parse(PAGE_URL).url, 'https://example.com/1.mp4')
+
+            # the static tier never worked for the domain, so it's skipped from now on
+            WebParser.parse(PAGE_URL)
+            self.assertEqual(fetch_static.call_count, 1)
+            self.assertEqual(fetch_rendered.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,176 @@
+import asyncio
+import http.client
+import json
+import threading
+import time
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl
+
+from telebot import apihelper
+
+from listeners.supervisor import ListenerSupervisor
+from listeners.telegram_listener import TelegramListener
+from listeners.webhook_server import SECRET_HEADER, WebhookServer
+
+TOKEN = '123456:test-token'
+
+
+class _FakeBotApi(BaseHTTPRequestHandler):
+    '''
+    Answers Bot API calls with `true` and records them
+    '''
+
+    calls = []
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        """Record a call"""
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0)).decode()
+        method, _, query = self.path.split('/')[-1].partition('?')
+        self.calls.append((method, dict(parse_qsl(query), **dict(parse_qsl(body)))))
+
+        reply = json.dumps({'ok': True, 'result': True}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(reply)))
+        self.end_headers()
+        self.wfile.write(reply)
+
+    do_GET = do_POST
+
+    def log_message(self, *_):  # pylint: disable=arguments-differ
+        pass
+
+
+def _update(update_id: int, chat_id: int, text: str) -> dict:
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Test'},
+            'text': text,
+        },
+    }
+
+
+class TestWebhook(unittest.TestCase):
+    """Test cases for the webhook mode of the TelegramListener"""
+
+    def setUp(self):
+        _FakeBotApi.calls = []
+        api = ThreadingHTTPServer(('127.0.0.1', 0), _FakeBotApi)
+        threading.Thread(target=api.serve_forever, daemon=True).start()
+        self.addCleanup(api.server_close)
+        self.addCleanup(api.shutdown)
+
+        url = apihelper.API_URL
+        apihelper.API_URL = f'http://127.0.0.1:{api.server_address[1]}/bot{{0}}/{{1}}'
+        self.addCleanup(setattr, apihelper, 'API_URL', url)
+
+    def _post(self, connection: http.client.HTTPConnection, path: str, update: dict, secret: str) -> int:
+        connection.request('POST', path, json.dumps(update), {SECRET_HEADER: secret,
+                                                              'Content-Type': 'application/json'})
+        response = connection.getresponse()
+        response.read()
+        return response.status
+
+    def _wait(self, condition, timeout=5):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            if time.monotonic() > deadline:
+                self.fail('timed out')
+            time.sleep(0.01)
+
+    def _start(self, received: list) -> tuple[TelegramListener, http.client.HTTPConnection]:
+        listener = TelegramListener({
+            'TELEGRAM_BOT_TOKEN': TOKEN,
+            'TELEGRAM_WEBHOOK_URL': 'https://bot.example.com/telegram',
+            'TELEGRAM_WEBHOOK_SECRET': 'secret',
+            'TELEGRAM_WEBHOOK_HOST': '127.0.0.1',
+            'TELEGRAM_WEBHOOK_PORT': '0',
+            'TELEGRAM_CALLBACK_DB': ':memory:',
+        })
+        supervisor = ListenerSupervisor([listener])
+        thread = threading.Thread(target=asyncio.run, args=(
+            supervisor.run(lambda _, result: received.append((result.chat_id, result.text))),))
+        thread.start()
+        self.addCleanup(thread.join)
+        self.addCleanup(supervisor.stop)
+
+        self._wait(lambda: ('setWebhook', {'url': 'https://bot.example.com/telegram', 'secret_token': 'secret'})
+                   in _FakeBotApi.calls)
+        connection = http.client.HTTPConnection('127.0.0.1', listener.webhook.port)
+        self.addCleanup(connection.close)
+        return listener, connection
+
+    def test_listener(self):
+        """Test that posted updates reach the handler and the webhook is registered with the secret"""
+        received = []
+        listener, connection = self._start(received)
+
+        self.assertEqual(self._post(connection, '/telegram', _update(1, 10, 'wrong'), 'guess'), 403)
+        connection.close()
+        self.assertEqual(self._post(connection, '/other', _update(2, 10, 'wrong'), 'secret'), 404)
+        connection.close()
+        self.assertEqual(self._post(connection, '/telegram', _update(3, 10, '50'), 'secret'), 200)
+        self.assertEqual(self._post(connection, '/telegram', _update(4, 20, '+10'), 'secret'), 200)
+
+        self._wait(lambda: len(received) == 2)
+        self.assertEqual(sorted(received), [(10, '50'), (20, '+10')])
+        self.assertEqual((listener.webhook.received, listener.webhook.rejected), (2, 1))
+
+    def test_callback_calls(self):
+        """Test that the messages a button sends go out through the rate limits and its answer right away"""
+        listener, connection = self._start([])
+        submitted = []
+        submit = listener.outbound.submit
+        listener.outbound.submit = lambda chat_id, send, key=None: submitted.append(chat_id) or submit(chat_id, send, key)
+
+        update = {
+            'update_id': 1,
+            'callback_query': {
+                'id': '7',
+                'chat_instance': '1',
+                'from': {'id': 10, 'is_bot': False, 'first_name': 'Test'},
+                'message': {'message_id': 6, 'date': 0, 'chat': {'id': 10, 'type': 'private'}, 'text': 'Volume'},
+                'data': 'close;10:5',
+            },
+        }
+        self.assertEqual(self._post(connection, '/telegram', update, 'secret'), 200)
+
+        self._wait(lambda: [method for method, _ in _FakeBotApi.calls].count('deleteMessage') == 2)
+        self.assertIn('answerCallbackQuery', [method for method, _ in _FakeBotApi.calls])
+        self.assertEqual(submitted, [10, 10])
+
+    def test_burst(self):
+        """Test that updates from parallel persistent connections are all taken"""
+        received = []
+        lock = threading.Lock()
+
+        def on_update(update):
+            with lock:
+                received.append(update['update_id'])
+
+        webhook = WebhookServer(on_update, 'secret', host='127.0.0.1')
+        webhook.start()
+        self.addCleanup(webhook.stop)
+
+        def post(first):
+            connection = http.client.HTTPConnection('127.0.0.1', webhook.port)
+            statuses = [self._post(connection, '/', _update(first + index, 1, 'x'), 'secret') for index in range(50)]
+            connection.close()
+            self.assertEqual(set(statuses), {200})
+
+        threads = [threading.Thread(target=post, args=(first,)) for first in range(0, 400, 50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(sorted(received), list(range(400)))
+
+
+if __name__ == '__main__':
+    unittest.main()
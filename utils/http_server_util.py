@@ -0,0 +1,50 @@
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+
+class DaemonHTTPServer(ThreadingHTTPServer):
+    """
+    Handles every connection on a daemon thread, so open connections don't hold up the shutdown.
+
+    Attributes:
+        owner: The object requests are served for, e.g. the media server.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], handler: type[BaseHTTPRequestHandler], owner: object,
+                 queue_size: int = 5) -> None:
+        """
+        Args:
+            address: The interface and port to listen on.
+            handler: The class handling requests.
+            owner: The object requests are served for.
+            queue_size: Number of connections waiting to be accepted before new ones are refused.
+        """
+        self.owner = owner
+        # read when the server starts listening, in the base constructor
+        self.request_queue_size = queue_size
+        super().__init__(address, handler)
+
+
+class QuietHTTPHandler(BaseHTTPRequestHandler):
+    """
+    Handles requests over persistent connections without logging each of them
+    """
+
+    # keeping the connection saves a handshake per request
+    protocol_version = 'HTTP/1.1'
+    # drop idle connections so they don't hold a thread forever
+    timeout = 60
+    server: DaemonHTTPServer
+
+    def _send_empty(self, status: HTTPStatus, headers: Optional[dict[str, str]] = None) -> None:
+        self.send_response(status)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
+    def log_message(self, *_):  # pylint: disable=arguments-differ
+        pass
@@ -1,6 +1,8 @@
 import math
+import os
 import re
 from typing import Optional
+from urllib.parse import unquote, urlparse
 
 
 class StringUtils:
@@ -120,6 +122,33 @@ class StringUtils:
 
         return None
 
+    @staticmethod
+    def find_local_path(text: str) -> Optional[str]:
+        """
+        Finds an existing local file or directory named by a message,
+        either by the whole message or by the part after a command.
+
+        Args:
+            text (str): The message, an absolute path, a `~/` path or a `file://` url.
+
+        Returns:
+            str: The path, or None if the message doesn't name an existing one.
+        """
+        text = text.strip()
+        candidates = [text]
+        if ' ' in text:
+            candidates.append(text.split(' ', 1)[1].strip())
+
+        for candidate in candidates:
+            if candidate.startswith('file://'):
+                candidate = unquote(urlparse(candidate).path)
+            path = os.path.expanduser(candidate)
+            # relative paths would match files named like volume levels
+            if os.path.isabs(path) and os.path.exists(path):
+                return path
+
+        return None
+
     @staticmethod
     def get_float(num_st: str) -> float:
         '''
@@ -0,0 +1,47 @@
+import threading
+import time
+from typing import Callable
+
+
+class PhaseTimer:
+    """
+    Measures consecutive phases of an operation, e.g. the steps of connecting to a device.
+
+    Example:
+        timer = PhaseTimer()
+        discover()
+        timer.lap('discovery')
+        connect()
+        timer.lap('connect')
+        print(timer)
+        Output: "discovery 1.20s, connect 0.10s, total 1.30s"
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.started = clock()
+        self.phases: list[tuple[str, float]] = []
+        self._last = self.started
+        self._lock = threading.Lock()
+
+    def lap(self, phase: str) -> float:
+        """
+        Records the time since the previous phase ended.
+
+        Args:
+            phase (str): The name of the phase that just ended.
+
+        Returns:
+            float: The duration of the phase in seconds.
+        """
+        with self._lock:
+            now = self.clock()
+            duration = now - self._last
+            self._last = now
+            self.phases.append((phase, duration))
+            return duration
+
+    def __str__(self) -> str:
+        with self._lock:
+            phases = [f'{phase} {duration:.2f}s' for phase, duration in self.phases]
+            return str.join(', ', phases + [f'total {self._last - self.started:.2f}s'])